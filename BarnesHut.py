@@ -0,0 +1,209 @@
+import numpy
+from Physics import G
+
+#Barnes-Hut gravity: the bodies are sorted into a quadtree, and a group of bodies that is far enough away from a body is treated as a single body at the group's center of mass.
+#This makes each step roughly O(N log N) instead of the O(N^2) of summing over every pair, at the cost of some accuracy (see the README for how THETA trades one for the other)
+
+#The opening angle. A node of the tree with width s at distance d from a body is only treated as a single body if s/d < THETA. Smaller values are more accurate and slower; THETA = 0 is direct summation
+THETA = 0.5
+#Nodes with at most LEAF_SIZE bodies in them aren't split any further, and the bodies in them are summed over exactly
+LEAF_SIZE = 8
+#Bodies are placed on a 2^MAX_DEPTH by 2^MAX_DEPTH grid to sort them into the tree, so the tree is at most MAX_DEPTH levels deep. 21 bits per coordinate is the most that fits in a 64 bit key
+MAX_DEPTH = 21
+#The tree is walked for GROUP_CHUNK groups of bodies at a time, which bounds the memory used for the lists of (group,node) pairs while walking it
+GROUP_CHUNK = 1024
+
+#Spreads the bits of each value out so there is a zero between each of them (...dcba becomes ...0d0c0b0a). Interleaving the x and y grid coordinates this way gives each body a Morton key,
+#and sorting by Morton key puts every node of the quadtree's bodies next to each other
+def spreadBits(values):
+    values = values.astype(numpy.uint64)
+    for shift,mask in ((16,0x0000FFFF0000FFFF),(8,0x00FF00FF00FF00FF),(4,0x0F0F0F0F0F0F0F0F),(2,0x3333333333333333),(1,0x5555555555555555)):
+        values = (values|(values<<numpy.uint64(shift)))&numpy.uint64(mask)
+    return values
+
+#For each count n, lists 0,1,...,n-1, all joined together into one array. Used to list every member of a set of consecutive runs without a loop
+def rangeOffsets(counts):
+    return numpy.arange(counts.sum())-numpy.repeat(numpy.cumsum(counts)-counts,counts)
+
+#The quadtree is stored as a set of arrays with one entry per node (rather than one Python object per node) so that it can be built and walked with whole-array operations.
+#Node 0 is the root. For node k: nodeMasses[k] and centersOfMass[k] describe the bodies inside it, corners[k] and widths[k] describe the square it covers, children[k] holds
+#the indices of its four children (-1 where a quadrant is empty), and the bodies inside it are bodies first[k] to first[k]+counts[k]-1 of the sorted arrays
+class QuadTree:
+    def __init__(self,positions,masses,leafSize=LEAF_SIZE,maxDepth=MAX_DEPTH):
+        #The root is the smallest square containing every body
+        lowerCorner = positions.min(axis=0)
+        rootWidth = (positions.max(axis=0)-lowerCorner).max()
+        if rootWidth == 0:
+            rootWidth = 1.0
+        gridSize = 2**maxDepth
+        gridCoords = numpy.minimum((positions-lowerCorner)/rootWidth*gridSize,gridSize-1).astype(numpy.uint64)
+        keys = spreadBits(gridCoords[:,0])|(spreadBits(gridCoords[:,1])<<numpy.uint64(1))
+        order = numpy.argsort(keys,kind='stable')
+        self.order = order
+        self.sortedPositions = positions[order]
+        self.sortedMasses = masses[order]
+        keys = keys[order]
+        gridCoords = gridCoords[order]
+        weightedPositions = self.sortedMasses[:,numpy.newaxis]*self.sortedPositions
+
+        #The tree is built one level at a time. activeBodies are the (sorted) indices of the bodies that are in a node which still needs to be split, and
+        #parentOfActive is the node each of them is in on the level above
+        levels = []
+        links = []
+        numNodes = 0
+        activeBodies = numpy.arange(len(masses))
+        parentOfActive = numpy.full(len(masses),-1)
+        for level in range(maxDepth+1):
+            if len(activeBodies) == 0:
+                break
+            #Bodies in the same node on this level have the same key once the bits for the deeper levels are shifted off
+            prefixes = keys[activeBodies]>>numpy.uint64(2*(maxDepth-level))
+            groupStarts = numpy.concatenate([[0],numpy.flatnonzero(prefixes[1:]!=prefixes[:-1])+1])
+            counts = numpy.diff(numpy.append(groupStarts,len(activeBodies)))
+            nodeMasses = numpy.add.reduceat(self.sortedMasses[activeBodies],groupStarts)
+            nodeMoments = numpy.add.reduceat(weightedPositions[activeBodies],groupStarts,axis=0)
+            #A node made only of massless bodies has no center of mass, so the average position is used instead
+            centersOfMass = numpy.add.reduceat(self.sortedPositions[activeBodies],groupStarts,axis=0)/counts[:,numpy.newaxis]
+            numpy.divide(nodeMoments,nodeMasses[:,numpy.newaxis],out=centersOfMass,where=nodeMasses[:,numpy.newaxis]>0)
+            width = rootWidth/2**level
+            corners = lowerCorner+(gridCoords[activeBodies[groupStarts]]>>numpy.uint64(maxDepth-level))*width
+            nodeIds = numNodes+numpy.arange(len(groupStarts))
+            if level > 0:
+                links.append((parentOfActive[groupStarts],(prefixes[groupStarts]&numpy.uint64(3)).astype(int),nodeIds))
+            isLeaf = (counts<=leafSize)|(level==maxDepth)
+            levels.append((nodeMasses,centersOfMass,corners,numpy.full(len(groupStarts),width),activeBodies[groupStarts],counts,isLeaf))
+            numNodes += len(groupStarts)
+            #Only the bodies in nodes that aren't leaves go on to the next level
+            split = numpy.repeat(~isLeaf,counts)
+            parentOfActive = numpy.repeat(nodeIds,counts)[split]
+            activeBodies = activeBodies[split]
+
+        self.nodeMasses,self.centersOfMass,self.corners,self.widths,self.first,self.counts,self.isLeaf = (numpy.concatenate(column) for column in zip(*levels))
+        self.children = numpy.full((numNodes,4),-1)
+        for parents,quadrants,nodeIds in links:
+            self.children[parents,quadrants] = nodeIds
+        #leafOf[i] is the leaf that body i of the sorted arrays is in, and sortedIndex[j] is where body j of the original arrays ended up in the sorted ones
+        #(the leaves split the sorted bodies into consecutive runs, so putting them in order of their first body lines them up with the sorted bodies)
+        leaves = numpy.flatnonzero(self.isLeaf)
+        leaves = leaves[numpy.argsort(self.first[leaves])]
+        self.leafOf = numpy.repeat(leaves,self.counts[leaves])
+        self.sortedIndex = numpy.empty(len(masses),dtype=int)
+        self.sortedIndex[order] = numpy.arange(len(masses))
+
+    #Walks the tree for the target bodies (indices into the original arrays, or every body if targets is None), yielding batches of interactions as
+    #(target number,source position,source mass,self pairs) arrays, where target number is the target's position in targets. A source is either a node far enough away to count as one body,
+    #or a single body in a leaf that is too close to approximate. self pairs says which interactions are between a body and itself (it is None for a batch of nodes, which never are).
+    #Target bodies in the same leaf are walked down the tree together as a group, using the smallest box around them to decide which nodes are far enough away. Bodies in the same leaf
+    #are close together, so they nearly always open the same nodes anyway, and walking them together means far fewer (group,node) pairs to keep track of
+    def interactions(self,targets,theta):
+        #Sorting the targets into the same order as the tree's bodies puts the targets in each leaf next to each other. targetNumbers[k] is the position in targets of the kth sorted target
+        if targets is None:
+            sortedTargets = numpy.arange(len(self.order))
+            targetNumbers = self.order
+        else:
+            sortedTargets = self.sortedIndex[targets]
+            targetNumbers = numpy.argsort(sortedTargets,kind='stable')
+            sortedTargets = sortedTargets[targetNumbers]
+        targetPositions = self.sortedPositions[sortedTargets]
+        targetLeaves = self.leafOf[sortedTargets]
+        groupStarts = numpy.concatenate([[0],numpy.flatnonzero(targetLeaves[1:]!=targetLeaves[:-1])+1])
+        groupCounts = numpy.diff(numpy.append(groupStarts,len(sortedTargets)))
+        lowerCorners = numpy.minimum.reduceat(targetPositions,groupStarts,axis=0)
+        upperCorners = numpy.maximum.reduceat(targetPositions,groupStarts,axis=0)
+        for chunkStart in range(0,len(groupStarts),GROUP_CHUNK):
+            groups = numpy.arange(chunkStart,min(chunkStart+GROUP_CHUNK,len(groupStarts)))
+            nodes = numpy.zeros(len(groups),dtype=int)
+            while len(groups) > 0:
+                centers = self.centersOfMass[nodes]
+                #The distance used is from the node's center of mass to the nearest point of the group's box, so the node is far enough away from every target in the group
+                gaps = centers-numpy.clip(centers,lowerCorners[groups],upperCorners[groups])
+                distSquared = numpy.einsum('ij,ij->i',gaps,gaps)
+                #A node overlapping the group is never approximated, so a body never attracts itself through its own node's center of mass
+                nodeCorners = self.corners[nodes]
+                overlaps = numpy.all((lowerCorners[groups]<nodeCorners+self.widths[nodes,numpy.newaxis])&(upperCorners[groups]>=nodeCorners),axis=1)
+                far = (self.widths[nodes]**2<theta**2*distSquared)&~overlaps
+                members = numpy.repeat(groupStarts[groups[far]],groupCounts[groups[far]])+rangeOffsets(groupCounts[groups[far]])
+                farNodes = numpy.repeat(nodes[far],groupCounts[groups[far]])
+                yield targetNumbers[members],self.centersOfMass[farNodes],self.nodeMasses[farNodes],None
+                leaf = self.isLeaf[nodes]&~far
+                if numpy.any(leaf):
+                    #Pairs every target in the group with every body in the leaf
+                    members = numpy.repeat(groupStarts[groups[leaf]],groupCounts[groups[leaf]])+rangeOffsets(groupCounts[groups[leaf]])
+                    leafNodes = numpy.repeat(nodes[leaf],groupCounts[groups[leaf]])
+                    counts = self.counts[leafNodes]
+                    bodies = numpy.repeat(self.first[leafNodes],counts)+rangeOffsets(counts)
+                    members = numpy.repeat(members,counts)
+                    yield targetNumbers[members],self.sortedPositions[bodies],self.sortedMasses[bodies],sortedTargets[members]==bodies
+                opened = ~far&~leaf
+                children = self.children[nodes[opened]]
+                hasChild = children>=0
+                groups = numpy.repeat(groups[opened],4).reshape(-1,4)[hasChild]
+                nodes = children[hasChild]
+
+#Approximates the gravitational forces with a quadtree that is rebuilt every time they are calculated. Has the same methods as Physics.DirectSolver, and softens the forces the same way
+class BarnesHutSolver:
+    name = "barneshut"
+
+    def __init__(self,theta=THETA,leafSize=LEAF_SIZE,softening=0.0):
+        self.theta = theta
+        self.leafSize = leafSize
+        self.softening = softening
+
+    def calculateAccelerations(self,positions,masses,targets=None):
+        targetPositions = positions if targets is None else positions[targets]
+        accelerations = numpy.zeros((len(targetPositions),2))
+        if len(targetPositions) == 0:
+            return accelerations
+        tree = QuadTree(positions,masses,self.leafSize)
+        for targetIndices,sourcePositions,sourceMasses,selfPairs in tree.interactions(targets,self.theta):
+            r_vectors = sourcePositions-targetPositions[targetIndices]
+            distSquared = numpy.einsum('ij,ij->i',r_vectors,r_vectors)+self.softening**2
+            with numpy.errstate(divide='ignore'):
+                inverseCubes = distSquared**-1.5
+            #Doesn't calculate gravitational attraction on a body from itself
+            if selfPairs is not None:
+                inverseCubes[selfPairs] = 0
+            weights = G*sourceMasses*inverseCubes
+            #bincount adds up the contributions for each target much faster than a loop would
+            for axis in range(2):
+                accelerations[:,axis] += numpy.bincount(targetIndices,weights*r_vectors[:,axis],minlength=len(targetPositions))
+        return accelerations
+
+    def calculatePotentials(self,positions,masses,targets=None):
+        targetPositions = positions if targets is None else positions[targets]
+        potentials = numpy.zeros(len(targetPositions))
+        if len(targetPositions) == 0:
+            return potentials
+        tree = QuadTree(positions,masses,self.leafSize)
+        for targetIndices,sourcePositions,sourceMasses,selfPairs in tree.interactions(targets,self.theta):
+            r_vectors = sourcePositions-targetPositions[targetIndices]
+            distSquared = numpy.einsum('ij,ij->i',r_vectors,r_vectors)+self.softening**2
+            with numpy.errstate(divide='ignore'):
+                inverseDistances = distSquared**-0.5
+            if selfPairs is not None:
+                inverseDistances[selfPairs] = 0
+            potentials -= G*numpy.bincount(targetIndices,sourceMasses*inverseDistances,minlength=len(targetPositions))
+        return potentials
+
+    #Both of the above from one walk of one tree
+    def calculateAccelerationsAndPotentials(self,positions,masses,targets=None):
+        targetPositions = positions if targets is None else positions[targets]
+        accelerations = numpy.zeros((len(targetPositions),2))
+        potentials = numpy.zeros(len(targetPositions))
+        if len(targetPositions) == 0:
+            return accelerations,potentials
+        tree = QuadTree(positions,masses,self.leafSize)
+        for targetIndices,sourcePositions,sourceMasses,selfPairs in tree.interactions(targets,self.theta):
+            r_vectors = sourcePositions-targetPositions[targetIndices]
+            distSquared = numpy.einsum('ij,ij->i',r_vectors,r_vectors)+self.softening**2
+            with numpy.errstate(divide='ignore'):
+                inverseCubes = distSquared**-1.5
+                inverseDistances = distSquared**-0.5
+            if selfPairs is not None:
+                inverseCubes[selfPairs] = 0
+                inverseDistances[selfPairs] = 0
+            weights = G*sourceMasses*inverseCubes
+            for axis in range(2):
+                accelerations[:,axis] += numpy.bincount(targetIndices,weights*r_vectors[:,axis],minlength=len(targetPositions))
+            potentials -= G*numpy.bincount(targetIndices,sourceMasses*inverseDistances,minlength=len(targetPositions))
+        return accelerations,potentials
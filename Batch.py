@@ -0,0 +1,137 @@
+import numpy
+from Physics import G,CHUNK_SIZE,SystemState,DirectSolver
+
+#Integrates many independent small systems (all with the same number of bodies) at the same time. Their positions and velocities are stored as (M,N,2) arrays for M systems of N bodies,
+#so one call to the kernels below does the work for every system at once. For systems of a handful of bodies this is far faster than running them one at a time,
+#where almost all of the time would go to Python overhead rather than arithmetic
+
+#The gravitational acceleration on every body of every system from the other bodies in the same system. positions is (M,N,2) and masses is (M,N).
+#Systems are processed a few at a time so no more than chunkSize pairs of bodies are held in memory at once. softening is the softening length, as for DirectSolver
+def batchedAccelerations(positions,masses,chunkSize=CHUNK_SIZE,softening=0.0):
+    numSystems,numBodies = masses.shape
+    accelerations = numpy.zeros_like(positions)
+    systemsPerChunk = max(1,chunkSize//max(numBodies**2,1))
+    for start in range(0,numSystems,systemsPerChunk):
+        stop = min(start+systemsPerChunk,numSystems)
+        #r_vectors[m,i,j] points from body i to body j of system m
+        r_vectors = positions[start:stop,numpy.newaxis,:,:]-positions[start:stop,:,numpy.newaxis,:]
+        distSquared = numpy.einsum('mijk,mijk->mij',r_vectors,r_vectors)+softening**2
+        with numpy.errstate(divide='ignore'):
+            inverseCubes = distSquared**-1.5
+        #Each body's pair with itself is left out by index rather than by distance, like calculateAccelerations does, so two bodies at exactly the same place aren't silently ignored
+        inverseCubes[:,numpy.arange(numBodies),numpy.arange(numBodies)] = 0
+        accelerations[start:stop] = numpy.einsum('mij,mijk->mik',G*masses[start:stop,numpy.newaxis,:]*inverseCubes,r_vectors)
+    return accelerations
+
+#The gravitational potential energy divided by mass of every body of every system, as an (M,N) array
+def batchedPotentials(positions,masses,chunkSize=CHUNK_SIZE,softening=0.0):
+    numSystems,numBodies = masses.shape
+    potentials = numpy.zeros(masses.shape)
+    systemsPerChunk = max(1,chunkSize//max(numBodies**2,1))
+    for start in range(0,numSystems,systemsPerChunk):
+        stop = min(start+systemsPerChunk,numSystems)
+        r_vectors = positions[start:stop,numpy.newaxis,:,:]-positions[start:stop,:,numpy.newaxis,:]
+        distSquared = numpy.einsum('mijk,mijk->mij',r_vectors,r_vectors)+softening**2
+        with numpy.errstate(divide='ignore'):
+            inverseDistances = distSquared**-0.5
+        inverseDistances[:,numpy.arange(numBodies),numpy.arange(numBodies)] = 0
+        potentials[start:stop] = -G*numpy.einsum('mij,mj->mi',inverseDistances,masses[start:stop])
+    return potentials
+
+#The total mechanical energy of every system, as an (M,) array
+def batchedTotalEnergies(positions,velocities,masses,softening=0.0):
+    kineticEnergies = 0.5*numpy.sum(masses*numpy.sum(velocities**2,axis=2),axis=1)
+    potentialEnergies = 0.5*numpy.sum(masses*batchedPotentials(positions,masses,softening=softening),axis=1)
+    return kineticEnergies+potentialEnergies
+
+#M systems of N bodies being integrated together with kick-drift-kick leapfrog. A system can stop early (when two of its bodies collide or one escapes, if asked to), after which
+#it is left exactly as it was when it stopped while the others carry on; active says which systems are still going, and endTimes and endReasons say when and why the others stopped.
+#Every check also records the largest energy error so far (maxEnergyErrors) and the pairs of bodies that have come closer than the sum of their radii (collidedPairs).
+#softening is the softening length used for every system
+class BatchedSystems:
+    def __init__(self,positions,velocities,masses,radii,names,softening=0.0):
+        self.positions = numpy.array(positions,dtype=float)
+        self.velocities = numpy.array(velocities,dtype=float)
+        self.masses = numpy.array(masses,dtype=float)
+        self.radii = numpy.array(radii,dtype=float)
+        self.names = list(names)
+        self.softening = softening
+        numSystems = len(self.masses)
+        self.active = numpy.ones(numSystems,dtype=bool)
+        self.endTimes = numpy.full(numSystems,numpy.nan)
+        self.endReasons = [None]*numSystems
+        self.time = 0.0
+        self.steps = 0
+        self.accelerations = batchedAccelerations(self.positions,self.masses,softening=softening)
+        self.initialEnergies = batchedTotalEnergies(self.positions,self.velocities,self.masses,softening)
+        self.maxEnergyErrors = numpy.zeros(numSystems)
+        self.collidedPairs = [set() for system in range(numSystems)]
+
+    def getNumSystems(self):
+        return len(self.masses)
+
+    #Which systems to work on: a slice of all of them while they are all still going (which avoids copying), and an array of the active ones' indices after that
+    def activeSystems(self):
+        if numpy.all(self.active):
+            return slice(None)
+        return numpy.flatnonzero(self.active)
+
+    #One leapfrog step of length dt for every active system
+    def step(self,dt):
+        systems = self.activeSystems()
+        velocities = self.velocities[systems]+self.accelerations[systems]*(dt/2)
+        positions = self.positions[systems]+velocities*dt
+        accelerations = batchedAccelerations(positions,self.masses[systems],softening=self.softening)
+        self.velocities[systems] = velocities+accelerations*(dt/2)
+        self.positions[systems] = positions
+        self.accelerations[systems] = accelerations
+        self.time += dt
+        self.steps += 1
+
+    #Updates the energy errors and collided pairs of the active systems, and stops any that have had a collision (if stopOnCollision is True) or have a body more than
+    #escapeDistance from their center of mass (if escapeDistance isn't None; it can be one distance for every system or an (M,) array)
+    def check(self,stopOnCollision=False,escapeDistance=None):
+        systems = numpy.flatnonzero(self.active)
+        positions = self.positions[systems]
+        masses = self.masses[systems]
+        energies = batchedTotalEnergies(positions,self.velocities[systems],masses,self.softening)
+        self.maxEnergyErrors[systems] = numpy.maximum(self.maxEnergyErrors[systems],numpy.abs(energies/self.initialEnergies[systems]-1))
+        separations = numpy.linalg.norm(positions[:,numpy.newaxis,:,:]-positions[:,:,numpy.newaxis,:],axis=3)
+        touching = numpy.triu(separations<self.radii[systems,:,numpy.newaxis]+self.radii[systems,numpy.newaxis,:],1)
+        for system,first,second in numpy.argwhere(touching).tolist():
+            self.collidedPairs[systems[system]].add((first,second))
+        if stopOnCollision:
+            self.stop(systems[numpy.any(touching,axis=(1,2))],"collision")
+        if escapeDistance is not None:
+            centersOfMass = numpy.sum(masses[:,:,numpy.newaxis]*positions,axis=1)/numpy.sum(masses,axis=1)[:,numpy.newaxis]
+            distances = numpy.linalg.norm(positions-centersOfMass[:,numpy.newaxis,:],axis=2)
+            limits = numpy.broadcast_to(escapeDistance,self.active.shape)[systems]
+            self.stop(systems[numpy.any(distances>limits[:,numpy.newaxis],axis=1)&self.active[systems]],"escape")
+
+    def stop(self,systems,reason):
+        for system in systems:
+            self.active[system] = False
+            self.endTimes[system] = self.time
+            self.endReasons[system] = reason
+
+    #Steps every system until the time reaches tEnd (or every system has stopped), checking them every checkEvery steps and at the end
+    def run(self,tEnd,dt,checkEvery=10,stopOnCollision=False,escapeDistance=None):
+        while tEnd-self.time > dt*10**(-9) and numpy.any(self.active):
+            self.step(min(dt,tEnd-self.time))
+            if self.steps%checkEvery == 0:
+                self.check(stopOnCollision,escapeDistance)
+        if numpy.any(self.active):
+            self.check(stopOnCollision,escapeDistance)
+
+    #One of the systems as a SystemState of its own, with the same softening
+    def getState(self,system):
+        state = SystemState(DirectSolver(softening=self.softening))
+        state.addBodies(self.names,[None]*len(self.names),self.positions[system],self.velocities[system],self.masses[system],self.radii[system])
+        return state
+
+#Stacks SystemStates that all have the same number of bodies into a BatchedSystems (the names are taken from the first one)
+def batchFromStates(states,softening=0.0):
+    if len(set(state.getNumBodies() for state in states)) > 1:
+        raise ValueError("Every system in a batch needs the same number of bodies")
+    return BatchedSystems([state.positions for state in states],[state.velocities for state in states],[state.masses for state in states],
+                          [state.radii for state in states],states[0].names,softening)
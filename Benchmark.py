@@ -0,0 +1,173 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy
+from Solvers import getSolver,SOLVER_NAMES
+from Integrators import getIntegrator,INTEGRATORS
+from Trajectory import TrajectoryWriter
+from Scenarios import uniformDisk
+
+#Times the parts of the simulator that a run spends its time in, for systems of different sizes and with each solver, and saves the results to a json file so a later run can be
+#compared against them to catch anything that has got slower. Every case is a uniform disk (see Scenarios.py) made with the same seed, so the numbers are comparable between runs:
+#  accelerations: one force calculation for every body
+#  step: one step of the integrator (which includes a force calculation, or several with block time steps)
+#  energy: the total energy of the system (a potential calculation for every body)
+#  trajectory: saving one step to a trajectory file
+#  render: drawing one frame of the window (with pygame's dummy video driver, so no window is opened), with the bodies moving a little between frames
+#The last two don't depend on the solver, so they are only run once for each size
+
+CASES = ["accelerations","step","energy","trajectory","render"]
+SOLVER_CASES = ["accelerations","step","energy"]
+SIZES = [10,100,1000,10000,100000]
+#Solvers that sum over every pair of bodies are left out above this many bodies, where one force calculation would take minutes
+MAX_PAIRWISE_BODIES = 10000
+PAIRWISE_SOLVERS = ["direct","numba"]
+#Each case is run at least MIN_REPEATS times and until MIN_TIME seconds have gone by, but at most MAX_REPEATS times, after a first call that isn't counted
+#(so that things like compiling and caches being filled aren't counted either)
+MIN_REPEATS = 3
+MIN_TIME = 0.5
+MAX_REPEATS = 1000
+#A case counts as slower when its best time is more than this fraction slower than the baseline's
+THRESHOLD = 0.2
+#How far the disk turns between frames in the render case (radians)
+RENDER_ROTATION = 0.001
+
+#Calls function repeatedly and returns how long each of the timed calls took
+def timeCalls(function):
+    function()
+    times = []
+    start = time.perf_counter()
+    while len(times) < MAX_REPEATS and (len(times) < MIN_REPEATS or time.perf_counter()-start < MIN_TIME):
+        callStart = time.perf_counter()
+        function()
+        times.append(time.perf_counter()-callStart)
+    return times
+
+#The system every case is run on, with numBodies bodies in total
+def makeSystem(numBodies):
+    return uniformDisk(numBodies-1,seed=0)
+
+#The functions below set a case up and return the function to time
+
+def accelerationsCase(state,integrator):
+    return state.calculateAccelerations
+
+def stepCase(state,integrator):
+    integrator = getIntegrator(integrator)
+    #The first step starts with the accelerations already known, the same as every step after it in a real run
+    integrator.currentAccelerations(state)
+    dt = 60.0 #short enough that the disk barely changes however many times it is stepped
+    return lambda: integrator.step(state,dt)
+
+def energyCase(state,integrator):
+    return state.calculateTotalEnergy
+
+def renderCase(state,integrator):
+    #PlanetSimulator starts pygame when it is imported, so it is only imported (with the dummy driver, unless another one has been chosen) when this case is run
+    os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+    import PlanetSimulator
+    state.colors = [PlanetSimulator.WHITE]*state.getNumBodies()
+    bodies = [PlanetSimulator.Body(state,index) for index in range(state.getNumBodies())]
+    PlanetSimulator.scaleToFit(bodies)
+    renderer = PlanetSimulator.Renderer()
+    rotation = numpy.array([[numpy.cos(RENDER_ROTATION),numpy.sin(RENDER_ROTATION)],[-numpy.sin(RENDER_ROTATION),numpy.cos(RENDER_ROTATION)]])
+    def drawFrame():
+        state.positions[:] = state.positions@rotation
+        for body in bodies:
+            body.recordPosition()
+        renderer.drawScene(bodies)
+        renderer.show()
+    return drawFrame
+
+CASE_FUNCTIONS = {"accelerations":accelerationsCase,"step":stepCase,"energy":energyCase,"render":renderCase}
+
+#Runs every combination of cases, sizes and solvers, printing each result as it goes. Returns the results as a list of dicts
+def runBenchmarks(cases=CASES,sizes=SIZES,solvers=None,integrator="leapfrog"):
+    if solvers is None:
+        solvers = availableSolvers()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases:
+            for numBodies in sizes:
+                for solver in (solvers if case in SOLVER_CASES else [None]):
+                    if solver in PAIRWISE_SOLVERS and numBodies > MAX_PAIRWISE_BODIES:
+                        continue
+                    state = makeSystem(numBodies)
+                    if solver is not None:
+                        state.solver = getSolver(solver)
+                    if case == "trajectory":
+                        #Most writes only copy the step into the writer's buffer, which is written to the file a few megabytes at a time, so with few bodies this mostly times the copy
+                        writer = TrajectoryWriter(os.path.join(directory,"benchmark.npy"),state)
+                        times = timeCalls(lambda: writer.write(0.0,state))
+                        writer.close()
+                    else:
+                        times = timeCalls(CASE_FUNCTIONS[case](state,integrator))
+                    result = {"case":case,"solver":solver,"bodies":numBodies,"best":min(times),"median":float(numpy.median(times)),"repeats":len(times)}
+                    print(formatResult(result),flush=True)
+                    results.append(result)
+    return results
+
+#The solvers that can actually run here: the "numba" one is left out when Numba isn't installed, since it would just time the direct solver again
+def availableSolvers():
+    if importlib.util.find_spec("numba") is None:
+        return [solver for solver in SOLVER_NAMES if solver != "numba"]
+    return list(SOLVER_NAMES)
+
+def formatResult(result):
+    return "{:<14}{:<11}{:>8}{:>14.6g} s{:>14.6g} s{:>7}".format(result["case"],str(result["solver"] or "-"),result["bodies"],result["best"],result["median"],result["repeats"])
+
+#What the results were measured on, saved with them since times from different computers can't be compared
+def describeMachine():
+    description = {"platform":platform.platform(),"processor":platform.processor(),"cpus":os.cpu_count(),"python":platform.python_version(),"numpy":numpy.__version__}
+    try:
+        import numba
+        description["numba"] = numba.__version__
+    except ImportError:
+        description["numba"] = None
+    return description
+
+#Compares results against the ones in a baseline file. Returns a list of (result,baseline result,ratio of the best times) for every case in both, and prints them,
+#marking the ones that are more than threshold slower
+def compareResults(results,baseline,threshold=THRESHOLD):
+    baselineResults = {(result["case"],result["solver"],result["bodies"]):result for result in baseline["results"]}
+    comparisons = []
+    print("Compared with the baseline (best time now / best time then):")
+    for result in results:
+        old = baselineResults.get((result["case"],result["solver"],result["bodies"]))
+        if old is None:
+            continue
+        ratio = result["best"]/old["best"]
+        comparisons.append((result,old,ratio))
+        print("{:<14}{:<11}{:>8}{:>10.2f}x{}".format(result["case"],str(result["solver"] or "-"),result["bodies"],ratio,"  SLOWER" if ratio > 1+threshold else ""))
+    if baseline.get("machine") != describeMachine():
+        print("The baseline was measured on a different computer or with different versions, so the comparison may not mean much")
+    return comparisons
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the physics and drawing for systems of different sizes, and compares the times against an earlier run")
+    parser.add_argument("--cases",nargs="+",choices=CASES,default=CASES,help="what to time (all of them by default)")
+    parser.add_argument("--sizes",nargs="+",type=int,default=SIZES,help="numbers of bodies to time them with")
+    parser.add_argument("--solvers",nargs="+",choices=SOLVER_NAMES,help="solvers to time (every one that can run here by default)")
+    parser.add_argument("--integrator",choices=list(INTEGRATORS),default="leapfrog",help="integrator for the step case")
+    parser.add_argument("--output",help="json file to save the results to")
+    parser.add_argument("--compare",help="json file of earlier results to compare against. The exit code is 1 if anything is more than --threshold slower")
+    parser.add_argument("--threshold",type=float,default=THRESHOLD,help="how much slower (as a fraction) a case has to be to count as slower")
+    arguments = parser.parse_args()
+    print("{:<14}{:<11}{:>8}{:>16}{:>16}{:>7}".format("case","solver","bodies","best","median","runs"))
+    results = runBenchmarks(arguments.cases,arguments.sizes,arguments.solvers,arguments.integrator)
+    if arguments.output is not None:
+        with open(arguments.output,"w") as file:
+            json.dump({"machine":describeMachine(),"date":time.strftime("%Y-%m-%d %H:%M:%S"),"integrator":arguments.integrator,"results":results},file,indent=2)
+    if arguments.compare is not None:
+        with open(arguments.compare) as file:
+            comparisons = compareResults(results,json.load(file),arguments.threshold)
+        if any(ratio > 1+arguments.threshold for result,old,ratio in comparisons):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
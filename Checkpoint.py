@@ -0,0 +1,51 @@
+import json
+import os
+import numpy
+from Solvers import getSolverSettings
+from Integrators import getIntegratorName
+
+#A checkpoint is a snapshot of everything a Simulation needs to carry on exactly where it left off: the bodies, the time, the integrator's remembered accelerations (and time step levels),
+#which solver it uses, how it handles collisions, and how far each of its outputs (and its diagnostics) got. It is a .npz file (numpy.load can open it) of arrays, plus a "metadata" entry holding a json string of everything that isn't an array.
+#Because nothing is recalculated when a run is resumed, the resumed run produces exactly the same numbers as one that was never stopped.
+#Anything else the caller wants to keep (like the viewer's scales and paths) can be saved as extras, a dict of arrays and json values
+
+#Saves simulation to filename. The checkpoint is written to a temporary file first and then renamed over the old one, so if the program is stopped while saving,
+#the last complete checkpoint is still there
+def saveCheckpoint(filename,simulation,extras=None):
+    state = simulation.state
+    solver,theta,softening = getSolverSettings(state.solver)
+    outputs = [output.getCheckpoint() for output in simulation.outputs if hasattr(output,"getCheckpoint")]
+    arrays = {"positions":state.positions,"velocities":state.velocities,"masses":state.masses,"radii":state.radii,"ids":state.ids}
+    for key,value in simulation.integrator.getState().items():
+        arrays["integrator."+key] = value
+    extraValues = {}
+    for key,value in ({} if extras is None else extras).items():
+        if isinstance(value,numpy.ndarray):
+            arrays["extra."+key] = value
+        else:
+            extraValues[key] = value
+    arrays["metadata"] = numpy.array(json.dumps({"names":state.names,"colors":[list(color) if color is not None else None for color in state.colors],
+                                                 "nextId":state.nextId,"time":simulation.time,"steps":simulation.steps,"dt":simulation.dt,"solver":solver,"theta":theta,"softening":softening,
+                                                 "collisions":None if simulation.collisions is None else simulation.collisions.getSettings(),
+                                                 "diagnostics":None if simulation.diagnostics is None else simulation.diagnostics.getCheckpoint(),
+                                                 "integrator":getIntegratorName(simulation.integrator),"outputs":outputs,"extras":extraValues}))
+    temporaryName = filename+".tmp"
+    with open(temporaryName,"wb") as file:
+        numpy.savez(file,**arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporaryName,filename)
+
+#Reads a checkpoint back. Returns the metadata dict, with the arrays added to it under the same names (the integrator's under "integratorState" and the extras' under "extras")
+def readCheckpoint(filename):
+    with numpy.load(filename,allow_pickle=False) as data:
+        checkpoint = json.loads(str(data["metadata"]))
+        checkpoint["integratorState"] = {}
+        for key in data.files:
+            if key.startswith("integrator."):
+                checkpoint["integratorState"][key[len("integrator."):]] = data[key]
+            elif key.startswith("extra."):
+                checkpoint["extras"][key[len("extra."):]] = data[key]
+            elif key != "metadata":
+                checkpoint[key] = data[key]
+    return checkpoint
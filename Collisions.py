@@ -0,0 +1,160 @@
+import numpy
+from BarnesHut import rangeOffsets
+
+#Finds the bodies that are touching (closer together than the sum of their radii) and either merges them into one body or bounces them off each other.
+#Checking every pair would be O(N^2), so bodies are first sorted into a uniform grid (a spatial hash): two bodies can only be touching if they are in the same or neighboring cells,
+#so only those pairs are checked and finding the collisions is close to O(N).
+#Collisions are only looked for at the end of each step, so two small fast bodies can pass through each other without being caught if the time step is too long
+
+#The ways collisions can be handled. "merge" turns the bodies that touch into one body with their total mass and momentum (a perfectly inelastic collision), and "bounce" pushes them apart
+COLLISION_MODES = ["merge","bounce"]
+#How much of the speed the bodies were approaching each other at they separate with after bouncing. 1 is a perfectly elastic bounce and 0 leaves them moving together
+RESTITUTION = 1.0
+#Systems with at most this many bodies just check every pair, which is faster than building the grid when there are only a few
+BRUTE_FORCE_BODIES = 64
+#The grid's cells are sized to fit the bodies up to this quantile of radius, so a few very large bodies (like a star among asteroids) don't make the cells huge.
+#The ones bigger than that are checked separately (see findCollisions)
+CELL_QUANTILE = 0.99
+#Grid cell (x,y) has the key x*KEY_STRIDE+y, which is unique as long as y is within +-KEY_STRIDE/2 cells of the origin
+KEY_STRIDE = 2**32
+
+#The cells around a cell that pairs are looked for in. Only half of the neighbors are needed, since a pair in the other half is found from the other cell
+NEIGHBOR_OFFSETS = [(1,-1),(1,0),(1,1),(0,1)]
+
+#Every pair of bodies (i,j) with i < j that are touching, as a (number of pairs,2) array of indices
+def findCollisions(positions,radii):
+    numBodies = len(radii)
+    if numBodies <= BRUTE_FORCE_BODIES:
+        separations = positions[numpy.newaxis,:,:]-positions[:,numpy.newaxis,:]
+        touching = numpy.einsum('ijk,ijk->ij',separations,separations) < (radii[numpy.newaxis,:]+radii[:,numpy.newaxis])**2
+        numpy.fill_diagonal(touching,False)
+        if not touching.any(): #nearly always, so this is checked before anything else
+            return numpy.zeros((0,2),dtype=int)
+        return numpy.argwhere(numpy.triu(touching))
+    cellSize = 2*numpy.quantile(radii,CELL_QUANTILE)
+    if cellSize <= 0:
+        cellSize = 2*radii.max()
+        if cellSize <= 0:
+            return numpy.zeros((0,2),dtype=int) #bodies with no size never touch
+    large = 2*radii > cellSize
+    pairs = [gridPairs(positions,radii,numpy.flatnonzero(~large),cellSize)]
+    for body in numpy.flatnonzero(large):
+        pairs.append(nearbyPairs(positions,radii,body,large))
+    return numpy.concatenate(pairs)
+
+#The pairs out of first and second (arrays of indices) that are touching, with the smaller index first
+def touchingPairs(positions,radii,first,second):
+    separations = positions[second]-positions[first]
+    touching = numpy.einsum('ij,ij->i',separations,separations) < (radii[first]+radii[second])**2
+    return numpy.sort(numpy.column_stack([first[touching],second[touching]]),axis=1)
+
+#The touching pairs among the bodies given, which are sorted into square cells of width cellSize. Sorting the bodies by their cell's key puts the bodies in each cell next to each other,
+#so the bodies in any cell can be found with a binary search, and every body is paired with the bodies after it in its own cell and all the bodies in the neighboring cells at once
+def gridPairs(positions,radii,bodies,cellSize):
+    cells = numpy.floor(positions[bodies]/cellSize).astype(numpy.int64)
+    keys = cells[:,0]*KEY_STRIDE+cells[:,1]
+    order = numpy.argsort(keys,kind='stable')
+    bodies = bodies[order]
+    keys = keys[order]
+    #Pairs within the same cell
+    starts = numpy.arange(1,len(keys)+1)
+    counts = numpy.searchsorted(keys,keys,side='right')-starts
+    firsts = [numpy.repeat(bodies,counts)]
+    seconds = [bodies[numpy.repeat(starts,counts)+rangeOffsets(counts)]]
+    for dx,dy in NEIGHBOR_OFFSETS:
+        neighborKeys = keys+(dx*KEY_STRIDE+dy)
+        starts = numpy.searchsorted(keys,neighborKeys,side='left')
+        counts = numpy.searchsorted(keys,neighborKeys,side='right')-starts
+        firsts.append(numpy.repeat(bodies,counts))
+        seconds.append(bodies[numpy.repeat(starts,counts)+rangeOffsets(counts)])
+    return touchingPairs(positions,radii,numpy.concatenate(firsts),numpy.concatenate(seconds))
+
+#The touching pairs between one of the large bodies left out of the grid and every other body (each pair of large bodies is only listed once)
+def nearbyPairs(positions,radii,body,large):
+    others = numpy.flatnonzero((numpy.arange(len(radii))>body)|~large)
+    return touchingPairs(positions,radii,numpy.full(len(others),body),others)
+
+#Merges every group of touching bodies into one body. Bodies touching in a chain (a touching b touching c) all become one. The merged body keeps the name, color and id of the most
+#massive body in the group; its position and velocity are the group's center of mass and center of mass velocity, so momentum is conserved exactly, and its volume is the group's total volume.
+#Returns the number of bodies removed
+def mergeBodies(state,pairs):
+    #Union-find: parents[body] leads to the body chosen to stand for its group
+    parents = {}
+    def find(body):
+        while parents.get(body,body) != body:
+            body = parents[body]
+        return body
+    for first,second in pairs.tolist():
+        firstRoot,secondRoot = find(first),find(second)
+        if firstRoot != secondRoot:
+            parents[max(firstRoot,secondRoot)] = min(firstRoot,secondRoot)
+    groups = {}
+    for body in set(pairs.ravel().tolist()):
+        groups.setdefault(find(body),[]).append(body)
+    removed = []
+    for members in groups.values():
+        members = numpy.array(members)
+        masses = state.masses[members]
+        totalMass = masses.sum()
+        weights = masses/totalMass if totalMass > 0 else numpy.full(len(members),1/len(members))
+        survivor = members[numpy.argmax(masses)]
+        state.positions[survivor] = weights@state.positions[members]
+        state.velocities[survivor] = weights@state.velocities[members]
+        state.masses[survivor] = totalMass
+        state.radii[survivor] = numpy.cbrt(numpy.sum(state.radii[members]**3))
+        removed += [member for member in members.tolist() if member != survivor]
+    state.removeBodies(removed)
+    return len(removed)
+
+#Bounces every touching pair off each other along the line between their centers, and moves them apart so they are just touching. The impulses and the moves are both shared
+#between the two bodies in inverse proportion to their masses, so momentum and the center of mass are unchanged. Pairs that are already moving apart only get moved apart
+def bounceBodies(state,pairs,restitution=RESTITUTION):
+    first,second = pairs[:,0],pairs[:,1]
+    separations = state.positions[second]-state.positions[first]
+    distances = numpy.linalg.norm(separations,axis=1)
+    #Two bodies at exactly the same place have no line between them to bounce along
+    apart = distances > 0
+    first,second,separations,distances = first[apart],second[apart],separations[apart],distances[apart]
+    normals = separations/distances[:,numpy.newaxis]
+    with numpy.errstate(divide='ignore'):
+        inverseMasses = numpy.where(state.masses > 0,1/state.masses,0.0)
+    firstShares,secondShares = inverseMasses[first],inverseMasses[second]
+    totals = firstShares+secondShares
+    totals[totals == 0] = 1.0
+    firstShares,secondShares = firstShares/totals,secondShares/totals
+    approachSpeeds = numpy.minimum(numpy.einsum('ij,ij->i',state.velocities[second]-state.velocities[first],normals),0)
+    #The change in relative velocity along the normal, split between the two bodies
+    velocityChanges = -(1+restitution)*approachSpeeds[:,numpy.newaxis]*normals
+    overlaps = (state.radii[first]+state.radii[second]-distances)[:,numpy.newaxis]*normals
+    #add.at adds up the changes to bodies that are in more than one pair
+    numpy.add.at(state.velocities,first,-firstShares[:,numpy.newaxis]*velocityChanges)
+    numpy.add.at(state.velocities,second,secondShares[:,numpy.newaxis]*velocityChanges)
+    numpy.add.at(state.positions,first,-firstShares[:,numpy.newaxis]*overlaps)
+    numpy.add.at(state.positions,second,secondShares[:,numpy.newaxis]*overlaps)
+    return len(first)
+
+#Handles the collisions in a Simulation after every step. mode is one of COLLISION_MODES and restitution is used by "bounce". count is how many collisions have been handled so far
+#(it starts from the count saved in a checkpoint when a run is resumed)
+class CollisionHandler:
+    def __init__(self,mode="merge",restitution=RESTITUTION,count=0):
+        if mode not in COLLISION_MODES:
+            raise ValueError("Unknown collision mode \""+str(mode)+"\" (expected one of: "+", ".join(COLLISION_MODES)+")")
+        self.mode = mode
+        self.restitution = restitution
+        self.count = count
+
+    #Finds and handles the collisions in state. Returns True if any of the bodies were changed, in which case the integrator has to forget what it remembers about them
+    def resolve(self,state):
+        pairs = findCollisions(state.positions,state.radii)
+        if len(pairs) == 0:
+            return False
+        self.count += len(pairs)
+        if self.mode == "merge":
+            mergeBodies(state,pairs)
+        else:
+            bounceBodies(state,pairs,self.restitution)
+        return True
+
+    #The settings the handler can be created again with, and its count so far (for checkpoints)
+    def getSettings(self):
+        return {"mode":self.mode,"restitution":self.restitution,"count":self.count}
@@ -0,0 +1,102 @@
+import json
+import os
+import numpy
+
+#Keeps track of the quantities that stay the same for an isolated system (total energy, linear momentum and angular momentum), so how far they have drifted shows how accurate a run is,
+#along with the virial ratio, which shows whether a cluster has settled down (it is about 1 once it has).
+#The potential energy is the expensive part, since it needs the potential of every body. So the system is only sampled every "every" steps, and on those steps the integrator is asked to
+#work out the potentials in the same pass as its last force calculation of the step (see Integrators.py), which costs far less than a separate pass
+
+#Steps between samples
+DIAGNOSTICS_EVERY = 100
+
+#The whole system's kinetic, potential and total energy, linear momentum, angular momentum (about the origin), virial ratio (2*kinetic/|potential|) and center of mass, as a dict.
+#potentials are the bodies' potentials divided by their masses at the current positions, if they are already known
+def calculateDiagnostics(state,potentials=None):
+    if potentials is None:
+        potentials = state.calculatePotentials()
+    masses,positions,velocities = state.masses,state.positions,state.velocities
+    kineticEnergy = 0.5*numpy.sum(masses*numpy.sum(velocities**2,axis=1))
+    potentialEnergy = 0.5*numpy.sum(masses*potentials) #halved because each pair's potential energy is counted by both bodies in it
+    totalMass = numpy.sum(masses)
+    return {"kineticEnergy":float(kineticEnergy),"potentialEnergy":float(potentialEnergy),"totalEnergy":float(kineticEnergy+potentialEnergy),
+            "momentum":(masses@velocities).tolist(),"angularMomentum":float(numpy.sum(masses*(positions[:,0]*velocities[:,1]-positions[:,1]*velocities[:,0]))),
+            "virialRatio":float(2*kineticEnergy/abs(potentialEnergy)) if potentialEnergy != 0 else None,
+            "centerOfMass":((masses@positions)/totalMass).tolist() if totalMass > 0 else None}
+
+#Samples a Simulation every "every" steps once attached to it, keeping the latest sample (in latest) and optionally writing every sample to a file as JSON lines.
+#Each sample also has the errors since the start of the run: the relative change in total energy, and the changes in momentum and angular momentum divided by the sums of the
+#sizes of every body's momentum and angular momentum at the start (the totals themselves are often zero).
+#resume is what getCheckpoint returned, when the run is being carried on from a checkpoint, so the errors are still measured from the start of the whole run
+class DiagnosticsMonitor:
+    def __init__(self,every=DIAGNOSTICS_EVERY,output=None,resume=None):
+        self.every = every
+        self.filename = output
+        self.latest = None
+        self.file = None
+        if resume is None:
+            self.initial = None
+        else:
+            self.every = resume["every"]
+            self.initial = resume["initial"]
+            self.momentumScale = resume["momentumScale"]
+            self.angularMomentumScale = resume["angularMomentumScale"]
+            self.filename = resume["filename"]
+            if self.filename is not None:
+                os.truncate(self.filename,resume["bytes"]) #cuts off the samples after the checkpoint
+                self.file = open(self.filename,"a")
+
+    #Starts sampling simulation, taking the first sample now if this is the start of the run (the file is only opened then, so a monitor that is never attached doesn't empty it)
+    def attach(self,simulation):
+        simulation.diagnostics = self
+        if self.initial is None:
+            if self.filename is not None:
+                self.file = open(self.filename,"w")
+            state = simulation.state
+            self.momentumScale = float(numpy.sum(state.masses*numpy.linalg.norm(state.velocities,axis=1)))
+            self.angularMomentumScale = float(numpy.sum(state.masses*numpy.abs(state.positions[:,0]*state.velocities[:,1]-state.positions[:,1]*state.velocities[:,0])))
+            self.initial = calculateDiagnostics(state)
+            self.record(simulation,self.initial)
+
+    #Whether the step after stepsTaken steps is sampled
+    def isDue(self,stepsTaken):
+        return (stepsTaken+1)%self.every == 0
+
+    def sample(self,simulation,potentials=None):
+        self.record(simulation,calculateDiagnostics(simulation.state,potentials))
+
+    def record(self,simulation,values):
+        sample = {"time":simulation.time,"steps":simulation.steps,"bodies":simulation.state.getNumBodies()}
+        sample.update(values)
+        initialEnergy = self.initial["totalEnergy"]
+        sample["energyError"] = (values["totalEnergy"]-initialEnergy)/abs(initialEnergy) if initialEnergy != 0 else None
+        momentumChange = numpy.linalg.norm(numpy.subtract(values["momentum"],self.initial["momentum"]))
+        sample["momentumError"] = float(momentumChange/self.momentumScale) if self.momentumScale > 0 else None
+        angularMomentumChange = abs(values["angularMomentum"]-self.initial["angularMomentum"])
+        sample["angularMomentumError"] = angularMomentumChange/self.angularMomentumScale if self.angularMomentumScale > 0 else None
+        if self.file is not None:
+            self.file.write(json.dumps(sample)+"\n")
+        self.latest = sample
+
+    #A line of text describing the latest sample, for showing on screen
+    def describe(self):
+        sample = self.latest
+        if sample is None:
+            return ""
+        parts = []
+        for key,label in (("energyError","energy error"),("momentumError","momentum error"),("angularMomentumError","angular momentum error"),("virialRatio","virial ratio")):
+            if sample[key] is not None:
+                parts.append(label+" {:.2e}".format(sample[key]) if key != "virialRatio" else label+" {:.3g}".format(sample[key]))
+        return ", ".join(parts)
+
+    #What a checkpoint needs to carry on sampling from this point (see resume above)
+    def getCheckpoint(self):
+        if self.file is not None:
+            self.file.flush()
+        return {"every":self.every,"initial":self.initial,"momentumScale":self.momentumScale,"angularMomentumScale":self.angularMomentumScale,
+                "filename":self.filename,"bytes":None if self.filename is None else os.path.getsize(self.filename)}
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
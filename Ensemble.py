@@ -0,0 +1,222 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+from Physics import G,DirectSolver
+from BarnesHut import THETA
+from Simulation import simulate
+from Scenarios import loadSystem
+from Batch import batchFromStates
+
+#Runs many variants of the same system (for example with slightly different starting velocities or masses) at the same time on every core of the computer, and summarizes how they turned out.
+#A variant is a dict of changes to make to the base system:
+#  "<body name>.mass": multiplies that body's mass by the value
+#  "<body name>.velocity": multiplies that body's velocity by the value
+#  "seed", "velocitySpread", "massSpread": multiplies every body's velocity components by 1+velocitySpread*r and every mass by 1+massSpread*r, where each r is a random number
+#                                          from a standard normal distribution, using the random number generator seed given
+#  "dt", "integrator", "solver": run this variant with a different time step, integrator or solver
+
+#A body counts as having escaped if it ends up unbound from the rest of the system and more than ESCAPE_DISTANCE times as far from the center of mass as the farthest body started out
+ESCAPE_DISTANCE = 10
+
+#Every variant with each combination of the values in grid, which maps the keys above to lists of values
+def gridVariants(grid):
+    keys = list(grid)
+    return [dict(zip(keys,values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+#count variants with random changes to every body's velocity and mass. Each variant gets its own seed, so every run can be repeated exactly
+def randomVariants(count,velocitySpread=0.0,massSpread=0.0,seed=0):
+    return [{"seed":seed+run,"velocitySpread":velocitySpread,"massSpread":massSpread} for run in range(count)]
+
+#Makes the changes a variant describes to state
+def applyVariant(state,variant):
+    if "seed" in variant:
+        generator = numpy.random.default_rng(variant["seed"])
+        state.velocities *= 1+variant.get("velocitySpread",0.0)*generator.standard_normal(state.velocities.shape)
+        state.masses *= 1+variant.get("massSpread",0.0)*generator.standard_normal(state.masses.shape)
+    for key,value in variant.items():
+        if "." in key:
+            name,quantity = key.rsplit(".",1)
+            index = state.names.index(name)
+            if quantity == "mass":
+                state.masses[index] *= value
+            elif quantity == "velocity":
+                state.velocities[index] *= value
+            else:
+                raise ValueError("Unknown variant quantity \""+quantity+"\" (expected mass or velocity)")
+
+#The semi-major axis and eccentricity of every body's orbit around the most massive body (treating each pair as a two body system). Unbound orbits have a negative semi-major axis
+def orbitalElements(state):
+    primary = numpy.argmax(state.masses)
+    r_vectors = state.positions-state.positions[primary]
+    v_vectors = state.velocities-state.velocities[primary]
+    gravitationalParameters = G*(state.masses+state.masses[primary])
+    distances = numpy.linalg.norm(r_vectors,axis=1)
+    speedsSquared = numpy.sum(v_vectors**2,axis=1)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        semiMajorAxes = -gravitationalParameters/(2*(speedsSquared/2-gravitationalParameters/distances))
+        eccentricityVectors = ((speedsSquared-gravitationalParameters/distances)[:,numpy.newaxis]*r_vectors-numpy.sum(r_vectors*v_vectors,axis=1)[:,numpy.newaxis]*v_vectors)/gravitationalParameters[:,numpy.newaxis]
+    eccentricities = numpy.linalg.norm(eccentricityVectors,axis=1)
+    semiMajorAxes[primary] = numpy.nan
+    eccentricities[primary] = numpy.nan
+    return semiMajorAxes,eccentricities
+
+#An output (see Output.py) that keeps track of how much the total energy has drifted and which pairs of bodies have collided (come closer than the sum of their radii),
+#checking every sampleEvery steps
+class EnsembleMonitor:
+    def __init__(self,state,sampleEvery):
+        self.sampleEvery = sampleEvery
+        self.initialEnergy = state.calculateTotalEnergy()
+        self.maxEnergyError = 0.0
+        self.collidedPairs = set()
+        self.stepsSeen = 0
+
+    def write(self,time,state):
+        self.stepsSeen += 1
+        if self.stepsSeen%self.sampleEvery == 0:
+            self.check(state)
+
+    def check(self,state):
+        self.maxEnergyError = max(self.maxEnergyError,abs(state.calculateTotalEnergy()/self.initialEnergy-1))
+        separations = numpy.linalg.norm(state.positions[:,numpy.newaxis,:]-state.positions[numpy.newaxis,:,:],axis=2)
+        touching = numpy.argwhere(numpy.triu(separations<state.radii[:,numpy.newaxis]+state.radii[numpy.newaxis,:],1))
+        self.collidedPairs.update(map(tuple,touching.tolist()))
+
+    def close(self):
+        pass
+
+#The base system each worker process runs its variants of. It is sent to each worker once when the worker starts, instead of once with every variant
+workerBaseState = None
+
+def initWorker(baseState):
+    global workerBaseState
+    workerBaseState = baseState
+
+#Runs one variant of the base system (in a worker process) and returns a summary of how it went
+def runVariant(variant,tEnd,dt,solver,integrator,sampleEvery,softening):
+    state = workerBaseState.copy()
+    applyVariant(state,variant)
+    state.solver = DirectSolver(softening=softening) #so the starting energy is measured with the same softening as the run
+    monitor = EnsembleMonitor(state,sampleEvery)
+    simulation = simulate(state,tEnd,variant.get("dt",dt),monitor,variant.get("solver",solver),THETA,variant.get("integrator",integrator),softening=softening)
+    monitor.check(simulation.state) #always checks the final state too
+    return summarizeRun(variant,state,simulation.state,monitor.maxEnergyError,monitor.collidedPairs)
+
+#Runs a list of variants of the base system (in a worker process) all at once as one BatchedSystems (see Batch.py), and returns a summary of each of them.
+#Every variant in a batch shares the same time step and leapfrog integrator, so variants can't change dt, integrator or solver
+def runVariantBatch(variants,tEnd,dt,sampleEvery,softening):
+    states = []
+    for variant in variants:
+        if "dt" in variant or "integrator" in variant or "solver" in variant:
+            raise ValueError("Batched runs can't change dt, integrator or solver")
+        state = workerBaseState.copy()
+        applyVariant(state,variant)
+        states.append(state)
+    batch = batchFromStates(states,softening)
+    batch.run(tEnd,dt,sampleEvery)
+    return [summarizeRun(variant,state,batch.getState(system),batch.maxEnergyErrors[system],batch.collidedPairs[system])
+            for system,(variant,state) in enumerate(zip(variants,states))]
+
+#The summary of one finished run: its largest energy error, which bodies escaped and collided, and every body's final orbit
+def summarizeRun(variant,state,final,energyError,collidedPairs):
+    #Escapes: bodies whose kinetic energy relative to the center of mass is more than enough to get away from the rest of the system, and that are already far away
+    centerOfMass = numpy.average(final.positions,axis=0,weights=final.masses)
+    centerOfMassVelocity = numpy.average(final.velocities,axis=0,weights=final.masses)
+    specificEnergies = 0.5*numpy.sum((final.velocities-centerOfMassVelocity)**2,axis=1)+final.calculatePotentials()
+    startingSize = numpy.max(numpy.linalg.norm(state.positions-numpy.average(state.positions,axis=0,weights=state.masses),axis=1))
+    escaped = (specificEnergies>0)&(numpy.linalg.norm(final.positions-centerOfMass,axis=1)>ESCAPE_DISTANCE*startingSize)
+    semiMajorAxes,eccentricities = orbitalElements(final)
+    return {"variant":variant,"energyError":float(energyError),"escaped":[final.names[index] for index in numpy.flatnonzero(escaped)],
+            "collisions":[[final.names[first],final.names[second]] for first,second in sorted(collidedPairs)],
+            "semiMajorAxes":[None if numpy.isnan(value) else value for value in semiMajorAxes.tolist()],
+            "eccentricities":[None if numpy.isnan(value) else value for value in eccentricities.tolist()]}
+
+#Runs every variant of baseState from time 0 to tEnd, spread over a pool of worker processes (one per core unless workers says otherwise), and returns their summaries in the same order as variants.
+#softening is the softening length used for every variant.
+#If batchSize is given, each worker runs its variants batchSize at a time in a single BatchedSystems, which is much faster for small systems. Batches only use direct forces and leapfrog,
+#so solver and integrator have to be "direct" and "leapfrog" then
+def runEnsemble(baseState,variants,tEnd,dt,solver="direct",integrator="leapfrog",workers=None,sampleEvery=10,batchSize=None,softening=0.0):
+    workers = os.cpu_count() if workers is None else workers
+    if batchSize is not None and (solver != "direct" or integrator != "leapfrog"):
+        raise ValueError("Batched runs only use the direct solver and leapfrog integrator")
+    if batchSize is not None:
+        batches = [variants[start:start+batchSize] for start in range(0,len(variants),batchSize)]
+        with ProcessPoolExecutor(workers,initializer=initWorker,initargs=(baseState,)) as pool:
+            return [result for batch in pool.map(runVariantBatch,batches,itertools.repeat(tEnd),itertools.repeat(dt),itertools.repeat(sampleEvery),itertools.repeat(softening)) for result in batch]
+    #Handing the variants out a few at a time keeps the workers busy without sending each one separately
+    chunkSize = max(1,len(variants)//(4*workers))
+    with ProcessPoolExecutor(workers,initializer=initWorker,initargs=(baseState,)) as pool:
+        return list(pool.map(runVariant,variants,itertools.repeat(tEnd),itertools.repeat(dt),itertools.repeat(solver),itertools.repeat(integrator),itertools.repeat(sampleEvery),itertools.repeat(softening),chunksize=chunkSize))
+
+#The mean and standard deviation of values, leaving out NaNs (None if they're all NaN)
+def meanAndStd(values):
+    values = values[~numpy.isnan(values)]
+    if len(values) == 0:
+        return None,None
+    return float(numpy.mean(values)),float(numpy.std(values))
+
+#Statistics over all of the runs: the energy errors, how often bodies escaped or collided, and the mean and standard deviation of every body's final semi-major axis and eccentricity
+def summarize(results,names):
+    energyErrors = numpy.array([result["energyError"] for result in results])
+    semiMajorAxes = numpy.array([result["semiMajorAxes"] for result in results],dtype=float) #the Nones for the most massive body become NaNs
+    eccentricities = numpy.array([result["eccentricities"] for result in results],dtype=float)
+    bodies = {}
+    for index,name in enumerate(names):
+        semiMajorAxisMean,semiMajorAxisStd = meanAndStd(semiMajorAxes[:,index])
+        eccentricityMean,eccentricityStd = meanAndStd(eccentricities[:,index])
+        bodies[name] = {"escapeFraction":float(numpy.mean([name in result["escaped"] for result in results])),
+                        "collisionFraction":float(numpy.mean([any(name in pair for pair in result["collisions"]) for result in results])),
+                        "semiMajorAxisMean":semiMajorAxisMean,"semiMajorAxisStd":semiMajorAxisStd,"eccentricityMean":eccentricityMean,"eccentricityStd":eccentricityStd}
+    return {"runs":len(results),"energyErrorMean":float(numpy.mean(energyErrors)),"energyErrorMax":float(numpy.max(energyErrors)),
+            "runsWithEscapes":sum(1 for result in results if result["escaped"]),"runsWithCollisions":sum(1 for result in results if result["collisions"]),"bodies":bodies}
+
+#Turns "Earth.mass=0.5,1,2" into ("Earth.mass",[0.5,1,2]). Whole numbers are kept as ints (seeds have to be), and values that aren't numbers (like integrator names) are kept as strings
+def parseGridArgument(argument):
+    key,values = argument.split("=",1)
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(int(value))
+        except ValueError:
+            try:
+                parsed.append(float(value))
+            except ValueError:
+                parsed.append(value)
+    return key,parsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs many variants of a system in parallel and summarizes the results")
+    parser.add_argument("bodies",help="csv file of the bodies in the system, with the columns name,mass,radius,x,y,vx,vy, or a JSON or TOML scenario file (see Scenarios.py)")
+    parser.add_argument("--t-end",type=float,required=True,help="how long to simulate each variant for (seconds)")
+    parser.add_argument("--dt",type=float,required=True,help="time step (seconds)")
+    parser.add_argument("--grid",action="append",default=[],help="a parameter to sweep over, e.g. Earth.mass=0.5,1,2 (can be given more than once)")
+    parser.add_argument("--runs",type=int,default=0,help="number of randomly perturbed variants to run")
+    parser.add_argument("--velocity-spread",type=float,default=0.0,help="relative standard deviation of the random velocity changes")
+    parser.add_argument("--mass-spread",type=float,default=0.0,help="relative standard deviation of the random mass changes")
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--solver",default="direct")
+    parser.add_argument("--integrator",default="leapfrog")
+    parser.add_argument("--softening",type=float,help="softening length (meters); the scenario file's, or none, if not given")
+    parser.add_argument("--workers",type=int,help="number of worker processes (one per core by default)")
+    parser.add_argument("--batch-size",type=int,help="run this many variants at a time in one vectorized batch (leapfrog with direct forces only)")
+    parser.add_argument("--output",help="json file to save every run's summary and the overall statistics to")
+    arguments = parser.parse_args()
+    variants = gridVariants(dict(parseGridArgument(argument) for argument in arguments.grid)) if arguments.grid else []
+    variants += randomVariants(arguments.runs,arguments.velocity_spread,arguments.mass_spread,arguments.seed)
+    if not variants:
+        parser.error("there is nothing to run: give --grid and/or --runs")
+    if arguments.batch_size is not None and (arguments.solver != "direct" or arguments.integrator != "leapfrog"):
+        parser.error("--batch-size only works with --solver direct and --integrator leapfrog")
+    baseState,settings = loadSystem(arguments.bodies)
+    softening = settings.get("softening",0.0) if arguments.softening is None else arguments.softening
+    results = runEnsemble(baseState,variants,arguments.t_end,arguments.dt,arguments.solver,arguments.integrator,arguments.workers,batchSize=arguments.batch_size,softening=softening)
+    statistics = summarize(results,baseState.names)
+    print(json.dumps(statistics,indent=2))
+    if arguments.output is not None:
+        with open(arguments.output,"w") as file:
+            json.dump({"statistics":statistics,"runs":results},file,indent=2)
+
+if __name__ == "__main__":
+    main()
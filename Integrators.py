@@ -0,0 +1,186 @@
+import numpy
+
+#The integrators move a SystemState forward in time by dt with step(state,dt). Leapfrog, velocity Verlet and Yoshida are symplectic and time reversible, which means the energy error they make
+#stays small and bounded over a long run instead of drifting, so nothing needs to correct the energy afterwards and much larger time steps can be used for the same accuracy.
+#The symplectic integrators remember the accelerations from the end of their last step (which are the accelerations at the current positions) and reuse them at the start of the next one,
+#so they cost one force calculation per step (three for Yoshida). currentAccelerations(state) gives those accelerations to anything else that needs them
+
+#The part every integrator has in common: keeping hold of the accelerations at the current positions.
+#adaptive is True for integrators that choose their own time steps inside of each step(state,dt), so that whatever is calling them doesn't need to shrink dt itself.
+#If wantPotentials is set before a step, integrators whose last force calculation is at the final positions of the step also work out every body's potential in that same pass,
+#which can then be picked up with takePotentials() (see Diagnostics.py). The others leave potentials as None
+class Integrator:
+    adaptive = False
+
+    def __init__(self):
+        self.accelerations = None
+        self.wantPotentials = False
+        self.potentials = None
+
+    def currentAccelerations(self,state):
+        if self.accelerations is None:
+            self.accelerations = state.calculateAccelerations()
+        return self.accelerations
+
+    #Everything the integrator remembers between steps, as a dict of arrays and numbers, so that a run can be saved to a checkpoint and carry on exactly as it would have (see Checkpoint.py)
+    def getState(self):
+        return {} if self.accelerations is None else {"accelerations":self.accelerations}
+
+    def setState(self,values):
+        self.accelerations = values.get("accelerations")
+
+    #Forgets everything remembered about the bodies. Called when the bodies have been changed between steps (when some have collided, for example), so nothing out of date gets used
+    def reset(self):
+        self.accelerations = None
+        self.potentials = None
+
+    #The accelerations at the end of a step, with the potentials as well if they are wanted
+    def finalAccelerations(self,state):
+        if not self.wantPotentials:
+            return state.calculateAccelerations()
+        accelerations,self.potentials = state.calculateAccelerationsAndPotentials()
+        return accelerations
+
+    #The potentials worked out in the last step (or None if there weren't any), which stops them being worked out again
+    def takePotentials(self):
+        potentials = self.potentials
+        self.wantPotentials = False
+        self.potentials = None
+        return potentials
+
+#Semi-implicit Euler, which is what the simulator originally used: new velocity from the old acceleration, then new position from the new velocity. Only first order accurate, so its energy error is far larger than the others' for the same time step
+class EulerIntegrator(Integrator):
+    def step(self,state,dt):
+        state.velocities += self.currentAccelerations(state)*dt
+        state.positions += state.velocities*dt
+        self.accelerations = None #the positions have changed, so these are out of date
+
+#Kick-drift-kick leapfrog: half a kick to the velocities, a full drift of the positions, then the second half kick with the accelerations at the new positions. Second order accurate
+class LeapfrogIntegrator(Integrator):
+    def step(self,state,dt):
+        state.velocities += self.currentAccelerations(state)*(dt/2)
+        state.positions += state.velocities*dt
+        self.accelerations = self.finalAccelerations(state)
+        state.velocities += self.accelerations*(dt/2)
+
+#Velocity Verlet, written the textbook way: the new positions come from a Taylor series, and the velocities are updated with the average of the old and new accelerations.
+#It gives the same trajectory as the kick-drift-kick leapfrog (up to rounding)
+class VelocityVerletIntegrator(Integrator):
+    def step(self,state,dt):
+        oldAccelerations = self.currentAccelerations(state)
+        state.positions += state.velocities*dt+oldAccelerations*(dt**2/2)
+        self.accelerations = self.finalAccelerations(state)
+        state.velocities += (oldAccelerations+self.accelerations)*(dt/2)
+
+#Yoshida's fourth order integrator: three leapfrog steps in a row of lengths W1*dt, W0*dt and W1*dt, where W0 is negative (the middle step goes backwards in time).
+#The weights are chosen so that the second and third order errors of the three leapfrog steps cancel out
+YOSHIDA_W1 = 1/(2-2**(1/3))
+YOSHIDA_W0 = -2**(1/3)/(2-2**(1/3))
+class YoshidaIntegrator(Integrator):
+    def step(self,state,dt):
+        #The last half kick of each leapfrog step and the first half kick of the next are done together as one kick
+        kicks = [YOSHIDA_W1/2,(YOSHIDA_W1+YOSHIDA_W0)/2,(YOSHIDA_W0+YOSHIDA_W1)/2,YOSHIDA_W1/2]
+        drifts = [YOSHIDA_W1,YOSHIDA_W0,YOSHIDA_W1]
+        state.velocities += self.currentAccelerations(state)*(kicks[0]*dt)
+        for substep,(drift,kick) in enumerate(zip(drifts,kicks[1:])):
+            state.positions += state.velocities*(drift*dt)
+            self.accelerations = self.finalAccelerations(state) if substep == len(drifts)-1 else state.calculateAccelerations()
+            state.velocities += self.accelerations*(kick*dt)
+
+#Accuracy parameter for the block time steps. Each body's time step is about ETA times how long its acceleration takes to change by its own size, which for a body in a circular
+#orbit works out to 2*pi/ETA (about 300) steps per orbit
+ETA = 0.02
+#Each body's time step is dt/2^level for some level from 0 to MAX_LEVEL, so the shortest time step a body can have is dt/2^MAX_LEVEL
+MAX_LEVEL = 20
+
+#Hierarchical block time steps: kick-drift-kick leapfrog, but every body has its own time step, which is dt divided by a power of two (its "level").
+#A body in a close orbit gets a short time step while the ones far away keep taking long ones, so only the bodies whose steps end at a particular moment have their accelerations calculated.
+#Because the steps are powers of two of each other, bodies on the same level all finish their steps at the same moments, and at the end of step(state,dt) every body is back in sync.
+#Time steps are chosen with an Aarseth-style criterion, ETA*|a|/|da/dt|, where da/dt comes from the change in the body's acceleration over its last step, so it doesn't need any extra force
+#calculations (before a body has a last step, ETA*|v|/|a| is used instead)
+class BlockTimestepIntegrator(Integrator):
+    adaptive = True
+
+    def __init__(self,eta=ETA,maxLevel=MAX_LEVEL):
+        Integrator.__init__(self)
+        self.eta = eta
+        self.maxLevel = maxLevel
+        self.levels = None
+
+    def getState(self):
+        values = Integrator.getState(self)
+        values.update({"eta":self.eta,"maxLevel":self.maxLevel})
+        if self.levels is not None:
+            values["levels"] = self.levels
+        return values
+
+    def setState(self,values):
+        Integrator.setState(self,values)
+        self.eta = float(values["eta"])
+        self.maxLevel = int(values["maxLevel"])
+        self.levels = values.get("levels")
+
+    def reset(self):
+        Integrator.reset(self)
+        self.levels = None
+
+    #Works out the level whose time step best fits the criterion for each of the bodies given. jerks is None when the bodies don't have a last step to estimate da/dt from
+    def chooseLevels(self,state,bodies,accelerations,jerks,dt):
+        accelerationSizes = numpy.linalg.norm(accelerations,axis=1)
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            if jerks is None:
+                wantedSteps = self.eta*numpy.linalg.norm(state.velocities[bodies],axis=1)/accelerationSizes
+            else:
+                wantedSteps = self.eta*accelerationSizes/numpy.linalg.norm(jerks,axis=1)
+            levels = numpy.ceil(numpy.log2(dt/wantedSteps))
+        #A body with no acceleration, or one that isn't changing, gets the longest time step (the NaNs and infinities from dividing by zero end up here too)
+        levels[~(levels>0)] = 0
+        return numpy.minimum(levels,self.maxLevel).astype(int)
+
+    def step(self,state,dt):
+        #Time inside the step is counted in ticks, the shortest possible time step. A body on level k takes steps of 2^(maxLevel-k) ticks
+        ticksPerStep = 2**self.maxLevel
+        tickLength = dt/ticksPerStep
+        accelerations = self.currentAccelerations(state)
+        if self.levels is None:
+            self.levels = self.chooseLevels(state,numpy.arange(state.getNumBodies()),accelerations,None,dt)
+        #Every body starts a new step at the start, so they all get their opening half kick
+        state.velocities += accelerations*((ticksPerStep>>self.levels)*tickLength/2)[:,numpy.newaxis]
+        tick = 0
+        while tick < ticksPerStep:
+            #Every body drifts forward to the next moment any of them finishes a step (drifting is cheap, it's the force calculations that are worth skipping)
+            stepTicks = ticksPerStep>>self.levels
+            nextTick = tick+numpy.min(stepTicks-tick%stepTicks)
+            state.positions += state.velocities*((nextTick-tick)*tickLength)
+            tick = nextTick
+            #The bodies finishing a step get their new accelerations and their closing half kick
+            active = numpy.flatnonzero(tick%stepTicks==0)
+            newAccelerations = state.calculateAccelerations(active)
+            state.velocities[active] += newAccelerations*(stepTicks[active]*tickLength/2)[:,numpy.newaxis]
+            #Then they choose their next time step. A body can always move to a shorter one, but it can only move to a longer one when that longer step would start now,
+            #so that it finishes in sync with the other bodies on its new level
+            jerks = (newAccelerations-accelerations[active])/(stepTicks[active]*tickLength)[:,numpy.newaxis]
+            wantedLevels = self.chooseLevels(state,active,newAccelerations,jerks,dt)
+            oldLevels = self.levels[active]
+            canMoveUp = (oldLevels>0)&(tick%(2*stepTicks[active])==0)
+            self.levels[active] = numpy.where(wantedLevels>=oldLevels,wantedLevels,numpy.where(canMoveUp,oldLevels-1,oldLevels))
+            accelerations[active] = newAccelerations
+            #and, unless this is the end of the whole step, start the next one with the opening half kick
+            if tick < ticksPerStep:
+                state.velocities[active] += newAccelerations*((ticksPerStep>>self.levels[active])*tickLength/2)[:,numpy.newaxis]
+        self.accelerations = accelerations
+
+#The names the different integrators can be chosen by
+INTEGRATORS = {"euler":EulerIntegrator,"leapfrog":LeapfrogIntegrator,"verlet":VelocityVerletIntegrator,"yoshida":YoshidaIntegrator,"block":BlockTimestepIntegrator}
+
+#The name an integrator can be chosen by, the opposite of getIntegrator
+def getIntegratorName(integrator):
+    for name,integratorClass in INTEGRATORS.items():
+        if type(integrator) is integratorClass:
+            return name
+    raise ValueError("Unknown integrator "+type(integrator).__name__)
+
+def getIntegrator(name):
+    if name not in INTEGRATORS:
+        raise ValueError("Unknown integrator \""+str(name)+"\" (expected one of: "+", ".join(INTEGRATORS)+")")
+    return INTEGRATORS[name]()
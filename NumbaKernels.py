@@ -0,0 +1,141 @@
+import types
+import numpy
+from Physics import G,DirectSolver
+try:
+    import numba
+except ImportError: #Numba is optional; without it NumbaSolver does the same calculations with NumPy
+    numba = None
+
+#Compiled versions of the direct summation kernels in Physics.py, for running systems of a few thousand bodies at many steps per second.
+#NumPy has to build an (N,N,2) array of separations (in chunks) and can't skip half of the pairs, while these loop over each pair of bodies once, using Newton's third law to give
+#both bodies their share of the force from one calculation, and spread the pairs over every CPU core. Compiling them takes a few seconds the first time they are used, and the
+#compiled code is cached next to this file after that
+
+NUMBA_AVAILABLE = numba is not None
+#Systems with fewer bodies than this are calculated on one thread, since starting up the other threads would take longer than the calculation
+PARALLEL_BODIES = 512
+
+#The kernels are written as plain Python functions and compiled twice (see compileKernel). numThreads is how many partial sums the pairs are split between: each one adds up the
+#forces from its own share of the pairs into its own row of partialSums, so no two threads ever add to the same number, and the rows are added together at the end.
+#Thread t takes rows t, t+numThreads, t+2*numThreads... of the triangle of pairs (i,j) with j > i, which gives every thread about the same number of pairs
+def pairAccelerations(positions,masses,softeningSquared,numThreads):
+    numBodies = len(masses)
+    partialSums = numpy.zeros((numThreads,numBodies,2))
+    for thread in prange(numThreads):
+        for i in range(thread,numBodies,numThreads):
+            xi,yi = positions[i,0],positions[i,1]
+            ax,ay = 0.0,0.0
+            for j in range(i+1,numBodies):
+                dx,dy = positions[j,0]-xi,positions[j,1]-yi
+                distSquared = dx*dx+dy*dy+softeningSquared
+                inverseCube = 1.0/(distSquared*numpy.sqrt(distSquared))
+                ax += masses[j]*inverseCube*dx
+                ay += masses[j]*inverseCube*dy
+                #Newton's third law: body j is pulled back towards body i just as hard
+                partialSums[thread,j,0] -= masses[i]*inverseCube*dx
+                partialSums[thread,j,1] -= masses[i]*inverseCube*dy
+            partialSums[thread,i,0] += ax
+            partialSums[thread,i,1] += ay
+    accelerations = numpy.zeros((numBodies,2))
+    for i in prange(numBodies):
+        for thread in range(numThreads):
+            accelerations[i,0] += partialSums[thread,i,0]
+            accelerations[i,1] += partialSums[thread,i,1]
+    return G*accelerations
+
+#The potentials of every body divided by its mass, split up between threads in the same way as pairAccelerations
+def pairPotentials(positions,masses,softeningSquared,numThreads):
+    numBodies = len(masses)
+    partialSums = numpy.zeros((numThreads,numBodies))
+    for thread in prange(numThreads):
+        for i in range(thread,numBodies,numThreads):
+            xi,yi = positions[i,0],positions[i,1]
+            potential = 0.0
+            for j in range(i+1,numBodies):
+                dx,dy = positions[j,0]-xi,positions[j,1]-yi
+                inverseDistance = 1.0/numpy.sqrt(dx*dx+dy*dy+softeningSquared)
+                potential += masses[j]*inverseDistance
+                partialSums[thread,j] += masses[i]*inverseDistance
+            partialSums[thread,i] += potential
+    potentials = numpy.zeros(numBodies)
+    for i in prange(numBodies):
+        for thread in range(numThreads):
+            potentials[i] += partialSums[thread,i]
+    return -G*potentials
+
+#The accelerations of just the target bodies (for the block time step integrator). Only the targets' rows of the pairs are needed, so there is no symmetry to use, and each thread
+#just takes some of the targets
+def targetAccelerations(positions,masses,targets,softeningSquared):
+    accelerations = numpy.zeros((len(targets),2))
+    for k in prange(len(targets)):
+        i = targets[k]
+        xi,yi = positions[i,0],positions[i,1]
+        ax,ay = 0.0,0.0
+        for j in range(len(masses)):
+            if j != i: #a body doesn't attract itself
+                dx,dy = positions[j,0]-xi,positions[j,1]-yi
+                distSquared = dx*dx+dy*dy+softeningSquared
+                inverseCube = 1.0/(distSquared*numpy.sqrt(distSquared))
+                ax += masses[j]*inverseCube*dx
+                ay += masses[j]*inverseCube*dy
+        accelerations[k,0] = G*ax
+        accelerations[k,1] = G*ay
+    return accelerations
+
+def targetPotentials(positions,masses,targets,softeningSquared):
+    potentials = numpy.zeros(len(targets))
+    for k in prange(len(targets)):
+        i = targets[k]
+        xi,yi = positions[i,0],positions[i,1]
+        potential = 0.0
+        for j in range(len(masses)):
+            if j != i:
+                dx,dy = positions[j,0]-xi,positions[j,1]-yi
+                potential += masses[j]/numpy.sqrt(dx*dx+dy*dy+softeningSquared)
+        potentials[k] = -G*potential
+    return potentials
+
+#Compiles kernel into a (parallel,serial) pair of versions. error_model='numpy' makes dividing by zero give infinity (and then NaN) like it does in Physics.py, instead of raising an exception.
+#Numba caches compiled code by the function's name, so the serial version is compiled from a copy with a name of its own; otherwise the two versions would load each other's code from the cache
+def compileKernel(kernel):
+    serialKernel = types.FunctionType(kernel.__code__,kernel.__globals__,kernel.__name__+"Serial")
+    serialKernel.__qualname__ = serialKernel.__name__
+    return (numba.njit(parallel=True,cache=True,error_model='numpy')(kernel),numba.njit(cache=True,error_model='numpy')(serialKernel))
+
+if NUMBA_AVAILABLE:
+    prange = numba.prange #outside of a parallel kernel, this is just range
+    KERNELS = {kernel.__name__:compileKernel(kernel) for kernel in (pairAccelerations,pairPotentials,targetAccelerations,targetPotentials)}
+else:
+    prange = range
+    KERNELS = None
+
+#Direct summation with the compiled kernels. It gives the same results as Physics.DirectSolver up to rounding (the sums are added up in a different order), and is a DirectSolver
+#that does its calculations with NumPy if Numba isn't installed, so a run set up to use it still works anywhere
+class NumbaSolver(DirectSolver):
+    name = "numba"
+
+    def calculateAccelerations(self,positions,masses,targets=None):
+        if not NUMBA_AVAILABLE:
+            return DirectSolver.calculateAccelerations(self,positions,masses,targets)
+        parallel = len(masses) >= PARALLEL_BODIES
+        if targets is None:
+            kernel = KERNELS["pairAccelerations"][0 if parallel else 1]
+            return kernel(positions,masses,float(self.softening)**2,numba.get_num_threads() if parallel else 1)
+        kernel = KERNELS["targetAccelerations"][0 if parallel else 1]
+        return kernel(positions,masses,numpy.asarray(targets,dtype=numpy.int64),float(self.softening)**2)
+
+    def calculatePotentials(self,positions,masses,targets=None):
+        if not NUMBA_AVAILABLE:
+            return DirectSolver.calculatePotentials(self,positions,masses,targets)
+        parallel = len(masses) >= PARALLEL_BODIES
+        if targets is None:
+            kernel = KERNELS["pairPotentials"][0 if parallel else 1]
+            return kernel(positions,masses,float(self.softening)**2,numba.get_num_threads() if parallel else 1)
+        kernel = KERNELS["targetPotentials"][0 if parallel else 1]
+        return kernel(positions,masses,numpy.asarray(targets,dtype=numpy.int64),float(self.softening)**2)
+
+    #The compiled passes are cheap enough that doing them one after the other is simpler than a third kernel for both
+    def calculateAccelerationsAndPotentials(self,positions,masses,targets=None):
+        if not NUMBA_AVAILABLE:
+            return DirectSolver.calculateAccelerationsAndPotentials(self,positions,masses,targets)
+        return self.calculateAccelerations(positions,masses,targets),self.calculatePotentials(positions,masses,targets)
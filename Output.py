@@ -0,0 +1,67 @@
+import os
+import numpy
+from Trajectory import TrajectoryWriter,bodySlots
+
+#The outputs a Simulation can save its results with. Every output has write(time,state), which is called after each step, and close().
+#Outputs that can carry on after a run is resumed from a checkpoint also have getCheckpoint(), which returns a dict that openOutput can open them again with
+
+#Saves the time and the positions and velocities of all the heavenly bodies to a csv file, one line per saved step. Only every "every"th step is saved.
+#Like a trajectory file, it keeps a column for every body it started with, and bodies that have been removed since are saved as nan
+#This is much slower and makes much bigger files than a trajectory file (see Trajectory.py), which can be converted to a csv file afterwards instead
+class CsvWriter:
+    def __init__(self,filename,state,every=1,resume=None):
+        self.filename = filename
+        self.every = every
+        self.slotIds = state.ids.copy() if resume is None or "ids" not in resume else numpy.array(resume["ids"],dtype=numpy.int64)
+        if resume is not None:
+            #Cuts the file back to the lines saved up to the checkpoint
+            self.stepsSeen = resume["stepsSeen"]
+            os.truncate(filename,resume["bytes"])
+            self.file = open(filename,"a")
+            return
+        self.stepsSeen = 0
+        self.file = open(filename,"w")
+        #Writes the first row of the csv file so that it can be interpreted as a spreadsheet
+        firstRow = "time,"
+        for name in state.names:
+            firstRow += name + " x pos,"
+            firstRow += name + " y pos,"
+            firstRow += name + " x vel,"
+            firstRow += name + " y vel,"
+        firstRow += "\n"
+        self.file.write(firstRow)
+
+    def write(self,time,state):
+        self.stepsSeen += 1
+        if self.stepsSeen%self.every != 0:
+            return
+        line = ""
+        line += str(time)+"," #records time
+        positions,velocities = state.positions,state.velocities
+        slots = bodySlots(self.slotIds,state)
+        if slots is not None:
+            positions = numpy.full((len(self.slotIds),2),numpy.nan)
+            velocities = numpy.full((len(self.slotIds),2),numpy.nan)
+            positions[slots] = state.positions
+            velocities[slots] = state.velocities
+        for position,velocity in zip(positions,velocities):
+            line += str(position[0]) + ","
+            line += str(position[1]) + ","
+            line += str(velocity[0]) + ","
+            line += str(velocity[1]) + ","
+        line += "\n"
+        self.file.write(line)
+
+    def getCheckpoint(self):
+        self.file.flush()
+        return {"filename":self.filename,"every":self.every,"bytes":os.path.getsize(self.filename),"stepsSeen":self.stepsSeen,"ids":self.slotIds.tolist()}
+
+    def close(self):
+        self.file.close()
+
+#Opens the right kind of output for the file name given: a csv file for .csv, and a trajectory file for anything else.
+#every is how many steps apart the saved steps are, and precision is the type trajectory files store positions and velocities as. resume is what the output's getCheckpoint returned, if it is being reopened
+def openOutput(filename,state,every=1,precision=numpy.float64,resume=None):
+    if filename.endswith(".csv"):
+        return CsvWriter(filename,state,every,resume)
+    return TrajectoryWriter(filename,state,every,precision,resume)
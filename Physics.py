@@ -0,0 +1,175 @@
+import numpy
+
+#kilogram meter second units used throughout
+G = 6.674*(10**-11)
+
+#The pairwise kernels below work on blocks of (target body, source body) pairs instead of one body at a time. CHUNK_SIZE is the largest number of pairs held in memory at once,
+#so a large system is processed a few rows at a time instead of needing an N by N array of vectors all at once
+CHUNK_SIZE = 2**20
+
+#Works out which rows of the pairwise kernels get processed together so that no block has more than chunkSize pairs in it
+def chunkRows(numTargets,numSources,chunkSize):
+    rowsPerChunk = max(1,chunkSize//max(numSources,1))
+    for start in range(0,numTargets,rowsPerChunk):
+        yield start,min(start+rowsPerChunk,numTargets)
+
+#The indices of the target bodies, as an array, for telling which (target,source) pairs are a body and itself
+def targetIndices(numBodies,targets):
+    return numpy.arange(numBodies) if targets is None else numpy.asarray(targets)
+
+#Computes the gravitational acceleration on every target body from every body in the system in one batched calculation
+#positions is an (N,2) array and masses is an (N,) array. targets is an optional array of indices of the bodies whose acceleration is wanted (all of them if it's None)
+#softening is a length added in quadrature to every distance (Plummer softening), which keeps the force between two bodies that pass very close to each other from blowing up.
+#The result is a (number of targets,2) array of accelerations
+def calculateAccelerations(positions,masses,targets=None,chunkSize=CHUNK_SIZE,softening=0.0):
+    targetPositions = positions if targets is None else positions[targets]
+    indices = targetIndices(len(masses),targets)
+    accelerations = numpy.zeros((len(targetPositions),2))
+    for start,stop in chunkRows(len(targetPositions),len(masses),chunkSize):
+        #r_vectors[i,j] points from target i to body j
+        r_vectors = positions[numpy.newaxis,:,:]-targetPositions[start:stop,numpy.newaxis,:]
+        distSquared = numpy.einsum('ijk,ijk->ij',r_vectors,r_vectors)+softening**2
+        with numpy.errstate(divide='ignore'):
+            inverseCubes = distSquared**-1.5
+        #Doesn't calculate gravitational attraction on a body from itself. This goes by index rather than by distance, so two different bodies at exactly the same place
+        #aren't silently ignored: without softening the force between them is infinite, and the result is NaN instead of quietly wrong
+        inverseCubes[numpy.arange(stop-start),indices[start:stop]] = 0
+        #Newton's Law of Universal Gravitation combined with his Second Law, summed over every body at once
+        accelerations[start:stop] = numpy.einsum('ij,ijk->ik',G*masses[numpy.newaxis,:]*inverseCubes,r_vectors)
+    return accelerations
+
+#Finds the gravitational potential energy of every target body divided by its mass, in the same batched way as calculateAccelerations
+def calculatePotentials(positions,masses,targets=None,chunkSize=CHUNK_SIZE,softening=0.0):
+    targetPositions = positions if targets is None else positions[targets]
+    indices = targetIndices(len(masses),targets)
+    potentials = numpy.zeros(len(targetPositions))
+    for start,stop in chunkRows(len(targetPositions),len(masses),chunkSize):
+        r_vectors = positions[numpy.newaxis,:,:]-targetPositions[start:stop,numpy.newaxis,:]
+        distSquared = numpy.einsum('ijk,ijk->ij',r_vectors,r_vectors)+softening**2
+        with numpy.errstate(divide='ignore'):
+            inverseDistances = distSquared**-0.5
+        inverseDistances[numpy.arange(stop-start),indices[start:stop]] = 0
+        potentials[start:stop] = -G*(inverseDistances@masses) #GPE equation based on Newton's Law of Universal Gravitation
+    return potentials
+
+#The accelerations and the potentials of the target bodies from the same pass over the pairs, which costs little more than calculateAccelerations alone.
+#Used when both are wanted at the same positions (see Diagnostics.py). The accelerations are worked out exactly as calculateAccelerations does, so they are the same to the last bit
+#and asking for the potentials doesn't change how a run turns out. Returns the (number of targets,2) accelerations and the (number of targets,) potentials
+def calculateAccelerationsAndPotentials(positions,masses,targets=None,chunkSize=CHUNK_SIZE,softening=0.0):
+    targetPositions = positions if targets is None else positions[targets]
+    indices = targetIndices(len(masses),targets)
+    accelerations = numpy.zeros((len(targetPositions),2))
+    potentials = numpy.zeros(len(targetPositions))
+    for start,stop in chunkRows(len(targetPositions),len(masses),chunkSize):
+        r_vectors = positions[numpy.newaxis,:,:]-targetPositions[start:stop,numpy.newaxis,:]
+        distSquared = numpy.einsum('ijk,ijk->ij',r_vectors,r_vectors)+softening**2
+        with numpy.errstate(divide='ignore'):
+            inverseCubes = distSquared**-1.5
+            inverseDistances = distSquared**-0.5
+        selfPairs = (numpy.arange(stop-start),indices[start:stop])
+        inverseCubes[selfPairs] = 0
+        inverseDistances[selfPairs] = 0
+        accelerations[start:stop] = numpy.einsum('ij,ijk->ik',G*masses[numpy.newaxis,:]*inverseCubes,r_vectors)
+        potentials[start:stop] = -G*(inverseDistances@masses)
+    return accelerations,potentials
+
+#The simplest gravity solver, which sums up the attraction between every pair of bodies exactly. Every solver has the same calculateAccelerations and calculatePotentials
+#methods so the rest of the program doesn't need to know which one it is using (see Solvers.py)
+class DirectSolver:
+    name = "direct"
+
+    def __init__(self,chunkSize=CHUNK_SIZE,softening=0.0):
+        self.chunkSize = chunkSize
+        self.softening = softening
+
+    def calculateAccelerations(self,positions,masses,targets=None):
+        return calculateAccelerations(positions,masses,targets,self.chunkSize,self.softening)
+
+    def calculatePotentials(self,positions,masses,targets=None):
+        return calculatePotentials(positions,masses,targets,self.chunkSize,self.softening)
+
+    def calculateAccelerationsAndPotentials(self,positions,masses,targets=None):
+        return calculateAccelerationsAndPotentials(positions,masses,targets,self.chunkSize,self.softening)
+
+#SystemState stores the whole system in contiguous arrays: positions and velocities are (N,2) arrays and masses and radii are (N,) arrays, with body i being row i of each.
+#Keeping everything together like this is what lets the force calculations above run on every body at once instead of looping over Body objects
+#solver is the object used to work out the gravitational forces, which defaults to direct summation.
+#Every body also gets an id that stays the same when other bodies are removed (when bodies collide and merge, for example), so outputs can tell which body is which
+class SystemState:
+    def __init__(self,solver=None):
+        self.solver = DirectSolver() if solver is None else solver
+        self.positions = numpy.zeros((0,2))
+        self.velocities = numpy.zeros((0,2))
+        self.masses = numpy.zeros(0)
+        self.radii = numpy.zeros(0)
+        self.names = []
+        self.colors = []
+        self.ids = numpy.zeros(0,dtype=numpy.int64)
+        self.nextId = 0
+
+    #Adds a body to the end of the arrays and returns its index
+    def addBody(self,name,color,position,velocity,mass,radius):
+        self.positions = numpy.vstack([self.positions,numpy.array(position,dtype=float)])
+        self.velocities = numpy.vstack([self.velocities,numpy.array(velocity,dtype=float)])
+        self.masses = numpy.append(self.masses,float(mass))
+        self.radii = numpy.append(self.radii,float(radius))
+        self.names.append(name)
+        self.colors.append(color)
+        self.ids = numpy.append(self.ids,self.nextId)
+        self.nextId += 1
+        return len(self.masses)-1
+
+    #Adds many bodies at once. positions and velocities are (number of bodies,2) arrays and the rest have one entry per body
+    def addBodies(self,names,colors,positions,velocities,masses,radii):
+        self.positions = numpy.concatenate([self.positions,numpy.asarray(positions,dtype=float).reshape(-1,2)])
+        self.velocities = numpy.concatenate([self.velocities,numpy.asarray(velocities,dtype=float).reshape(-1,2)])
+        self.masses = numpy.concatenate([self.masses,numpy.asarray(masses,dtype=float)])
+        self.radii = numpy.concatenate([self.radii,numpy.asarray(radii,dtype=float)])
+        self.names += list(names)
+        self.colors += list(colors)
+        numAdded = len(self.masses)-len(self.ids)
+        self.ids = numpy.concatenate([self.ids,numpy.arange(self.nextId,self.nextId+numAdded)])
+        self.nextId += numAdded
+
+    #Removes the bodies with the given indices. The bodies after them move down to fill the gaps, keeping their order (and their ids)
+    def removeBodies(self,indices):
+        keep = numpy.ones(len(self.masses),dtype=bool)
+        keep[indices] = False
+        self.positions = self.positions[keep]
+        self.velocities = self.velocities[keep]
+        self.masses = self.masses[keep]
+        self.radii = self.radii[keep]
+        self.names = [name for name,kept in zip(self.names,keep) if kept]
+        self.colors = [color for color,kept in zip(self.colors,keep) if kept]
+        self.ids = self.ids[keep]
+
+    #A separate copy of the system (sharing the same solver), so a run can start from it without changing the original
+    def copy(self):
+        state = SystemState(self.solver)
+        state.positions = self.positions.copy()
+        state.velocities = self.velocities.copy()
+        state.masses = self.masses.copy()
+        state.radii = self.radii.copy()
+        state.names = list(self.names)
+        state.colors = list(self.colors)
+        state.ids = self.ids.copy()
+        state.nextId = self.nextId
+        return state
+
+    def getNumBodies(self):
+        return len(self.masses)
+
+    def calculateAccelerations(self,targets=None):
+        return self.solver.calculateAccelerations(self.positions,self.masses,targets)
+
+    def calculatePotentials(self,targets=None):
+        return self.solver.calculatePotentials(self.positions,self.masses,targets)
+
+    def calculateAccelerationsAndPotentials(self,targets=None):
+        return self.solver.calculateAccelerationsAndPotentials(self.positions,self.masses,targets)
+
+    #The total mechanical energy of the whole system: kinetic energy plus gravitational potential energy (halved because each pair's potential energy is counted by both bodies in it)
+    def calculateTotalEnergy(self):
+        kineticEnergy = 0.5*numpy.sum(self.masses*numpy.sum(self.velocities**2,axis=1))
+        potentialEnergy = 0.5*numpy.sum(self.masses*self.calculatePotentials())
+        return kineticEnergy+potentialEnergy
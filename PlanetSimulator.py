@@ -1,52 +1,50 @@
 import pygame
 import time
-import random
 import numpy
 import math
 from datetime import datetime
-import csv
-
-#Creating and opening file that will store data produced by simulation
-filename = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")+".csv"
-file = open(filename,"w")
-
-#Defining different colors
-BLACK = (0,0,0)
-DARK_BLUE = (0,0,128)
-BLUE = (0,0,255)
-DARK_GREEN = (0,128,0)
-DARK_CYAN = (0,128,128)
-SKY_BLUE = (0,128,255)
-GREEN = (0,255,0)
-PASTEL_GREEN = (0,255,128)
-CYAN = (0,255,255)
-MAROON = (128,0,0)
-PURPLE = (128,0,128)
-ROYAL_PURPLE = (128,0,255)
-DIRTY_YELLOW = (128,128,0)
-GRAY = (128,128,128)
-PASTEL_PURPLE = (128,128,255)
-LIME_GREEN = (128,255,0)
-PALE_GREEN = (128,255,128)
-PASTEL_BLUE = (128,255,255)
-RED = (255,0,0)
-BRIGHT_PINK = (255,0,128)
-MAGENTA = (255,0,255)
-ORANGE = (255,128,0)
-PEACH = (255,128,128)
-PASTEL_PINK = (255,128,255)
-YELLOW = (255,255,0)
-CREAM = (255,255,128)
-WHITE = (255,255,255)
-
-#kilogram meter second units used throughout
-G = 6.674*(10**-11)
+import argparse
+from Physics import SystemState
+from Solvers import getSolver
+from Integrators import getIntegrator
+from Simulation import Simulation,resumeSimulation
+from Output import openOutput
+from Trajectory import TrajectoryReader
+from Snapshots import SimulationThread
+from Scenarios import COLORS,KNOWN_BODIES,PRESETS,loadSystem,getPreset
+from Collisions import CollisionHandler,RESTITUTION
+from Profiler import Profiler
+from Diagnostics import DiagnosticsMonitor
+from Streaming import StreamServer
+
+#The colors used by the window itself (every color a body can be given is in COLORS, in Scenarios.py)
+BLACK = COLORS["BLACK"]
+WHITE = COLORS["WHITE"]
+
+#kilogram meter second units used throughout (G is defined in Physics.py)
 DISTANCE_SCALE = 10**5 #meters per pixel
 RADIUS_SCALE = 10**7 #if it were to scale the planets would be too small to see (also meters per pixel)
-TIME_SCALE = 10**6 #seconds per frame
+TIME_SCALE = 10**6 #seconds per step
 INIT_TIME_SCALE = TIME_SCALE #Later used while adjusting time scale
 SCREEN_WIDTH = 1600
 SCREEN_HEIGHT = 900
+SOLVER = "direct" #"direct" sums up the gravity between every pair of bodies exactly, "barneshut" approximates far away groups of bodies so that large systems run much faster, "numba" is "direct" compiled with Numba (if it is installed)
+THETA = 0.5 #Barnes-Hut opening angle, only used by the "barneshut" solver (see the README for how it affects accuracy and speed)
+#"block" gives every body its own time step, so close orbits get short steps without slowing down everything else. The others use one time scale for every body:
+#"leapfrog", "verlet" or "yoshida" (which are symplectic, so energy errors don't build up) or "euler" (the original method)
+INTEGRATOR = "block"
+COLLISIONS = "merge" #bodies that touch are merged into one ("merge"), bounce off each other ("bounce"), or pass through each other (None)
+SOFTENING = 0 #softening length in meters, which limits the pull between bodies that pass very close to each other (see Physics.py)
+MAX_VELOCITY_CHANGE = 10**(-1) #with one time scale for every body, it is chosen so no body's velocity changes by more than this fraction per frame. The Euler integrator needs 10**(-2) to stay accurate
+REPLAY_SEEK_FRACTION = 0.05 #when replaying a saved run, the left and right arrow keys jump back or forward by this fraction of the whole run
+MAX_TRAIL_SAMPLES = 2000 #how many saved steps are used to draw the paths again after jumping to a different part of a replay
+MAX_SKIPPED_SAMPLES = 50 #when a replay skips saved steps to play faster, at most this many of the skipped steps are added to the paths each frame
+OUTPUT_EXTENSION = ".npy" #the positions and velocities are saved to a trajectory file (see Trajectory.py), or to a spreadsheet if this is ".csv" (much slower and bigger)
+PHYSICS_STEPS_PER_SECOND = None #the physics runs as fast as it can unless this limits how many steps it takes per second (for example 60 to watch a small system slowly)
+PROFILE = False #shows how long each part of a step and of a frame takes, how many force calculations each step does and the energy drift under the other text (see Profiler.py)
+DIAGNOSTICS_EVERY = 100 #the energy, momentum and angular momentum errors and the virial ratio are worked out every this many steps and shown under the other text (see Diagnostics.py), or never if this is None
+STREAM_PORT = None #set to a port number to stream the bodies to other programs while the window runs (see Streaming.py), the same as --stream
+CHECKPOINT_INTERVAL = 600 #seconds of real time between checkpoints, which are saved next to the output file and can be carried on from with --resume
 
 #Initializing pygame and creating fonts to be used later
 pygame.init()
@@ -80,436 +78,574 @@ def getSciNotation(message):
                     return answer
         except:
             pass
-#This function takes the current time and the positions and velocities of all the heavenly bodies and saves them to the file created and opened earlier in a new line using csv
-def saveData(time,bodies,file):
-    line = ""
-    line += str(time)+"," #records time
-    for body in bodies:
-        line += str(body.getPosition()[0]) + ","
-        line += str(body.getPosition()[1]) + ","
-        line += str(body.getVelocity()[0]) + ","
-        line += str(body.getVelocity()[1]) + ","
-    line += "\n"
-    file.write(line)
 
+#A Body is a thin view onto row "index" of a SystemState: its position, velocity, mass, radius, name and color all live in the state's arrays, and the Body only keeps
+#the things used for drawing it
 class Body:
-    def __init__(self,name,color,position,velocity,mass,radius):
-        self.color = color
-        self.position = numpy.array(position)
-        self.velocity = numpy.array(velocity)
-        self.mass = mass
-        self.radius = radius
-        self.energyPerMass = 0
-        self.name = name
+    def __init__(self,state,index):
+        self.state = state
+        self.index = index
+        self.id = int(state.ids[index]) #stays the same when other bodies merge and index changes
         #pastPositions is a record of where the body has been, but with positions rounded to the nearest pixel (using the DISTANCE_SCALE). A new position is only added to pastPositions
         #if it is in a different pixel. The advantage of having a list of rounded positions instead of a list of pixels is that if the DISTANCE_SCALE changes (from a body going off screen), pastPositions can be
         #used to accurately draw the body's path with the new DISTANCE_SCALE, something which would be harder if pixels were stored directly.
         self.pastPositions = []
         #As mentioned above, a new position is only added to pastPositions if that position is in a different pixel. The pixels which the body has already covered are stored in pixelsAlreadyCovered so that
-        #a new position can be added to pastPositions only when that position is in a different pixel.
-        self.pixelsAlreadyCovered = []
-        self.nameTag = font.render(self.name,True,self.color,(0,0,0)) # to display the name of the body
-        self.nameRect = self.nameTag.get_rect()
-        self.nameRect.center = (int(self.position[0]/DISTANCE_SCALE),int(self.position[1]/DISTANCE_SCALE)-10)
+        #a new position can be added to pastPositions only when that position is in a different pixel. It is a set, so checking a pixel takes the same time however long the path is
+        self.pixelsAlreadyCovered = set()
+        #How many of pastPositions have already been drawn onto the TrailLayer
+        self.drawnPoints = 0
+        self.nameTag = font.render(self.getName(),True,self.getColor(),(0,0,0)) # to display the name of the body
+        self.nameRect = self.nameTag.get_rect() #placed by drawName every time the name is drawn, since the body may not fit on the screen until scaleToFit has run
 
     def getPosition(self):
-        return self.position
+        return self.state.positions[self.index]
 
     def setPosition(self,position):
-        self.position = position
+        self.state.positions[self.index] = position
 
     def getVelocity(self):
-        return self.velocity
+        return self.state.velocities[self.index]
 
     def setVelocity(self,velocity):
-        self.velocity = velocity
+        self.state.velocities[self.index] = velocity
 
     def getMass(self):
-        return self.mass
+        return self.state.masses[self.index]
 
     def getRadius(self):
-        return self.radius
-
-#Later, mechanical energy per mass is used to adjust the speeds of the different bodies in accordance with conservation of energy
-    def getEnergyPerMass(self):
-        return self.energyPerMass
+        return self.state.radii[self.index]
 
-    def setEnergyPerMass(self,energyPerMass):
-        self.energyPerMass = energyPerMass
+    def getColor(self):
+        return self.state.colors[self.index]
 
     def getName(self):
-        return self.name
+        return self.state.names[self.index]
 
     def setName(self,name):
-        self.name = name
-
-#Finds the gravitational potential energy of the body divided by its mass
-    def findGPEPerMass(self,bodies):
-        answer = 0
-        for otherbody in bodies:
-            if not distTwoPoints(self.position,otherbody.getPosition()) == 0:
-                distance = distTwoPoints(self.position,otherbody.getPosition())
-                answer -= G*otherbody.getMass()/distance #GPE equation based on Newton's Law of Universal Gravitation
-        return answer
-
-    def findEnergyPerMass(self,bodies):
-        answer = 0
-        answer += 0.5*numpy.linalg.norm(self.getVelocity())**2
-        answer += self.findGPEPerMass(bodies)
-        #This summed up the GPE divided by the mass and the kinetic energy divided by the mass
-        return answer
-    
+        self.state.names[self.index] = name
+
     def drawBody(self,screen):
         #When drawing the bodies, SCREEN_WIDTH/2 and SCREEN_HEIGHT/2 are added to the pixel values. This is because
         #(0,0) in pygame refers to the top left of the screen (positive y direction is down), so adding those values
         #moves the origin used by the position variables to the center of the screen
-        x = int(self.position[0]/DISTANCE_SCALE+SCREEN_WIDTH/2)
-        y = int(self.position[1]/DISTANCE_SCALE+SCREEN_HEIGHT/2)
-        pygame.draw.circle(screen,self.color,(x,y),int(self.radius/RADIUS_SCALE))
+        x = int(self.getPosition()[0]/DISTANCE_SCALE+SCREEN_WIDTH/2)
+        y = int(self.getPosition()[1]/DISTANCE_SCALE+SCREEN_HEIGHT/2)
+        return pygame.draw.circle(screen,self.getColor(),(x,y),int(self.getRadius()/RADIUS_SCALE)) #the rectangle drawn in
 
+    #The acceleration of just this body. The main loop uses state.calculateAccelerations() instead to get every body's acceleration at once
     def calculateAcceleration(self,bodies):
-        acceleration = numpy.array([0,0])
-        for body in bodies:
-            if not distTwoPoints(self.position,body.getPosition()) == 0: #Doesn't calculate gravitational attraction on body from itself
-                #Newton's Law of Universal Gravitation combined with his Second Law
-                distance = distTwoPoints(self.position,body.getPosition())
-                r_vector = diffTwoPoints(body.getPosition(),self.position)
-                accelContribution = numpy.multiply(G*body.getMass()/(distance**3),r_vector)
-                acceleration = acceleration + accelContribution #sums up contributions from all the bodies
-        return acceleration
+        return self.state.calculateAccelerations([self.index])[0]
+
+    #Whether the body is there to be shown. A replay of a run where bodies merged has NaN for the positions of the bodies that had merged into others by then
+    def isShown(self):
+        return not numpy.isnan(self.getPosition()[0])
 
     #This function adds the body's position (having been rounded to the nearest pixel) to the pastPositions list and adds the pixel covered to pixelsAlreadyCovered, but only if the pixel hasn't already been covered
     def recordPosition(self):
-        roundedPosition = numpy.array([DISTANCE_SCALE*int(self.position[0]/(DISTANCE_SCALE)),DISTANCE_SCALE*int(self.position[1]/(DISTANCE_SCALE))])
-        pixelCovered = (int(self.position[0]/DISTANCE_SCALE),int(self.position[1]/DISTANCE_SCALE))
+        position = self.getPosition()
+        if numpy.isnan(position[0]):
+            return
+        roundedPosition = numpy.array([DISTANCE_SCALE*int(position[0]/(DISTANCE_SCALE)),DISTANCE_SCALE*int(position[1]/(DISTANCE_SCALE))])
+        pixelCovered = (int(position[0]/DISTANCE_SCALE),int(position[1]/DISTANCE_SCALE))
         if not pixelCovered in self.pixelsAlreadyCovered:
             self.pastPositions.append(roundedPosition)
-            self.pixelsAlreadyCovered.append(pixelCovered)
-
-    #This function is used when the DISTANCE_SCALE changes. A pixel which was once covered by the body's path may no longer be covered
-    def clearPixelsAlreadyCovered(self):
-        self.pixelsAlreadyCovered = []
+            self.pixelsAlreadyCovered.add(pixelCovered)
 
-    #uses pastPositions to draw the path of the body on the screen
-    def drawPath(self,screen):
-        for point in self.pastPositions:
-            x = int(point[0]/DISTANCE_SCALE+SCREEN_WIDTH/2)
-            y = int(point[1]/DISTANCE_SCALE+SCREEN_HEIGHT/2)
-            pygame.draw.circle(screen,self.color,(x,y),1)
+    #Forgets the whole path, used when a replay jumps to a different time
+    def clearPath(self):
+        self.pastPositions = []
+        self.pixelsAlreadyCovered = set()
+        self.drawnPoints = 0
+
+    #This function is used when the DISTANCE_SCALE changes. The positions in pastPositions are rounded to the new pixels, and the ones that now fall in the same pixel are merged,
+    #so the path never has more points than the pixels it covers. The whole path then needs drawing again
+    def rescalePath(self):
+        if len(self.pastPositions) > 0:
+            pixels = (numpy.array(self.pastPositions)/DISTANCE_SCALE).astype(int)
+            self.pixelsAlreadyCovered = set(zip(pixels[:,0].tolist(),pixels[:,1].tolist()))
+            self.pastPositions = list(numpy.array(list(self.pixelsAlreadyCovered))*DISTANCE_SCALE)
+        else:
+            self.pixelsAlreadyCovered = set()
+        self.drawnPoints = 0
+
+    #Draws the points added to pastPositions since the last time this was called onto surface (the TrailLayer's), all at once with drawDots so that drawing a whole path again after
+    #the scale changes is quick too. Returns the rectangle the new points are in, or None if there weren't any
+    def drawNewPoints(self,surface):
+        rect = None
+        if self.drawnPoints < len(self.pastPositions):
+            points = numpy.array(self.pastPositions[self.drawnPoints:])
+            rect = drawDots(surface,(points[:,0]/DISTANCE_SCALE+SCREEN_WIDTH/2).astype(int),(points[:,1]/DISTANCE_SCALE+SCREEN_HEIGHT/2).astype(int),self.getColor())
+        self.drawnPoints = len(self.pastPositions)
+        return rect
 
     #animates the names of the bodies displayed on screen
     def drawName(self,screen):
-        self.nameRect.center = (int(self.position[0]/DISTANCE_SCALE+SCREEN_WIDTH/2),int(self.position[1]/DISTANCE_SCALE-10+SCREEN_HEIGHT/2))
-        screen.blit(self.nameTag,self.nameRect)
-
-#This section of code is how the user determines the number of bodies and the properties of each
-addingBodies = True
-bodies = [] #creates the bodies list, which is where all of the bodies are stored
-print("Welcome to the n-body simulator!")
-print("All data should be inputted and will be stored in m/k/s units :)")
-print("The positive x direction is rightward, and the positive y direction is downward.")
-print("The first body added to the system will start at the center of the screen.")
-while addingBodies: #while loop runs until the user says to stop adding more bodies to the system
-    continuing = input("Would you like to add a body to the system? (yes or no): ")
-    if continuing == "no":
-        addingBodies = False
-    if continuing == "yes":
-        name = str(input("Name (The names \"Sun\", \"Mercury\", \"Venus\", \"Earth\", \"Mars\", \"Jupiter\", \"Saturn\", \"Uranus\", or \"Neptune\" will automatically fill in the masses and radii of those bodies): "))
-        validColorMode = False
-        while not validColorMode: #While loop that gets which metho the user would like to use to enter a color and acts on the user's choice
-            colorMode = input("Would you like to use a color word or an RGB value? (word or rgb): ")
-            if colorMode == "word":
-                validColorMode = True
-                validColor = False
-                while not validColor: #While loop that gets the name of a color coded into the system from the user
-                    color = input("What color? (BLACK, DARK_BLUE, BLUE, DARK_GREEN, DARK_CYAN, SKY_BLUE, GREEN, PASTEL_GREEN, CYAN, MAROON, PURPLE, ROYAL_PURPLE, DIRTY_YELLOW, GRAY, PASTEL_PURPLE, LIME_GREEN, PALE_GREEN, PASTEL_BLUE, RED, BRIGHT_PINK, MAGENTA, ORANGE, PEACH, PASTEL_PINK, YELLOW, CREAM, or WHITE): ")
-                    if color == "BLACK":
-                        color = BLACK
-                        validColor = True
-                    if color == "DARK_BLUE":
-                        color = DARK_BLUE
-                        validColor = True
-                    if color == "BLUE":
-                        color = BLUE
-                        validColor = True
-                    if color == "DARK_GREEN":
-                        color = DARK_GREEN
-                        validColor = True
-                    if color == "DARK_CYAN":
-                        color = DARK_CYAN
-                        validColor = True
-                    if color == "SKY_BLUE":
-                        color = SKY_BLUE
-                        validColor = True
-                    if color == "GREEN":
-                        color = GREEN
-                        validColor = True
-                    if color == "PASTEL_GREEN":
-                        color = PASTEL_GREEN
-                        validColor = True
-                    if color == "CYAN":
-                        color = CYAN
-                        validColor = True
-                    if color == "MAROON":
-                        color = MAROON
-                        validColor = True
-                    if color == "PURPLE":
-                        color = PURPLE
-                        validColor = True
-                    if color == "ROYAL_PURPLE":
-                        color = ROYAL_PURPLE
-                        validColor = True
-                    if color == "DIRTY_YELLOW":
-                        color = DIRTY_YELLOW
-                        validColor = True
-                    if color == "GRAY":
-                        color = GRAY
-                        validColor = True
-                    if color == "PASTEL_PURPLE":
-                        color = PASTEL_PURPLE
-                        validColor = True
-                    if color == "LIME_GREEN":
-                        color = LIME_GREEN
-                        validColor = True
-                    if color == "PALE_GREEN":
-                        color = PALE_GREEN
-                        validColor = True
-                    if color == "PASTEL_BLUE":
-                        color = PASTEL_BLUE
-                        validColor = True
-                    if color == "RED":
-                        color = RED
-                        validColor = True
-                    if color == "BRIGHT_PINK":
-                        color = BRIGHT_PINK
-                        validColor = True
-                    if color == "MAGENTA":
-                        color = MAGENTA
-                        validColor = True
-                    if color == "ORANGE":
-                        color = ORANGE
-                        validColor = True
-                    if color == "PEACH":
-                        color = PEACH
-                        validColor = True
-                    if color == "PASTEL_PINK":
-                        color = PASTEL_PINK
-                        validColor = True
-                    if color == "YELLOW":
-                        color = YELLOW
-                        validColor = True
-                    if color == "CREAM":
-                        color = CREAM
-                        validColor = True
-                    if color == "WHITE":
-                        color = WHITE
-                        validColor = True
-            if colorMode == "rgb":
-                validColorMode = True
-                validColor = False
-                while not validColor: #loop that gets a valid RGB triple from the user
-                    color = tuple(input("What color? (input as a tuple, e.g. (234,156,83): "))
-                    if color[0] >= 0 and color[0] <= 255 and color[1] >= 0 and color[1] <= 255 and color[2] >= 0 and color[2] <= 255:
-                        validColor = True
-        if len(bodies) == 0: #Sets the first body the user entered to have position [0,0]
-            position = [0,0]
-        #gets position of body from  user
-        else:
-            position = [getSciNotation("Input initial x position of the body (relative to first body)"),getSciNotation("Input initial y position of the body (relative to first body)")]
-        velocity = [getSciNotation("Input initial x velocity of the body"),getSciNotation("Input initial y velocity of the body")] #gets velocity from user
-        #The following lines set the mass and radius of the body if the user used one of the reserved words from bodies in our solar system
-        if name == "Sun":
-            mass = 1.989*(10**30)
-            radius = 696.34*(10**6)
-        elif name == "Mercury":
-            mass = 3.285*(10**23)
-            radius = 2.4397*(10**6)
-        elif name == "Venus":
-            mass = 4.867*(10**24)
-            radius = 6.0518*(10**6)
-        elif name == "Earth":
-            mass = 5.972*(10**24)
-            radius = 6.371*(10**6)
-        elif name == "Mars":
-            mass = 6.39*(10**23)
-            radius = 3.3895*(10**6)
-        elif name == "Jupiter":
-            mass = 1.898*(10**27)
-            radius = 69.911*(10**6)
-        elif name == "Saturn":
-            mass = 5.683*(10**26)
-            radius = 58.232*(10**6)
-        elif name == "Uranus":
-            mass = 8.681*(10**25)
-            radius = 25.362*(10**6)
-        elif name == "Neptune":
-            mass = 1.024*(10**26)
-            radius = 24.622*(10**6)
-        #If the user didn't used a reserved word, this gets the mass and radius from the user
-        else:
-            mass = getSciNotation("Mass: ")
-            radius = getSciNotation("Radius: ")
-        bodies.append(Body(name,color,position,velocity,mass,radius)) #A new body is appended to the list
-
-#Writes the first row of the csv file so that it can be interpreted as a spreadsheet
-firstRow = "time,"
-for body in bodies:
-    firstRow += body.getName() + " x pos,"
-    firstRow += body.getName() + " y pos,"
-    firstRow += body.getName() + " x vel,"
-    firstRow += body.getName() + " y vel,"
-firstRow += "\n"
-file.write(firstRow)
+        position = self.getPosition()
+        self.nameRect.center = (int(position[0]/DISTANCE_SCALE+SCREEN_WIDTH/2),int(position[1]/DISTANCE_SCALE-10+SCREEN_HEIGHT/2))
+        return screen.blit(self.nameTag,self.nameRect)
+
+#This function is how the user determines the number of bodies and the properties of each. The bodies are added to state, and the list of them is returned
+def getBodiesFromUser(state):
+    addingBodies = True
+    bodies = [] #creates the bodies list, which is where all of the bodies are stored
+    print("Welcome to the n-body simulator!")
+    print("All data should be inputted and will be stored in m/k/s units :)")
+    print("The positive x direction is rightward, and the positive y direction is downward.")
+    print("The first body added to the system will start at the center of the screen.")
+    while addingBodies: #while loop runs until the user says to stop adding more bodies to the system
+        continuing = input("Would you like to add a body to the system? (yes or no): ")
+        if continuing == "no":
+            addingBodies = False
+        if continuing == "yes":
+            name = str(input("Name (The names "+", ".join("\""+knownName+"\"" for knownName in KNOWN_BODIES)+" will automatically fill in the masses and radii of those bodies): "))
+            validColorMode = False
+            while not validColorMode: #While loop that gets which metho the user would like to use to enter a color and acts on the user's choice
+                colorMode = input("Would you like to use a color word or an RGB value? (word or rgb): ")
+                if colorMode == "word":
+                    validColorMode = True
+                    validColor = False
+                    while not validColor: #While loop that gets the name of a color coded into the system from the user
+                        color = input("What color? ("+", ".join(COLORS)+"): ")
+                        if color in COLORS:
+                            color = COLORS[color]
+                            validColor = True
+                if colorMode == "rgb":
+                    validColorMode = True
+                    validColor = False
+                    while not validColor: #loop that gets a valid RGB triple from the user
+                        color = tuple(input("What color? (input as a tuple, e.g. (234,156,83): "))
+                        if color[0] >= 0 and color[0] <= 255 and color[1] >= 0 and color[1] <= 255 and color[2] >= 0 and color[2] <= 255:
+                            validColor = True
+            if len(bodies) == 0: #Sets the first body the user entered to have position [0,0]
+                position = [0,0]
+            #gets position of body from  user
+            else:
+                position = [getSciNotation("Input initial x position of the body (relative to first body)"),getSciNotation("Input initial y position of the body (relative to first body)")]
+            velocity = [getSciNotation("Input initial x velocity of the body"),getSciNotation("Input initial y velocity of the body")] #gets velocity from user
+            #Sets the mass and radius of the body if the user used one of the reserved words from bodies in our solar system
+            if name in KNOWN_BODIES:
+                mass,radius = KNOWN_BODIES[name]
+            #If the user didn't used a reserved word, this gets the mass and radius from the user
+            else:
+                mass = getSciNotation("Mass: ")
+                radius = getSciNotation("Radius: ")
+            bodies.append(Body(state,state.addBody(name,color,position,velocity,mass,radius))) #A new body is added to the state and appended to the list
+    return bodies
 
 #The program should be able to display systems of very different sizes, so this adjusts the DISTANCE_SCALE such that every body in the system is within a quarter of the screen width horizontally and a quarter of the screen height vertically of the origin
-scaledWell = False
-while not scaledWell: #loop that runs until the conditions are met
-    scaledWell = True
+def scaleToFit(bodies):
+    global DISTANCE_SCALE
+    bodies = [body for body in bodies if body.isShown()]
+    scaledWell = False
+    while not scaledWell: #loop that runs until the conditions are met
+        scaledWell = True
+        for body in bodies:
+            if not (body.getPosition()[0]/DISTANCE_SCALE > -SCREEN_WIDTH/4 and body.getPosition()[0]/DISTANCE_SCALE < SCREEN_WIDTH/4 and body.getPosition()[1]/DISTANCE_SCALE > -SCREEN_HEIGHT/4 and body.getPosition()[1]/DISTANCE_SCALE < SCREEN_HEIGHT/4):
+                scaledWell = False
+        if scaledWell == False:
+            DISTANCE_SCALE = DISTANCE_SCALE*10 #increases DISTANCE_SCALE if conditions aren't met
+            print("Distance scale adjusted to "+str(DISTANCE_SCALE)+"meters per pixel")
+        elif (body.getPosition()[0]/DISTANCE_SCALE > -SCREEN_WIDTH/40 and body.getPosition()[0]/DISTANCE_SCALE < SCREEN_WIDTH/40 and body.getPosition()[1]/DISTANCE_SCALE > -SCREEN_HEIGHT/40 and body.getPosition()[1]/DISTANCE_SCALE < SCREEN_HEIGHT/40):
+            DISTANCE_SCALE = DISTANCE_SCALE/10 #If the bodies are all very close together close to the origin, DISTANCE_SCALE is reduced
+            print("Distance scale adjusted to "+str(DISTANCE_SCALE)+"meters per pixel")
+
+#generate stars to make pretty background. Every pixel away from the edges of the screen has a 1 in 300 chance of being a star, as long as none of the pixels next to it is one.
+#All of the pixels are worked out at once with numpy instead of one at a time. Returns the (x,y) coordinates of every star as an (n,2) array
+def generateStars():
+    isCandidate = numpy.zeros((SCREEN_WIDTH+1,SCREEN_HEIGHT+1),dtype=bool)
+    isCandidate[1:SCREEN_WIDTH,1:SCREEN_HEIGHT] = numpy.random.randint(1,301,(SCREEN_WIDTH-1,SCREEN_HEIGHT-1)) == 300
+    #Going through the pixels column by column, a star can't be placed next to one that was placed before it. So a candidate is left out if any of the neighbors that come
+    #before it (the three in the column to its left, and the one above it) is a candidate too
+    padded = numpy.pad(isCandidate,1)
+    hasEarlierNeighbor = padded[:-2,:-2]|padded[:-2,1:-1]|padded[:-2,2:]|padded[1:-1,:-2]
+    return numpy.argwhere(isCandidate&~hasEarlierNeighbor)
+
+#Sets a 2 by 2 pixel dot (the same as pygame.draw.circle draws with a radius of 1) centered on each of the pixels (x[i],y[i]) of surface, all at once in the surface's pixel array.
+#Returns the rectangle the dots are in
+def drawDots(surface,x,y,color):
+    width,height = surface.get_size()
+    pixels = pygame.surfarray.pixels3d(surface)
+    for dotX,dotY in ((x-1,y-1),(x-1,y),(x,y-1),(x,y)):
+        onScreen = (dotX>=0)&(dotX<width)&(dotY>=0)&(dotY<height)
+        pixels[dotX[onScreen],dotY[onScreen]] = color
+    del pixels #the surface is locked until the pixel array is deleted
+    return pygame.Rect(int(x.min())-1,int(y.min())-1,int(x.max()-x.min())+2,int(y.max()-y.min())+2)
+
+#checks if any of the bodies have drifted off-screen, and if any of them have, DISTANCE_SCALE is adjusted so that they are all on screen again
+def zoomOutIfOffScreen(bodies):
+    global DISTANCE_SCALE
+    offScreen = False
     for body in bodies:
-        if not (body.getPosition()[0]/DISTANCE_SCALE > -SCREEN_WIDTH/4 and body.getPosition()[0]/DISTANCE_SCALE < SCREEN_WIDTH/4 and body.getPosition()[1]/DISTANCE_SCALE > -SCREEN_HEIGHT/4 and body.getPosition()[1]/DISTANCE_SCALE < SCREEN_HEIGHT/4):
-            scaledWell = False
-    if scaledWell == False:
-        DISTANCE_SCALE = DISTANCE_SCALE*10 #increases DISTANCE_SCALE if conditions aren't met
-        print("Distance scale adjusted to "+str(DISTANCE_SCALE)+"meters per pixel")
-    elif (body.getPosition()[0]/DISTANCE_SCALE > -SCREEN_WIDTH/40 and body.getPosition()[0]/DISTANCE_SCALE < SCREEN_WIDTH/40 and body.getPosition()[1]/DISTANCE_SCALE > -SCREEN_HEIGHT/40 and body.getPosition()[1]/DISTANCE_SCALE < SCREEN_HEIGHT/40):
-        DISTANCE_SCALE = DISTANCE_SCALE/10 #If the bodies are all very close together close to the origin, DISTANCE_SCALE is reduced
-        print("Distance scale adjusted to "+str(DISTANCE_SCALE)+"meters per pixel")
-
-running = True #Variable for simulation loop
-simTime=0 #keeps track of how long the simulation has been running for
-timeA = time.time() #timeA and timeB are used to keep track of the frame rate later on
-
-#calculate initial total mechanicalenergy of each body divided by the body's mass
-for body in bodies:
-    body.setEnergyPerMass(body.findEnergyPerMass(bodies))
-
-#generate stars to make pretty background
-stars = []
-isStar = []
-for x in range(0,SCREEN_WIDTH+1):
-    newRow = []
-    for y in range(0,SCREEN_HEIGHT+1):
-        newRow.append(False)
-    isStar.append(newRow)
-#isStar is a 2D array that shows that for every pixel on the screen, it doesn't have a star (hence "False")
-for x in range(1,SCREEN_WIDTH):
-    for y in range(1,SCREEN_HEIGHT):
-        #If the die roll is the right number and there are no adjacent pixels which are stars, a pixel is designated as a star
-        dieRoll = random.randint(1,300)
-        if dieRoll == 300:
-            if not (isStar[x-1][y-1] or isStar[x-1][y] or isStar[x-1][y+1] or isStar[x][y-1] or isStar[x][y+1] or isStar[x+1][y-1] or isStar[x+1][y] or isStar[x+1][y+1]):
-                isStar[x][y] = True
-for x in range(1,SCREEN_WIDTH):
-    for y in range(1,SCREEN_HEIGHT):
-        if isStar[x][y]:
-            stars.append((x,y)) #stars is now an array with the (x,y) coordinates of every star
-
-screen = pygame.display.set_mode([SCREEN_WIDTH,SCREEN_HEIGHT])
-lastShownPositions = [] #used in determining whether the screen needs to be updated, which is only when the bodies have moved enough from their last animated position for the difference to be visible
-
-while running: #main simulation loop, which contains the animation code as well
-
-    for event in pygame.event.get(): #makes the program exit the simulation loop if the X in the top-right corner of the window is clicked
-        if event.type == pygame.QUIT:
-            running = False
+        if body.getPosition()[0]/DISTANCE_SCALE < -SCREEN_WIDTH/2 or body.getPosition()[0]/DISTANCE_SCALE > SCREEN_WIDTH/2 or body.getPosition()[1]/DISTANCE_SCALE < -SCREEN_HEIGHT/2 or body.getPosition()[1]/DISTANCE_SCALE > SCREEN_HEIGHT/2:
+            offScreen = True
+    if offScreen:
+        DISTANCE_SCALE = DISTANCE_SCALE*10 #the TrailLayer notices the change and rescales the paths
+
+#The paths of the bodies are drawn onto a surface of their own that is kept from frame to frame, so each frame only the points added since the last one need to be drawn,
+#instead of every point the bodies have ever passed through. Everything is only drawn again when the DISTANCE_SCALE changes (or after reset(), when the paths have been cleared)
+class TrailLayer:
+    def __init__(self):
+        self.surface = pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT),0,32)
+        self.surface.set_colorkey(BLACK) #the black parts are see-through, so the stars and bodies show underneath
+        self.distanceScale = None
+
+    def reset(self):
+        self.distanceScale = None
+
+    #Draws the new points of the bodies' paths. Returns the rectangles that changed, or None if the whole surface was drawn again
+    def update(self,bodies):
+        if self.distanceScale != DISTANCE_SCALE:
+            self.surface.fill(BLACK)
+            for body in bodies:
+                body.rescalePath()
+                body.drawNewPoints(self.surface)
+            self.distanceScale = DISTANCE_SCALE
+            return None
+        changedRects = [body.drawNewPoints(self.surface) for body in bodies]
+        return [rect for rect in changedRects if rect is not None]
+
+#Draws the scene (the stars, the bodies, their paths and their name tags) and the text on top of it, and only sends the parts of the screen that changed to the display.
+#The stars are drawn once onto a background surface and the paths are kept on the TrailLayer's surface, so whatever was under last frame's bodies, name tags and text can be put back
+#by copying those rectangles from them, instead of drawing the whole screen again every frame. Everything is drawn again when the paths are (after the DISTANCE_SCALE changes)
+class Renderer:
+    def __init__(self):
+        self.screen = pygame.display.set_mode([SCREEN_WIDTH,SCREEN_HEIGHT])
+        self.screenRect = self.screen.get_rect()
+        self.background = pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT),0,32) #black, with the stars drawn on it
+        stars = generateStars()
+        drawDots(self.background,stars[:,0],stars[:,1],WHITE)
+        self.trails = TrailLayer()
+        self.drawnRects = [] #the rectangles drawn on top of the background and paths this frame
+        self.changedRects = None #the rectangles of the screen that have changed since the last frame, or None if all of it has
+
+    #Forgets the paths drawn so far, used after the bodies' paths have been cleared
+    def reset(self):
+        self.trails.reset()
+
+    def drawScene(self,bodies):
+        newPathRects = self.trails.update(bodies)
+        if newPathRects is None:
+            self.screen.blit(self.background,(0,0))
+            self.screen.blit(self.trails.surface,(0,0))
+            self.changedRects = None
+        else:
+            #Puts back the background and paths under everything drawn last frame, and draws the new parts of the paths
+            self.changedRects = self.drawnRects+[rect.clip(self.screenRect) for rect in newPathRects]
+            for rect in self.changedRects:
+                self.screen.blit(self.background,rect,rect)
+                self.screen.blit(self.trails.surface,rect,rect)
+        self.drawnRects = []
+        bodies = [body for body in bodies if body.isShown()]
+        for body in bodies: #draws bodies, with their paths on top of them
+            rect = body.drawBody(self.screen).clip(self.screenRect)
+            self.screen.blit(self.trails.surface,rect,rect)
+            self.drawnRects.append(rect)
+        for body in bodies: #draws their name tags
+            self.drawnRects.append(body.drawName(self.screen).clip(self.screenRect))
+
+    #Draws text (or any other surface) on top of the scene
+    def blit(self,surface,position):
+        self.drawnRects.append(self.screen.blit(surface,position).clip(self.screenRect))
+
+    #Shows everything drawn this frame, only updating the parts of the display that changed
+    def show(self):
+        if self.changedRects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.changedRects+self.drawnRects)
+
+#How long the next step should be, which is called on the simulation thread before every step.
+#The block time step integrator picks every body's time step itself, so each step is always the simulation's dt long. Otherwise the time scale has to be small enough for the fastest changing body.
+#The simulation's dt (rather than INIT_TIME_SCALE) is used so that a resumed run steps the same way the original one did
+def chooseTimeScale(simulation):
+    global TIME_SCALE
+    if simulation.integrator.adaptive:
+        return simulation.dt
+    state = simulation.state
+    #The accelerations at the current positions. The integrator already worked these out at the end of its last step, so this doesn't need another force calculation
+    accelerations = simulation.integrator.currentAccelerations(state)
     #Adjusts time scale. If the time scale is too fast, the bodies will essentially "skip around" too much and the results won't be realistic (we need a small delta-t)
-    #So the program adjust the time scale such that no body's delta-v during the time interval used is more than 1% its prior velocity (if its prior velocity is at least 100 m/s)
+    #So the program adjust the time scale such that no body's delta-v during the time interval used is more than MAX_VELOCITY_CHANGE times its prior velocity (if its prior velocity is at least 100 m/s)
     previousTimeScale = TIME_SCALE
-    TIME_SCALE = INIT_TIME_SCALE #Uses 10^6 seconds as a baseline delta-t
-    for body in bodies:
-        oldspeed = numpy.linalg.norm(body.getVelocity())
-        if oldspeed>100:
-            tooFast=True
-            while tooFast:
-                accelmag = numpy.linalg.norm(body.calculateAcceleration(bodies))
-                if TIME_SCALE*accelmag/oldspeed >= 10**(-2): #Ensure delta v is less than one percent of previous velocity
-                    TIME_SCALE = TIME_SCALE/10
-                else:
-                    tooFast = False
+    timeScale = simulation.dt #Uses the starting time scale (10^6 seconds unless a scenario gives another) as a baseline delta-t
+    oldspeeds = numpy.linalg.norm(state.velocities,axis=1)
+    movingBodies = oldspeeds>100
+    accelmags = numpy.linalg.norm(accelerations[movingBodies],axis=1)
+    while numpy.any(timeScale*accelmags/oldspeeds[movingBodies] >= MAX_VELOCITY_CHANGE):
+        timeScale = timeScale/10
+    TIME_SCALE = timeScale
     if TIME_SCALE != previousTimeScale:
-        print("Changed time scale to: "+str(TIME_SCALE)+" seconds per frame from "+str(previousTimeScale)) #notifies user of change to time scale
-
-    simTime += TIME_SCALE #updates counter of time that has passed since start of simulation
+        print("Changed time scale to: "+str(TIME_SCALE)+" seconds per step from "+str(previousTimeScale)) #notifies user of change to time scale
+    return TIME_SCALE
+
+#The main simulation loop, which shows the simulation as it runs until the window is closed. This is the only part of the simulator that needs pygame; Simulation.py can run the same physics without a window.
+#The physics runs on a SimulationThread (see Snapshots.py) as fast as it can, whatever the frame rate is, and each frame the window shows the latest positions it has published,
+#interpolated between the last two so the bodies move smoothly. The bodies are moved over to a copy of the state that only the window uses, so drawing never reads the arrays while the thread is changing them.
+#When bodies merge, the bodies list is changed in place to the ones that are left (see updateBodies)
+def runViewer(simulation,bodies):
+    running = True #Variable for simulation loop
+    displayState = simulation.state.copy()
     for body in bodies:
-        #change velocities such that new velocity equals old velocity plus (acceleration times delta-t)
-        body.setVelocity(body.getVelocity()+numpy.multiply(body.calculateAcceleration(bodies),TIME_SCALE))
-        #changes positions so that new position equals old position plus (velocity times delta-t)
-        body.setPosition(body.getPosition()+numpy.multiply(body.getVelocity(),TIME_SCALE))
-        #Because only a conservative force (gravity) acts on the bodies, their total mechanical energy must stay the same. If it hasn't, something went a bit wrong, so the program
-        #adjusts their speeds to maintain conservation of energy. The formulae are easier to work with if one takes total mechanical energy divided by mass, and the masses are also constant, so this is fine to use
-        newEPM = body.findEnergyPerMass(bodies)
-        if not newEPM == body.getEnergyPerMass():
-            correctSpeed = (2*(body.getEnergyPerMass()-body.findGPEPerMass(bodies)))**0.5 #If the total mechanical energy divided by the mass isn't the same, it calculates what the speed should be to make it the same
-            if not math.isnan(correctSpeed): #for some reason there was a NaN error before, so this avoids it
-                uncorrectedSpeed = numpy.linalg.norm(body.getVelocity())
-                correctionFactor = correctSpeed/uncorrectedSpeed #Figures out by what factor the speed must change to maintain conservation of energy
-                body.setVelocity(numpy.multiply(body.getVelocity(),correctionFactor)) #multiplies the velocity by that factor
-        body.recordPosition() #this function is explained where it is defined
-
-    saveData(simTime,bodies,file) #Each time the simulation loop runs, this saves the positions and velocities of all the bodies to the csv file created earlier
-
-    #Rounds positions to nearest pixel. Then, if the pixels occupied by the bodies are different from the last time the screen was updated, the screen will be updated to show the movement
-    currentPositions = []
+        body.state = displayState
+    renderer = Renderer()
+    clock = pygame.time.Clock()
+    lastShownPositions = None #used in determining whether the screen needs to be updated, which is only when the bodies have moved enough from their last animated position for the difference to be visible
+    speedTime = time.monotonic() #the real time and simulation time the speed shown on screen was last worked out at
+    speedSimulationTime = simulation.time
+    realSpeed = 0
+    physics = SimulationThread(simulation,chooseTimeScale,PHYSICS_STEPS_PER_SECOND)
+    bodiesShown = physics.snapshots.latestBodies()[0]
+    #The physics and the window each get a profiler of their own, since they run on different threads
+    frameProfiler = None
+    if PROFILE:
+        Profiler().attach(simulation)
+        frameProfiler = Profiler()
+    physics.start()
+    try:
+        while running: #main simulation loop, which contains the animation code as well
+            for event in pygame.event.get(): #makes the program exit the simulation loop if the X in the top-right corner of the window is clicked
+                if event.type == pygame.QUIT:
+                    running = False
+            physics.check()
+
+            #Adds the positions the bodies have passed through since the last frame to their paths, then moves them to where they should be shown now
+            phaseStart = None if frameProfiler is None else time.perf_counter()
+            samples = physics.snapshots.takeSamples()
+            simulationTime,positions = physics.snapshots.interpolated(time.monotonic())
+            bodiesChanged,latestBodies = physics.snapshots.latestBodies()
+            if bodiesChanged != bodiesShown:
+                bodiesShown = bodiesChanged
+                displayState = latestBodies.copy()
+                updateBodies(bodies,displayState)
+                renderer.reset() #draws the paths again without the ones of the bodies that are gone
+                lastShownPositions = None
+            #The samples from before the bodies changed (and, if they changed again since the copy above, the positions) don't fit the bodies any more, so they are skipped
+            recordSamples(bodies,[sample for sample in samples if sample.shape == displayState.positions.shape])
+            if positions.shape != displayState.positions.shape:
+                clock.tick(60)
+                continue
+            displayState.positions[:] = positions
+            if frameProfiler is not None:
+                phaseStart = frameProfiler.record("paths",phaseStart)
+
+            #Rounds positions to nearest pixel. Then, if the pixels occupied by the bodies are different from the last time the screen was updated, the screen will be updated to show the movement
+            #only updating the screen when the difference is actually perceptible leaves more time for the physics
+            currentPositions = (positions/DISTANCE_SCALE).astype(int)
+            if lastShownPositions is None or not numpy.array_equal(currentPositions,lastShownPositions):
+                lastShownPositions = currentPositions
+                zoomOutIfOffScreen(bodies)
+                renderer.drawScene(bodies)
+                if frameProfiler is not None:
+                    phaseStart = frameProfiler.record("draw",phaseStart)
+
+                #How many simulated seconds go by per real second, worked out about once a second
+                now = time.monotonic()
+                if now-speedTime >= 1:
+                    realSpeed = (simulationTime-speedSimulationTime)/(now-speedTime)
+                    speedTime,speedSimulationTime = now,simulationTime
+                #Display other stats, including frame rate and approximate distance scale and time scale (relative to real time)
+                #displays them in the top left corner of the screen
+                frameRateText = fpsfont.render(str(int(clock.get_fps()))+" fps",True,WHITE,BLACK)
+                frameRateBox = frameRateText.get_rect()
+                frameRateBox.center = (35,20)
+
+                distanceScaleText = fpsfont.render("Distance scale: 10^"+str(int(math.log10(DISTANCE_SCALE)))+" meters per pixel",True,WHITE,BLACK)
+                distanceScaleBox = distanceScaleText.get_rect()
+                distanceScaleBox.center = (30,40)
+
+                renderer.blit(frameRateText,frameRateBox)
+                renderer.blit(distanceScaleText,distanceScaleBox)
+                if realSpeed > 0: #there's nothing to show until the speed has been worked out
+                    timeScaleText = fpsfont.render("10^"+str(int(math.log10(realSpeed)))+"x real speed",True,WHITE,BLACK)
+                    timeScaleBox = timeScaleText.get_rect()
+                    timeScaleBox.center = (85,60)
+                    renderer.blit(timeScaleText,timeScaleBox)
+                statsLines = []
+                if simulation.diagnostics is not None and simulation.diagnostics.latest is not None:
+                    statsLines.append(simulation.diagnostics.describe())
+                if frameProfiler is not None:
+                    #The physics profiler's report, then the window's (per frame)
+                    statsLines += simulation.profiler.describe()+["frame: "+line for line in frameProfiler.describe()]
+                for lineNumber,line in enumerate(statsLines):
+                    renderer.blit(fpsfont.render(line,True,WHITE,BLACK),(10,75+25*lineNumber))
+                if frameProfiler is not None:
+                    phaseStart = frameProfiler.record("text",phaseStart)
+                #update the parts of the screen that changed
+                renderer.show()
+                if frameProfiler is not None:
+                    frameProfiler.record("display",phaseStart)
+                    frameProfiler.endStep()
+            clock.tick(60) #at most 60 frames per second. This waits without holding up the simulation thread
+    finally:
+        physics.stop()
+
+#Moves bodies (changing the list in place) over to newState after some of them have merged: the ones that are still there keep their paths and get their new indices,
+#and the ones that merged into others are dropped
+def updateBodies(bodies,newState):
+    indices = {bodyId:index for index,bodyId in enumerate(newState.ids.tolist())}
+    bodies[:] = [body for body in bodies if body.id in indices]
     for body in bodies:
-            currentPositions += (int(body.getPosition()[0]/DISTANCE_SCALE),int(body.getPosition()[1]/DISTANCE_SCALE))
-    
-    if currentPositions != lastShownPositions: #If the bodies have moved enough that the screen will look different when updated, then the screen is updated
-        #only updating the screen when the difference is actually perceptibly makes the program run faster
-        lastShownPositions = []
-        for body in bodies:
-            lastShownPositions += (int(body.getPosition()[0]/DISTANCE_SCALE),int(body.getPosition()[1]/DISTANCE_SCALE)) #Records the last positions shown on screen to check against new positions in the future to see
-            #if the pixels are different
-        offScreen = False
+        body.state = newState
+        body.index = indices[body.id]
+    print("Bodies merged, "+str(len(bodies))+" left")
+
+#The parts of the viewer that are saved with each checkpoint, so a resumed run looks the same as it did: the scales and every body's path.
+#The paths are saved with the ids of their bodies, since the bodies can merge between the viewer's frames and the checkpoint's state
+def getViewerExtras(bodies):
+    bodies = list(bodies) #the viewer can change the list while this runs on the simulation thread
+    #and add to (or replace) the paths too, so each path is copied once and the lengths and positions are both taken from the copies, which keeps them matching
+    paths = [list(body.pastPositions) for body in bodies]
+    return {"distanceScale":DISTANCE_SCALE,"timeScale":TIME_SCALE,"pathIds":numpy.array([body.id for body in bodies]),
+            "pathLengths":numpy.array([len(path) for path in paths]),
+            "pastPositions":numpy.array([position for path in paths for position in path]).reshape(-1,2)}
+
+#Puts back what getViewerExtras saved
+def restoreViewerExtras(bodies,extras):
+    global DISTANCE_SCALE,TIME_SCALE
+    DISTANCE_SCALE = extras["distanceScale"]
+    TIME_SCALE = extras["timeScale"]
+    pastPositions = numpy.split(extras["pastPositions"],numpy.cumsum(extras["pathLengths"])[:-1])
+    paths = dict(zip(extras["pathIds"].tolist(),pastPositions)) if "pathIds" in extras else dict(zip([body.id for body in bodies],pastPositions))
+    for body in bodies:
+        body.pastPositions = list(paths.get(body.id,[]))
+        body.rescalePath() #works out which pixels the path covers
+
+#Adds each of the sets of positions in positionSamples (a (samples,N,2) array) to the bodies' paths, leaving the bodies at the last of them
+def recordSamples(bodies,positionSamples):
+    for positions in positionSamples:
+        bodies[0].state.positions[:] = positions
         for body in bodies:
-            if body.getPosition()[0]/DISTANCE_SCALE < -SCREEN_WIDTH/2 or body.getPosition()[0]/DISTANCE_SCALE > SCREEN_WIDTH/2 or body.getPosition()[1]/DISTANCE_SCALE < -SCREEN_HEIGHT/2 or body.getPosition()[1]/DISTANCE_SCALE > SCREEN_HEIGHT/2:
-                offScreen = True #checks if any of the bodies have drifted off-screen
-        if offScreen: #if any of them have, DISTANCE_SCALE is adjusted so that they are all on screen again
-            DISTANCE_SCALE = DISTANCE_SCALE*10
+            body.recordPosition()
+
+#Plays back a trajectory file saved by an earlier run, which could have been run without a window on another computer. The file is memory-mapped, so only the saved steps being shown are read from the disk.
+#speed is how many saved steps are moved forward each frame (less than one slows the playback down). Controls: space pauses, the up and down arrows double or halve the speed,
+#the left and right arrows jump back or forward, and home goes back to the start
+def runReplay(filename,speed=1.0):
+    reader = TrajectoryReader(filename)
+    if len(reader) == 0:
+        print(filename+" doesn't have any saved steps")
+        return
+    state = reader.makeState()
+    for index in range(state.getNumBodies()):
+        if state.colors[index] is None:
+            state.colors[index] = WHITE
+    bodies = [Body(state,index) for index in range(state.getNumBodies())]
+    scaleToFit(bodies)
+    renderer = Renderer()
+    clock = pygame.time.Clock()
+    position = 0.0 #how far through the saved steps the replay is (not a whole number when the speed is less than one step per frame)
+    shownFrame = 0 #the saved step on screen
+    paused = False
+    running = True
+    while running:
+        jumpTo = None
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed = speed*2
+                elif event.key == pygame.K_DOWN:
+                    speed = speed/2
+                elif event.key == pygame.K_RIGHT:
+                    jumpTo = position+REPLAY_SEEK_FRACTION*len(reader)
+                elif event.key == pygame.K_LEFT:
+                    jumpTo = position-REPLAY_SEEK_FRACTION*len(reader)
+                elif event.key == pygame.K_HOME:
+                    jumpTo = 0
+        if jumpTo is not None:
+            #After a jump the paths are drawn again from scratch, using saved steps spread out over everything up to the new position
+            position = min(max(jumpTo,0),len(reader)-1)
+            shownFrame = int(position)
             for body in bodies:
-                body.clearPixelsAlreadyCovered() #The particular pixels covered by the path will change when the DISTANCE_SCALE does, so the pixelsAlreadyCovered list is cleared
-        screen.fill((0,0,0)) #black background
-        for star in stars: #draws stars0
-            pygame.draw.circle(screen,WHITE,star,1)
-        for body in bodies: #draws bodies
-            body.drawBody(screen)
-        for body in bodies: #draws their paths
-            body.drawPath(screen)
-        for body in bodies: #draws their name tags
-            body.drawName(screen)
-
-        #calculate frame rate
-        timeB = time.time()
-        elapsed_time = timeB-timeA #determines time since last time the screen was updated (or, the first time the screen is updated, since the simulation loop began)
-        frameRate = int(1/elapsed_time) #calculates frame rate
-        #If the frame rate is above 60 fps, the program waits a moment such that it goes down to 60 fps, to make the animation speed more consistent
-        if (elapsed_time<0.0166):
-            time.sleep(0.0166-elapsed_time)
-            frameRate = 60
-        #Display other stats, including frame rate and approximate distance scale and time scale (relative to real time)
-        #displays them in the top left corner of the screen
-        frameRateText = fpsfont.render(str(frameRate)+" fps",True,WHITE,BLACK)
-        frameRateBox = frameRateText.get_rect()
-        frameRateBox.center = (35,20)
-
-        distanceScaleText = fpsfont.render("Distance scale: 10^"+str(int(math.log10(DISTANCE_SCALE)))+" meters per pixel",True,WHITE,BLACK)
-        distanceScaleBox = distanceScaleText.get_rect()
-        distanceScaleBox.center = (30,40)
-        
-        if frameRate != 0: #The if statement prevents the program from crashing if the frame rate is so low that it is rounded to 0
-            timeScaleText = fpsfont.render("10^"+str(int(math.log10(TIME_SCALE*frameRate)))+"x real speed",True,WHITE,BLACK)
-            timeScaleBox = timeScaleText.get_rect()
-            timeScaleBox.center = (85,60)
-        
-        #blit text to screen
-        #Without blitting, the screen would not be updated
-        screen.blit(frameRateText,frameRateBox)
-        screen.blit(distanceScaleText,distanceScaleBox)
-        if frameRate != 0: screen.blit(timeScaleText,timeScaleBox) #prevents the program from crashing if the frame rate is so low that it is rounded to 0
-        timeA = time.time() #to calculate the frame rate the next time the screen is updated
-        #update screen
-        pygame.display.flip()
-
-#clear up loose ends
-print("Finished")
-file.close()
-pygame.quit()
+                body.clearPath()
+            renderer.reset()
+            recordSamples(bodies,reader.samplePositions(-1,shownFrame,MAX_TRAIL_SAMPLES))
+        elif not paused and shownFrame < len(reader)-1:
+            position = min(position+speed,len(reader)-1)
+            if int(position) > shownFrame:
+                #Some of the saved steps that are skipped over are added to the paths too, so they don't turn into dotted lines at high speeds
+                recordSamples(bodies,reader.samplePositions(shownFrame,int(position),MAX_SKIPPED_SAMPLES))
+                shownFrame = int(position)
+        state.positions[:] = reader.getPositions(shownFrame)
+        state.velocities[:] = reader.getVelocities(shownFrame)
+
+        zoomOutIfOffScreen(bodies)
+        renderer.drawScene(bodies)
+        #Displays the simulation time, which saved step is showing and the playback speed in the top left corner of the screen
+        statusLines = ["Time: "+"{:.4g}".format(reader.getTime(shownFrame))+" s","Step "+str(shownFrame+1)+" of "+str(len(reader)),str(speed)+" saved steps per frame"+(" (paused)" if paused else "")]
+        for lineNumber,line in enumerate(statusLines):
+            statusText = fpsfont.render(line,True,WHITE,BLACK)
+            renderer.blit(statusText,(10,10+25*lineNumber))
+        renderer.show()
+        clock.tick(60) #at most 60 frames per second
+
+def main():
+    global INIT_TIME_SCALE,TIME_SCALE,PROFILE,STREAM_PORT
+    parser = argparse.ArgumentParser(description="Simulates the motions of heavenly bodies, or plays back a saved run")
+    parser.add_argument("--replay",help="trajectory file (.npy) from an earlier run to play back instead of simulating")
+    parser.add_argument("--speed",type=float,default=1.0,help="saved steps shown per frame when replaying")
+    parser.add_argument("--resume",help="checkpoint file (.npz) from an earlier run to carry on from instead of entering the bodies again")
+    parser.add_argument("--scenario",help="JSON or TOML scenario file (or csv file of bodies) to load the bodies from instead of entering them (see Scenarios.py)")
+    parser.add_argument("--preset",choices=list(PRESETS),help="start with one of the built-in systems instead of entering the bodies")
+    parser.add_argument("--profile",action="store_true",help="show how long each part of a step and a frame takes (the same as setting PROFILE)")
+    parser.add_argument("--stream",type=int,metavar="PORT",help="stream the bodies to other programs on this port while the window runs (the same as setting STREAM_PORT)")
+    arguments = parser.parse_args()
+    if arguments.profile:
+        PROFILE = True
+    if arguments.stream is not None:
+        STREAM_PORT = arguments.stream
+    if arguments.replay is not None:
+        runReplay(arguments.replay,arguments.speed)
+        pygame.quit()
+        return
+    if arguments.resume is not None:
+        #Carries on the earlier run, saving to the same output and checkpoint files
+        simulation,extras = resumeSimulation(arguments.resume)
+        simulation.checkpointInterval = CHECKPOINT_INTERVAL
+        for index in range(simulation.state.getNumBodies()):
+            if simulation.state.colors[index] is None:
+                simulation.state.colors[index] = WHITE
+        bodies = [Body(simulation.state,index) for index in range(simulation.state.getNumBodies())]
+        restoreViewerExtras(bodies,extras)
+    else:
+        settings = {}
+        if arguments.preset is not None:
+            state,settings = getPreset(arguments.preset)
+        elif arguments.scenario is not None:
+            state,settings = loadSystem(arguments.scenario)
+        else:
+            state = SystemState() #the bodies' positions, velocities, masses and radii are all stored together in here
+        state.solver = getSolver(settings.get("solver",SOLVER),settings.get("theta",THETA),settings.get("softening",SOFTENING))
+        if arguments.preset is None and arguments.scenario is None:
+            bodies = getBodiesFromUser(state)
+        else:
+            bodies = [Body(state,index) for index in range(state.getNumBodies())]
+        #A scenario's time step is used as the time scale
+        if "dt" in settings:
+            INIT_TIME_SCALE = TIME_SCALE = settings["dt"]
+        #Creating and opening file that will store data produced by simulation
+        filename = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
+        collisions = settings.get("collisions",COLLISIONS)
+        simulation = Simulation(state,getIntegrator(settings.get("integrator",INTEGRATOR)),INIT_TIME_SCALE,[openOutput(filename+OUTPUT_EXTENSION,state)],filename+"_checkpoint.npz",CHECKPOINT_INTERVAL,
+                                None if collisions is None else CollisionHandler(collisions,settings.get("restitution",RESTITUTION)))
+        scaleToFit(bodies)
+    #A resumed run carries on with the diagnostics it was saved with
+    if DIAGNOSTICS_EVERY is not None and simulation.diagnostics is None:
+        DiagnosticsMonitor(DIAGNOSTICS_EVERY).attach(simulation)
+    if STREAM_PORT is not None:
+        stream = StreamServer(port=STREAM_PORT)
+        stream.attach(simulation)
+        print("Streaming on port "+str(stream.port))
+    simulation.checkpointExtras = lambda: getViewerExtras(bodies)
+    runViewer(simulation,bodies)
+    #clear up loose ends
+    print("Finished")
+    simulation.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
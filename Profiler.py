@@ -0,0 +1,134 @@
+import json
+import time
+
+#Measures where the time goes while a simulation runs: the real time spent in each phase of a step (or of a frame of the window), how many force calculations each step does,
+#how many steps are taken per second and how far the total energy has drifted. Every REPORT_INTERVAL seconds the numbers since the last report are put together into a report,
+#which the window shows on screen and which can be saved to a file as a stream of JSON lines (one report per line).
+#Nothing is measured unless a Profiler is attached: Simulation.step and the window only check whether they have one, so leaving it off costs nothing noticeable
+
+#Seconds of real time between reports
+REPORT_INTERVAL = 1.0
+#The energy drift is only worked out at a report if the energy calculations so far have taken less than this fraction of the time, since for a large system
+#one energy calculation can take longer than many steps
+ENERGY_BUDGET = 0.1
+
+#Stands in for a state's solver so that every force calculation is counted and timed, passing everything else through to the real solver (so checkpoints still see its settings)
+class CountingSolver:
+    def __init__(self,solver,profiler):
+        self.solver = solver
+        self.profiler = profiler
+
+    def calculateAccelerations(self,positions,masses,targets=None):
+        started = time.perf_counter()
+        accelerations = self.solver.calculateAccelerations(positions,masses,targets)
+        self.profiler.countForces(len(masses) if targets is None else len(targets),time.perf_counter()-started)
+        return accelerations
+
+    def calculateAccelerationsAndPotentials(self,positions,masses,targets=None):
+        started = time.perf_counter()
+        accelerations,potentials = self.solver.calculateAccelerationsAndPotentials(positions,masses,targets)
+        self.profiler.countForces(len(masses) if targets is None else len(targets),time.perf_counter()-started)
+        return accelerations,potentials
+
+    def __getattr__(self,name):
+        return getattr(self.solver,name)
+
+class Profiler:
+    #output is the name of a file to write the reports to as JSON lines, or None to only keep the latest one (in latest)
+    def __init__(self,output=None,interval=REPORT_INTERVAL,energyBudget=ENERGY_BUDGET):
+        self.interval = interval
+        self.energyBudget = energyBudget
+        self.file = None if output is None else open(output,"w")
+        self.started = time.perf_counter()
+        self.lastReport = self.started
+        self.latest = None
+        self.initialEnergy = None
+        self.energySeconds = 0.0
+        self.simulation = None
+        self.startInterval()
+
+    #Forgets the numbers collected since the last report
+    def startInterval(self):
+        self.phases = {}
+        self.steps = 0
+        self.forceCalls = 0
+        self.forceBodies = 0
+
+    #Starts profiling simulation: its steps are timed, and its state's solver is wrapped so the force calculations are counted
+    def attach(self,simulation):
+        self.simulation = simulation
+        simulation.profiler = self
+        if not isinstance(simulation.state.solver,CountingSolver):
+            simulation.state.solver = CountingSolver(simulation.state.solver,self)
+        if simulation.diagnostics is None:
+            self.initialEnergy = self.measureEnergy()
+
+    #Adds the time since "since" (a time.perf_counter() time) to phase, and returns the time now so the next phase can start from it
+    def record(self,phase,since):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase,0.0)+now-since
+        return now
+
+    def countForces(self,numBodies,seconds):
+        self.forceCalls += 1
+        self.forceBodies += numBodies
+        self.phases["forces"] = self.phases.get("forces",0.0)+seconds
+
+    #Called at the end of every step (or frame). Makes a report if it is time for one
+    def endStep(self):
+        self.steps += 1
+        if time.perf_counter()-self.lastReport >= self.interval:
+            self.report()
+
+    def measureEnergy(self):
+        if self.simulation is None:
+            return None
+        started = time.perf_counter()
+        energy = self.simulation.state.calculateTotalEnergy()
+        self.energySeconds += time.perf_counter()-started
+        return energy
+
+    #Puts together the numbers since the last report. Phase times are given in seconds per step, and the forces as calculations per step and bodies whose acceleration was
+    #calculated per step (the block time step integrator only calculates some of the bodies' accelerations each time).
+    #If the simulation has diagnostics (see Diagnostics.py), the energy drift is their latest energy error, which costs nothing extra
+    def report(self):
+        now = time.perf_counter()
+        elapsed = now-self.lastReport
+        steps = max(self.steps,1)
+        report = {"wallTime":now-self.started,"stepsPerSecond":self.steps/elapsed,"phases":{phase:seconds/steps for phase,seconds in self.phases.items()}}
+        if self.simulation is not None:
+            report.update({"time":self.simulation.time,"steps":self.simulation.steps,"bodies":self.simulation.state.getNumBodies(),
+                           "forceCallsPerStep":self.forceCalls/steps,"bodyForcesPerStep":self.forceBodies/steps,"energyDrift":None})
+            diagnostics = self.simulation.diagnostics
+            if diagnostics is not None:
+                report["energyDrift"] = diagnostics.latest["energyError"]
+            elif self.initialEnergy and self.energySeconds <= self.energyBudget*(now-self.started):
+                report["energyDrift"] = (self.measureEnergy()-self.initialEnergy)/abs(self.initialEnergy)
+        if self.file is not None:
+            self.file.write(json.dumps(report)+"\n")
+            self.file.flush()
+        self.latest = report
+        self.startInterval()
+        self.lastReport = time.perf_counter() #so the energy calculation isn't counted as part of the next interval's steps
+
+    #Lines of text describing the latest report, for showing on screen
+    def describe(self):
+        report = self.latest
+        if report is None:
+            return []
+        lines = []
+        if "forceCallsPerStep" in report:
+            line = "{:.4g} steps/s, {:.3g} force calculations ({:.3g} bodies) per step".format(report["stepsPerSecond"],report["forceCallsPerStep"],report["bodyForcesPerStep"])
+            if report["energyDrift"] is not None:
+                line += ", energy drift {:.2e}".format(report["energyDrift"])
+            lines.append(line)
+        lines.append(", ".join(phase+" {:.3g} ms".format(1000*seconds) for phase,seconds in sorted(report["phases"].items(),key=lambda item: -item[1])))
+        return lines
+
+    #Makes a last report of whatever was collected since the one before, and closes the file
+    def close(self):
+        if self.steps > 0:
+            self.report()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,184 @@
+import csv
+import json
+import math
+import numpy
+from Physics import G,SystemState
+
+#Ways of setting up a system without typing every body in by hand: scenario files, which describe the bodies (and optionally how to run them) in JSON or TOML,
+#and a catalog of presets that generate whole systems at once. The generators build the positions, velocities and masses as arrays, so even a million bodies only take a few seconds
+
+#The color words bodies can be given, as RGB values
+COLORS = {"BLACK":(0,0,0),"DARK_BLUE":(0,0,128),"BLUE":(0,0,255),"DARK_GREEN":(0,128,0),"DARK_CYAN":(0,128,128),"SKY_BLUE":(0,128,255),"GREEN":(0,255,0),
+          "PASTEL_GREEN":(0,255,128),"CYAN":(0,255,255),"MAROON":(128,0,0),"PURPLE":(128,0,128),"ROYAL_PURPLE":(128,0,255),"DIRTY_YELLOW":(128,128,0),"GRAY":(128,128,128),
+          "PASTEL_PURPLE":(128,128,255),"LIME_GREEN":(128,255,0),"PALE_GREEN":(128,255,128),"PASTEL_BLUE":(128,255,255),"RED":(255,0,0),"BRIGHT_PINK":(255,0,128),
+          "MAGENTA":(255,0,255),"ORANGE":(255,128,0),"PEACH":(255,128,128),"PASTEL_PINK":(255,128,255),"YELLOW":(255,255,0),"CREAM":(255,255,128),"WHITE":(255,255,255)}
+
+#The bodies of our solar system whose mass and radius are filled in automatically when they are used by name: (mass, radius)
+KNOWN_BODIES = {"Sun":(1.989*(10**30),696.34*(10**6)),"Mercury":(3.285*(10**23),2.4397*(10**6)),"Venus":(4.867*(10**24),6.0518*(10**6)),"Earth":(5.972*(10**24),6.371*(10**6)),
+                "Mars":(6.39*(10**23),3.3895*(10**6)),"Jupiter":(1.898*(10**27),69.911*(10**6)),"Saturn":(5.683*(10**26),58.232*(10**6)),"Uranus":(8.681*(10**25),25.362*(10**6)),
+                "Neptune":(1.024*(10**26),24.622*(10**6))}
+
+#The planets' mean distances from the Sun and mean orbital speeds, and the colors they are drawn in, for the solar system preset: (distance, speed, color)
+PLANET_ORBITS = {"Mercury":(5.791*(10**10),47360,"GRAY"),"Venus":(1.0821*(10**11),35020,"CREAM"),"Earth":(1.496*(10**11),29780,"SKY_BLUE"),"Mars":(2.2794*(10**11),24070,"RED"),
+                 "Jupiter":(7.7857*(10**11),13070,"PEACH"),"Saturn":(1.43353*(10**12),9680,"DIRTY_YELLOW"),"Uranus":(2.87246*(10**12),6800,"PASTEL_BLUE"),
+                 "Neptune":(4.49506*(10**12),5430,"BLUE")}
+
+SOLAR_MASS = KNOWN_BODIES["Sun"][0]
+SOLAR_RADIUS = KNOWN_BODIES["Sun"][1]
+AU = 1.496*(10**11) #meters
+PARSEC = 3.0857*(10**16) #meters
+
+#Turns a color from a scenario file (a color word or an [r,g,b] list) into an RGB tuple
+def parseColor(color):
+    if isinstance(color,str):
+        if color not in COLORS:
+            raise ValueError("Unknown color \""+color+"\" (expected an [r,g,b] list or one of: "+", ".join(COLORS)+")")
+        return COLORS[color]
+    color = tuple(int(component) for component in color)
+    if len(color) != 3 or not all(0 <= component <= 255 for component in color):
+        raise ValueError("Colors need to be three numbers from 0 to 255, not "+str(list(color)))
+    return color
+
+#Moves a state so that its center of mass is at the origin and isn't moving
+def centerState(state):
+    state.positions -= numpy.average(state.positions,axis=0,weights=state.masses)
+    state.velocities -= numpy.average(state.velocities,axis=0,weights=state.masses)
+
+#The Sun and the eight planets on circular orbits at their mean distances and speeds. Each planet starts goldenAngle radians further around than the one before it, so they are spread around the Sun
+def solarSystem(goldenAngle=math.pi*(3-math.sqrt(5))):
+    state = SystemState()
+    state.addBody("Sun",COLORS["YELLOW"],[0,0],[0,0],*KNOWN_BODIES["Sun"])
+    for number,(name,(distance,speed,color)) in enumerate(PLANET_ORBITS.items()):
+        angle = number*goldenAngle
+        #In the window the positive y direction is downward, so this goes clockwise on screen like the bodies entered by hand usually do
+        state.addBody(name,COLORS[color],[distance*math.cos(angle),distance*math.sin(angle)],[-speed*math.sin(angle),speed*math.cos(angle)],*KNOWN_BODIES[name])
+    centerState(state)
+    return state
+
+#Two stars orbiting their common center of mass, starting at their farthest apart. separation is the semi-major axis of their orbit
+def binaryStars(mass1=SOLAR_MASS,mass2=0.5*SOLAR_MASS,separation=AU,eccentricity=0.0,radius1=SOLAR_RADIUS,radius2=0.7*SOLAR_RADIUS):
+    totalMass = mass1+mass2
+    distance = separation*(1+eccentricity)
+    speed = math.sqrt(G*totalMass*(1-eccentricity)/distance) #the vis-viva equation at apoapsis
+    state = SystemState()
+    state.addBody("Star A",COLORS["YELLOW"],[-mass2/totalMass*distance,0],[0,-mass2/totalMass*speed],mass1,radius1)
+    state.addBody("Star B",COLORS["ORANGE"],[mass1/totalMass*distance,0],[0,mass1/totalMass*speed],mass2,radius2)
+    return state
+
+#count equal mass stars with the positions and speeds of a Plummer model of a star cluster (the standard way of setting one up, from Aarseth, Henon and Wielen 1974) with the given total mass and
+#scale radius. The simulator is two dimensional, so each star is placed in a random direction in the plane at the distance from the center it would have in three dimensions; the cluster
+#is close to equilibrium but not exactly in it
+def plummerSphere(count=1000,totalMass=1000*SOLAR_MASS,scaleRadius=PARSEC,radius=SOLAR_RADIUS,seed=0):
+    generator = numpy.random.default_rng(seed)
+    #Distances from inverting the fraction of the mass inside each radius (leaving out the outermost 1%, which would be extremely far away)
+    massFractions = generator.uniform(0,0.99,count)
+    distances = scaleRadius/numpy.sqrt(massFractions**(-2/3)-1)
+    #Speeds as a fraction q of the escape speed at each distance, picked from the distribution q^2 (1-q^2)^3.5 by rejection sampling
+    fractions = numpy.zeros(count)
+    remaining = numpy.arange(count)
+    while len(remaining) > 0:
+        q = generator.uniform(0,1,len(remaining))
+        accepted = generator.uniform(0,0.1,len(remaining)) < q**2*(1-q**2)**3.5
+        fractions[remaining[accepted]] = q[accepted]
+        remaining = remaining[~accepted]
+    speeds = fractions*numpy.sqrt(2*G*totalMass)*(distances**2+scaleRadius**2)**(-0.25)
+    state = SystemState()
+    state.addBodies(["Star "+str(number) for number in range(count)],[COLORS["WHITE"]]*count,randomDirections(generator,count)*distances[:,numpy.newaxis],
+                    randomDirections(generator,count)*speeds[:,numpy.newaxis],numpy.full(count,totalMass/count),numpy.full(count,float(radius)))
+    centerState(state)
+    return state
+
+#count unit vectors pointing in random directions in the plane, as a (count,2) array
+def randomDirections(generator,count):
+    angles = generator.uniform(0,2*math.pi,count)
+    return numpy.column_stack([numpy.cos(angles),numpy.sin(angles)])
+
+#A central star with count bodies spread uniformly over a ring between innerRadius and outerRadius, each on a circular orbit around the mass inside of it (the star plus the disk closer in)
+def uniformDisk(count=1000,centralMass=SOLAR_MASS,diskMass=10**(-3)*SOLAR_MASS,innerRadius=AU,outerRadius=5*AU,radius=10**6,seed=0):
+    generator = numpy.random.default_rng(seed)
+    #Uniform over the area of the ring, so the distance squared is uniformly distributed
+    distances = numpy.sqrt(generator.uniform(innerRadius**2,outerRadius**2,count))
+    directions = randomDirections(generator,count)
+    enclosedMasses = centralMass+diskMass*(distances**2-innerRadius**2)/(outerRadius**2-innerRadius**2)
+    speeds = numpy.sqrt(G*enclosedMasses/distances)
+    state = SystemState()
+    state.addBody("Star",COLORS["YELLOW"],[0,0],[0,0],centralMass,SOLAR_RADIUS)
+    #Moving at right angles to the direction to the star, the same way around as the planets in solarSystem
+    state.addBodies(["Body "+str(number) for number in range(count)],[COLORS["WHITE"]]*count,directions*distances[:,numpy.newaxis],
+                    numpy.column_stack([-directions[:,1],directions[:,0]])*speeds[:,numpy.newaxis],numpy.full(count,diskMass/count),numpy.full(count,float(radius)))
+    centerState(state)
+    return state
+
+#The presets that can be chosen by name, with the settings that suit each of them: (generator, settings). The star cluster and the disk have many bodies that can pass very close to
+#each other, which without softening gives some of them huge kicks (the Plummer sphere's energy error is over 1000% after 100 steps), so they are softened by much less than the
+#distances between their bodies (a small fraction of the cluster's scale radius, and a hundredth of an AU)
+PRESETS = {"solar":(solarSystem,{"dt":86400}),"binary":(binaryStars,{"dt":3600}),"plummer":(plummerSphere,{"dt":10**10,"softening":10**14}),
+           "disk":(uniformDisk,{"dt":86400,"softening":10**9})}
+
+#Generates the preset with the given name. parameters are passed on to its generator (for example {"count":100000} for the Plummer sphere or disk).
+#Returns the state and the settings it should be run with, like loadScenario
+def getPreset(name,parameters=None):
+    if name not in PRESETS:
+        raise ValueError("Unknown preset \""+str(name)+"\" (expected one of: "+", ".join(PRESETS)+")")
+    generator,settings = PRESETS[name]
+    return generator(**({} if parameters is None else parameters)),dict(settings) #a copy, since the caller can change the settings
+
+#Reads a scenario file, which is a JSON file or (ending in .toml) a TOML file like this one:
+#  dt = 86400                        # optional settings for running it: dt, tEnd, integrator, solver, theta, softening, collisions and restitution
+#  integrator = "leapfrog"
+#  [[bodies]]                        # bodies added one at a time
+#  name = "Sun"                      # mass and radius can be left out for the bodies in KNOWN_BODIES
+#  color = "YELLOW"                  # a color word or [r, g, b] (white if it's left out)
+#  position = [0, 0]
+#  velocity = [0, 0]
+#  [[presets]]                       # and/or whole presets, moved by an optional offset and velocity
+#  preset = "disk"
+#  count = 5000
+#  offset = [1e12, 0]
+#Presets that are softened (see PRESETS) need it in a scenario too, so unless the scenario sets its own softening, it gets the largest softening of the presets in it.
+#Returns the SystemState and a dict of the settings
+def loadScenario(filename):
+    if filename.endswith(".toml"):
+        import tomllib #only in Python 3.11 and newer, so it is only needed for TOML files
+        with open(filename,"rb") as file:
+            scenario = tomllib.load(file)
+    else:
+        with open(filename) as file:
+            scenario = json.load(file)
+    state = SystemState()
+    for body in scenario.get("bodies",[]):
+        name = body["name"]
+        #The mass and radius are each taken from KNOWN_BODIES if they are left out, so a known body can be given just one of them
+        for key in ("mass","radius"):
+            if key not in body and name not in KNOWN_BODIES:
+                raise ValueError("The body \""+str(name)+"\" needs a "+key+" (only the bodies in KNOWN_BODIES can leave it out)")
+        mass = body["mass"] if "mass" in body else KNOWN_BODIES[name][0]
+        radius = body["radius"] if "radius" in body else KNOWN_BODIES[name][1]
+        state.addBody(name,parseColor(body.get("color","WHITE")),body.get("position",[0,0]),body.get("velocity",[0,0]),mass,radius)
+    presetSoftening = 0
+    for preset in scenario.get("presets",[]):
+        parameters = {key:value for key,value in preset.items() if key not in ("preset","offset","velocity")}
+        presetState,presetSettings = getPreset(preset["preset"],parameters)
+        state.addBodies(presetState.names,presetState.colors,presetState.positions+numpy.array(preset.get("offset",[0,0]),dtype=float),
+                        presetState.velocities+numpy.array(preset.get("velocity",[0,0]),dtype=float),presetState.masses,presetState.radii)
+        presetSoftening = max(presetSoftening,presetSettings.get("softening",0))
+    settings = {key:scenario[key] for key in ("dt","tEnd","integrator","solver","theta","softening","collisions","restitution") if key in scenario}
+    if "softening" not in settings and presetSoftening > 0:
+        settings["softening"] = presetSoftening
+    return state,settings
+
+#Reads the bodies of a system from a csv file with the columns name,mass,radius,x,y,vx,vy (in m/k/s units, with a header row)
+def loadBodies(filename):
+    state = SystemState()
+    with open(filename,newline='') as file:
+        for row in csv.DictReader(file):
+            position = [float(row["x"]),float(row["y"])]
+            velocity = [float(row["vx"]),float(row["vy"])]
+            state.addBody(row["name"],(255,255,255),position,velocity,float(row["mass"]),float(row["radius"]))
+    return state
+
+#Reads a system from either kind of file: a csv file of bodies (see loadBodies) or a JSON or TOML scenario file. Returns the state and the scenario's settings (none for a csv file)
+def loadSystem(filename):
+    if filename.endswith(".csv"):
+        return loadBodies(filename),{}
+    return loadScenario(filename)
@@ -0,0 +1,221 @@
+import argparse
+import time
+import numpy
+from Physics import SystemState
+from Solvers import getSolver,SOLVER_NAMES
+from Integrators import getIntegrator,INTEGRATORS
+from BarnesHut import THETA
+from Output import openOutput
+from Checkpoint import saveCheckpoint,readCheckpoint
+from Collisions import CollisionHandler,COLLISION_MODES,RESTITUTION
+from Profiler import Profiler,REPORT_INTERVAL
+from Diagnostics import DiagnosticsMonitor,DIAGNOSTICS_EVERY
+from Streaming import StreamServer,STREAM_HOST,STREAM_RATE
+from Scenarios import loadSystem,getPreset,PRESETS
+from Scenarios import loadBodies #not used here, but kept so "from Simulation import simulate, loadBodies" (see the README) still works now that it lives in Scenarios.py
+
+#Runs the physics of the simulator without pygame or a window, so it can be used from other programs or on computers without a display.
+#PlanetSimulator.py shows a Simulation as it runs; the simulate function and the command line below run one as fast as possible instead
+
+#How many seconds of real time apart checkpoints are saved
+CHECKPOINT_INTERVAL = 600
+
+#A Simulation moves a SystemState forward dt seconds at a time with an integrator, keeping track of the time and passing the state to each of its outputs after every step.
+#If checkpointFile is set, a checkpoint (see Checkpoint.py) is saved to it every checkpointInterval seconds of real time and when the simulation is closed, so a long run can be resumed
+#with resumeSimulation if it is stopped. checkpointExtras can be set to a function returning a dict of anything else that should be saved with each checkpoint.
+#collisions is a CollisionHandler (see Collisions.py) that deals with the bodies that touch after each step, or None to let bodies pass through each other.
+#profiler is set by Profiler.attach (see Profiler.py) to time each part of a step, and diagnostics by DiagnosticsMonitor.attach (see Diagnostics.py) to keep track of the energy and momentum;
+#they are None otherwise
+class Simulation:
+    def __init__(self,state,integrator,dt,outputs=None,checkpointFile=None,checkpointInterval=CHECKPOINT_INTERVAL,collisions=None):
+        self.state = state
+        self.integrator = integrator
+        self.dt = dt
+        self.outputs = [] if outputs is None else outputs
+        self.time = 0.0
+        self.steps = 0
+        self.checkpointFile = checkpointFile
+        self.checkpointInterval = checkpointInterval
+        self.checkpointExtras = None
+        self.lastCheckpoint = time.monotonic()
+        self.collisions = collisions
+        self.profiler = None
+        self.diagnostics = None
+
+    #Takes one step, of length dt if it's given and self.dt otherwise
+    def step(self,dt=None):
+        if dt is None:
+            dt = self.dt
+        profiler = self.profiler
+        phaseStart = None if profiler is None else time.perf_counter()
+        diagnostics = self.diagnostics
+        sampling = diagnostics is not None and diagnostics.isDue(self.steps)
+        if sampling:
+            #The integrator works out the potentials along with its last accelerations of the step, which is much cheaper than a separate pass afterwards
+            self.integrator.wantPotentials = True
+        self.integrator.step(self.state,dt)
+        if profiler is not None:
+            phaseStart = profiler.record("integrate",phaseStart)
+        if self.collisions is not None and self.collisions.resolve(self.state):
+            self.integrator.reset()
+        if profiler is not None:
+            phaseStart = profiler.record("collisions",phaseStart)
+        self.time += dt
+        self.steps += 1
+        if sampling:
+            #The potentials are None if the integrator couldn't work them out (or collisions changed the bodies), and are then calculated by the diagnostics
+            diagnostics.sample(self,self.integrator.takePotentials())
+            if profiler is not None:
+                phaseStart = profiler.record("diagnostics",phaseStart)
+        for output in self.outputs:
+            output.write(self.time,self.state)
+        if profiler is not None:
+            phaseStart = profiler.record("outputs",phaseStart)
+        if self.checkpointFile is not None and time.monotonic()-self.lastCheckpoint >= self.checkpointInterval:
+            self.checkpoint()
+        if profiler is not None:
+            profiler.record("checkpoint",phaseStart)
+            profiler.endStep()
+
+    def checkpoint(self):
+        saveCheckpoint(self.checkpointFile,self,None if self.checkpointExtras is None else self.checkpointExtras())
+        self.lastCheckpoint = time.monotonic()
+
+    #Takes steps until the time reaches tEnd. The last step is shortened if it would go past tEnd
+    def run(self,tEnd):
+        while tEnd-self.time > self.dt*10**(-9):
+            self.step(min(self.dt,tEnd-self.time))
+
+    def close(self):
+        if self.checkpointFile is not None:
+            self.checkpoint()
+        for output in self.outputs:
+            output.close()
+        if self.profiler is not None:
+            self.profiler.close()
+        if self.diagnostics is not None:
+            self.diagnostics.close()
+
+#Creates the Simulation saved in a checkpoint file, at the moment it was saved, with its outputs opened again where they left off. Returns the Simulation and the checkpoint's extras
+def resumeSimulation(filename):
+    checkpoint = readCheckpoint(filename)
+    state = SystemState(getSolver(checkpoint["solver"],checkpoint["theta"],checkpoint.get("softening",0.0)))
+    state.addBodies(checkpoint["names"],[tuple(color) if color is not None else None for color in checkpoint["colors"]],checkpoint["positions"],checkpoint["velocities"],
+                    checkpoint["masses"],checkpoint["radii"])
+    if "ids" in checkpoint:
+        state.ids = checkpoint["ids"]
+        state.nextId = checkpoint["nextId"]
+    integrator = getIntegrator(checkpoint["integrator"])
+    integrator.setState(checkpoint["integratorState"])
+    outputs = [openOutput(output["filename"],state,output["every"],output.get("precision",numpy.float64),output) for output in checkpoint["outputs"]]
+    collisions = checkpoint.get("collisions")
+    simulation = Simulation(state,integrator,checkpoint["dt"],outputs,filename,collisions=None if collisions is None else CollisionHandler(**collisions))
+    simulation.time = checkpoint["time"]
+    simulation.steps = checkpoint["steps"]
+    if checkpoint.get("diagnostics") is not None:
+        DiagnosticsMonitor(resume=checkpoint["diagnostics"]).attach(simulation)
+    return simulation,checkpoint["extras"]
+
+#Runs a copy of initialState from time 0 to tEnd with time steps of dt and returns the finished Simulation (whose state is the final state).
+#output can be the name of a file to save the results to (a trajectory file unless it ends in .csv), an output object (see Output.py), or None to not save anything.
+#every and precision are how many steps apart saved steps are and what type a trajectory file stores them as, and checkpointFile is where to save checkpoints to (if anywhere).
+#softening is the softening length of the gravity, and collisions is one of Collisions.COLLISION_MODES (or None to ignore collisions), with restitution used for bouncing.
+#profiler is a Profiler to measure the run with, diagnostics a DiagnosticsMonitor to keep track of the energy and momentum with, and stream a StreamServer to send the state
+#to other programs with as it runs (or None for any of them)
+def simulate(initialState,tEnd,dt,output=None,solver="direct",theta=THETA,integrator="leapfrog",every=1,precision=numpy.float64,checkpointFile=None,checkpointInterval=CHECKPOINT_INTERVAL,
+             softening=0.0,collisions=None,restitution=RESTITUTION,profiler=None,diagnostics=None,stream=None):
+    state = initialState.copy()
+    state.solver = getSolver(solver,theta,softening)
+    if output is None:
+        outputs = []
+    elif isinstance(output,str):
+        outputs = [openOutput(output,state,every,precision)]
+    else:
+        outputs = [output]
+    simulation = Simulation(state,getIntegrator(integrator),dt,outputs,checkpointFile,checkpointInterval,None if collisions is None else CollisionHandler(collisions,restitution))
+    if diagnostics is not None:
+        diagnostics.attach(simulation)
+    if stream is not None:
+        stream.attach(simulation)
+    if profiler is not None:
+        profiler.attach(simulation)
+    try:
+        simulation.run(tEnd)
+    finally:
+        simulation.close()
+    return simulation
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the n-body simulator without a window")
+    parser.add_argument("bodies",nargs="?",help="csv file of the bodies in the system, with the columns name,mass,radius,x,y,vx,vy, or a JSON or TOML scenario file (see Scenarios.py)")
+    parser.add_argument("--preset",choices=list(PRESETS),help="run one of the built-in systems instead of a bodies file")
+    parser.add_argument("--t-end",type=float,help="how long to simulate for (seconds)")
+    parser.add_argument("--dt",type=float,help="time step (seconds)")
+    parser.add_argument("--output",help="file to save the positions and velocities to (a .npy trajectory file, or a .csv file)")
+    parser.add_argument("--every",type=int,default=1,help="only save every this many steps")
+    parser.add_argument("--float32",action="store_true",help="store positions and velocities in the trajectory file as 32 bit floats")
+    parser.add_argument("--solver",choices=SOLVER_NAMES,help="gravity solver (direct unless the scenario says otherwise)")
+    parser.add_argument("--theta",type=float,help="Barnes-Hut opening angle")
+    parser.add_argument("--integrator",choices=list(INTEGRATORS),help="integrator (leapfrog unless the scenario says otherwise)")
+    parser.add_argument("--softening",type=float,help="softening length (meters), which limits the force between bodies that pass very close to each other")
+    parser.add_argument("--collisions",choices=COLLISION_MODES,help="merge or bounce bodies that touch (by default they pass through each other)")
+    parser.add_argument("--restitution",type=float,help="how bouncy --collisions bounce is, from 0 to 1 (1 unless the scenario says otherwise)")
+    parser.add_argument("--checkpoint",help="file to save checkpoints to, so the run can be resumed if it is stopped")
+    parser.add_argument("--checkpoint-interval",type=float,default=CHECKPOINT_INTERVAL,help="seconds of real time between checkpoints")
+    parser.add_argument("--metrics",help="file to save how fast the run is going to, as JSON lines: the time each part of a step takes, force calculations per step, steps per second and energy drift")
+    parser.add_argument("--metrics-interval",type=float,default=REPORT_INTERVAL,help="seconds of real time between lines of --metrics")
+    parser.add_argument("--diagnostics",help="file to save the total energy, momentum, angular momentum and virial ratio to as JSON lines, with how far each has drifted since the start")
+    parser.add_argument("--diagnostics-every",type=int,default=DIAGNOSTICS_EVERY,help="steps between lines of --diagnostics")
+    parser.add_argument("--stream",type=int,metavar="PORT",help="stream the bodies' positions and velocities (and the diagnostics, if they are on) to other programs on this port as the run goes (see Streaming.py)")
+    parser.add_argument("--stream-host",default=STREAM_HOST,help="address to listen on for --stream (only this computer by default)")
+    parser.add_argument("--stream-rate",type=float,default=STREAM_RATE,help="most frames per second of real time sent by --stream")
+    parser.add_argument("--resume",help="checkpoint file to carry on from (until --t-end) instead of starting from the bodies file. The run keeps the settings and outputs it was started with")
+    arguments = parser.parse_args()
+    profiler = None if arguments.metrics is None else Profiler(arguments.metrics,arguments.metrics_interval)
+    diagnostics = None if arguments.diagnostics is None else DiagnosticsMonitor(arguments.diagnostics_every,arguments.diagnostics)
+    stream = None
+    if arguments.stream is not None:
+        stream = StreamServer(arguments.stream_host,arguments.stream,arguments.stream_rate)
+        print("Streaming on "+stream.host+":"+str(stream.port),flush=True)
+    if arguments.resume is not None:
+        if arguments.t_end is None:
+            parser.error("--t-end is needed to resume a run")
+        simulation,extras = resumeSimulation(arguments.resume)
+        simulation.checkpointFile = arguments.resume if arguments.checkpoint is None else arguments.checkpoint
+        simulation.checkpointInterval = arguments.checkpoint_interval
+        if diagnostics is not None and simulation.diagnostics is None:
+            diagnostics.attach(simulation)
+        if stream is not None:
+            stream.attach(simulation)
+        if profiler is not None:
+            profiler.attach(simulation)
+        try:
+            simulation.run(arguments.t_end)
+        finally:
+            simulation.close()
+    else:
+        if arguments.preset is not None:
+            initialState,settings = getPreset(arguments.preset)
+        elif arguments.bodies is not None:
+            initialState,settings = loadSystem(arguments.bodies)
+        else:
+            parser.error("a bodies file, --preset or --resume is needed")
+        #Anything given on the command line overrides the scenario's settings
+        for key,value in (("dt",arguments.dt),("tEnd",arguments.t_end),("solver",arguments.solver),("theta",arguments.theta),("integrator",arguments.integrator),
+                           ("softening",arguments.softening),("collisions",arguments.collisions),("restitution",arguments.restitution)):
+            if value is not None:
+                settings[key] = value
+        if "dt" not in settings or "tEnd" not in settings:
+            parser.error("--dt and --t-end are needed unless the scenario gives them")
+        simulation = simulate(initialState,settings["tEnd"],settings["dt"],arguments.output,settings.get("solver","direct"),settings.get("theta",THETA),settings.get("integrator","leapfrog"),
+                              arguments.every,numpy.float32 if arguments.float32 else numpy.float64,arguments.checkpoint,arguments.checkpoint_interval,
+                              settings.get("softening",0.0),settings.get("collisions"),settings.get("restitution",RESTITUTION),profiler,diagnostics,stream)
+    message = "Finished "+str(simulation.steps)+" steps"
+    if simulation.collisions is not None:
+        message += " ("+str(simulation.collisions.count)+" collisions, "+str(simulation.state.getNumBodies())+" bodies left)"
+    print(message)
+    if simulation.diagnostics is not None and simulation.diagnostics.latest is not None:
+        print("Drift since the start: "+simulation.diagnostics.describe())
+
+if __name__ == "__main__":
+    main()
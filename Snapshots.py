@@ -0,0 +1,117 @@
+import threading
+import time
+
+#Runs a Simulation on a thread of its own, so whatever is showing it (like the window in PlanetSimulator.py) never holds up the physics and the physics never holds up the drawing.
+#After every step the thread publishes a snapshot of the positions to a SnapshotBuffer, and the viewer reads the latest ones at its own frame rate
+
+#The most sets of positions kept for drawing the bodies' paths between two calls of takeSamples. If more steps than that are taken in between, only evenly spaced ones are kept
+MAX_SAMPLES = 64
+
+#An output (see Output.py) that keeps the latest two snapshots of the positions, each with the real time it was taken at, so a viewer can show the bodies moving smoothly
+#between them. It also collects a limited number of the positions in between for drawing paths. Everything is guarded by a lock, since the simulation thread writes to it while the viewer reads it.
+#Whenever the number of bodies changes (when bodies merge), it also keeps a copy of the whole state, so the viewer can find out which bodies are left and what they are like now
+class SnapshotBuffer:
+    def __init__(self,maxSamples=MAX_SAMPLES):
+        self.lock = threading.Lock()
+        self.previous = None
+        self.latest = None
+        self.stepsWritten = 0
+        self.maxSamples = maxSamples
+        self.samples = []
+        self.sampleStride = 1 #only every sampleStride'th step is added to samples
+        self.stepsSinceSample = 0
+        self.bodies = None
+        self.bodiesChanged = 0 #how many times the bodies have changed, so the viewer can tell when they have
+
+    def write(self,simulationTime,state):
+        snapshot = (time.monotonic(),simulationTime,state.positions.copy())
+        bodies = state.copy() if self.bodies is None or state.getNumBodies() != self.bodies.getNumBodies() else None
+        with self.lock:
+            self.previous,self.latest = self.latest,snapshot
+            if bodies is not None:
+                self.bodies = bodies
+                self.bodiesChanged += 1
+            self.stepsWritten += 1
+            self.stepsSinceSample += 1
+            if self.stepsSinceSample >= self.sampleStride:
+                self.stepsSinceSample = 0
+                self.samples.append(snapshot[2])
+                #When the samples are full, every other one is dropped and from then on only half as many steps are kept, so they stay evenly spaced
+                if len(self.samples) >= 2*self.maxSamples:
+                    self.samples = self.samples[1::2]
+                    self.sampleStride *= 2
+
+    def close(self):
+        pass
+
+    #The positions collected since the last call, oldest first
+    def takeSamples(self):
+        with self.lock:
+            samples = self.samples
+            self.samples = []
+            self.sampleStride = 1
+            self.stepsSinceSample = 0
+        return samples
+
+    #How many times the bodies have changed and a copy of the state from the last time they did
+    def latestBodies(self):
+        with self.lock:
+            return self.bodiesChanged,self.bodies
+
+    #The simulation time and positions to show at the real time now. The positions are interpolated between the last two snapshots, running one snapshot behind,
+    #so that the bodies move smoothly however far apart the snapshots are. Returns None before the first snapshot
+    def interpolated(self,now):
+        with self.lock:
+            previous,latest = self.previous,self.latest
+        if latest is None:
+            return None
+        if previous is None or latest[0] <= previous[0] or previous[2].shape != latest[2].shape:
+            return latest[1],latest[2]
+        fraction = min(1.0,(now-latest[0])/(latest[0]-previous[0]))
+        return previous[1]+fraction*(latest[1]-previous[1]),previous[2]+fraction*(latest[2]-previous[2])
+
+#A thread that steps simulation until stop() is called. chooseStep, if given, is called with the simulation before each step and returns how long the step should be
+#(otherwise it is simulation.dt). stepsPerSecond limits how fast it runs; by default it runs as fast as it can
+class SimulationThread(threading.Thread):
+    def __init__(self,simulation,chooseStep=None,stepsPerSecond=None):
+        threading.Thread.__init__(self,daemon=True)
+        self.simulation = simulation
+        self.chooseStep = chooseStep
+        self.stepsPerSecond = stepsPerSecond
+        self.snapshots = SnapshotBuffer()
+        self.snapshots.write(simulation.time,simulation.state) #so there is something to show before the first step finishes
+        self.stopping = threading.Event()
+        self.error = None
+
+    def run(self):
+        self.simulation.outputs.append(self.snapshots)
+        try:
+            nextStep = time.monotonic()
+            while not self.stopping.is_set():
+                profiler = self.simulation.profiler
+                phaseStart = None if profiler is None else time.perf_counter()
+                dt = None if self.chooseStep is None else self.chooseStep(self.simulation)
+                if profiler is not None:
+                    profiler.record("timestep",phaseStart)
+                self.simulation.step(dt)
+                if self.stepsPerSecond is not None:
+                    nextStep += 1/self.stepsPerSecond
+                    if nextStep > time.monotonic():
+                        self.stopping.wait(nextStep-time.monotonic())
+                    else:
+                        nextStep = time.monotonic() #it has fallen behind, so it carries on from now instead of rushing to catch up
+        except Exception as error:
+            self.error = error #passed on to the viewer by check()
+        finally:
+            self.simulation.outputs.remove(self.snapshots)
+
+    #Raises whatever error stopped the simulation thread, if one did
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    #Stops the thread after the step it is taking and waits for it to finish
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        self.check()
@@ -0,0 +1,22 @@
+from Physics import DirectSolver
+from BarnesHut import BarnesHutSolver,THETA
+
+#The names the different gravity solvers can be chosen by. Every solver class has its name as a class attribute too
+SOLVER_NAMES = ["direct","barneshut","numba"]
+
+#Creates the gravity solver with the given name. theta is the Barnes-Hut opening angle, and is ignored by the direct solver. softening is the softening length (see Physics.py)
+def getSolver(name,theta=THETA,softening=0.0):
+    if name == "direct":
+        return DirectSolver(softening=softening)
+    if name == "barneshut":
+        return BarnesHutSolver(theta,softening=softening)
+    if name == "numba":
+        from NumbaKernels import NumbaSolver #only imported when it is used, since importing Numba takes a while
+        return NumbaSolver(softening=softening)
+    raise ValueError("Unknown solver \""+str(name)+"\" (expected one of: "+", ".join(SOLVER_NAMES)+")")
+
+#The name, opening angle and softening length a solver can be created again with, the opposite of getSolver
+def getSolverSettings(solver):
+    if getattr(solver,"name",None) not in SOLVER_NAMES:
+        raise ValueError("Unknown solver "+type(solver).__name__)
+    return solver.name,getattr(solver,"theta",THETA),solver.softening
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import json
+import socket
+import struct
+import threading
+import time
+import numpy
+
+#Streams the state of a running Simulation over TCP to any number of other programs (dashboards, analysis scripts...), so a run without a window can be watched while it goes
+#without going through files on the disk. A StreamServer is an output (see Output.py): after a step, if it is time for a frame and anyone is listening, it packs the bodies into a
+#binary frame and hands it to an asyncio event loop running on a thread of its own, which sends it to every subscriber.
+#Each subscriber has a short queue of frames waiting to be sent to it. A subscriber that can't keep up has its oldest frames dropped, so a slow one never holds up the simulation
+#or the other subscribers; the simulation thread never waits for the network at all.
+#Running this file connects to a server and prints a line for each frame it gets, as an example of reading the frames
+
+#Only programs on the same computer can connect unless another address is given
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 8765
+#Most frames sent per second of real time
+STREAM_RATE = 30
+#How many frames can be waiting for one subscriber before the oldest is dropped
+QUEUE_FRAMES = 4
+#How long closing the server waits for the last frames to be sent (seconds)
+CLOSE_TIMEOUT = 1.0
+
+#Every frame is a 4 byte little-endian length of the rest of the frame, then FRAME_HEADER: "NBDY", the format version, the bytes per float (8, or 4 for float32 frames), the time,
+#the number of steps, the number of bodies N and the length of the diagnostics. Then the arrays, little-endian: the bodies' ids (N int64s), masses (N floats), positions (N*2 floats)
+#and velocities (N*2 floats), and finally the latest diagnostics (see Diagnostics.py) as UTF-8 JSON, which is empty if there aren't any
+FRAME_LENGTH = struct.Struct("<I")
+FRAME_HEADER = struct.Struct("<4sHHdqII")
+FRAME_MAGIC = b"NBDY"
+FRAME_VERSION = 1
+
+#A whole frame, with its length in front, for state at simulationTime after steps steps
+def encodeFrame(simulationTime,steps,state,diagnostics=None,precision=numpy.float64):
+    floatType = numpy.dtype(precision).newbyteorder("<")
+    diagnosticsText = b"" if diagnostics is None else json.dumps(diagnostics).encode("utf-8")
+    frame = b"".join([FRAME_HEADER.pack(FRAME_MAGIC,FRAME_VERSION,floatType.itemsize,simulationTime,steps,state.getNumBodies(),len(diagnosticsText)),
+                      state.ids.astype("<i8").tobytes(),state.masses.astype(floatType).tobytes(),state.positions.astype(floatType).tobytes(),
+                      state.velocities.astype(floatType).tobytes(),diagnosticsText])
+    return FRAME_LENGTH.pack(len(frame))+frame
+
+#Unpacks a frame (without the length in front) into a dict with the keys time, steps, ids, masses, positions, velocities and diagnostics
+def decodeFrame(frame):
+    magic,version,floatBytes,simulationTime,steps,numBodies,diagnosticsLength = FRAME_HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("Not a version "+str(FRAME_VERSION)+" state frame")
+    floatType = numpy.dtype("<f"+str(floatBytes))
+    offset = FRAME_HEADER.size
+    ids = numpy.frombuffer(frame,"<i8",numBodies,offset)
+    offset += ids.nbytes
+    masses = numpy.frombuffer(frame,floatType,numBodies,offset)
+    offset += masses.nbytes
+    positions = numpy.frombuffer(frame,floatType,2*numBodies,offset).reshape(numBodies,2)
+    offset += positions.nbytes
+    velocities = numpy.frombuffer(frame,floatType,2*numBodies,offset).reshape(numBodies,2)
+    offset += velocities.nbytes
+    diagnostics = json.loads(frame[offset:offset+diagnosticsLength].decode("utf-8")) if diagnosticsLength > 0 else None
+    return {"time":simulationTime,"steps":steps,"ids":ids,"masses":masses,"positions":positions,"velocities":velocities,"diagnostics":diagnostics}
+
+#Connects to a StreamServer and yields each frame it sends, decoded, until the server closes the connection. This is ordinary blocking socket code, so it needs no event loop
+def receiveFrames(host=STREAM_HOST,port=STREAM_PORT):
+    with socket.create_connection((host,port)) as connection:
+        stream = connection.makefile("rb")
+        while True:
+            length = stream.read(FRAME_LENGTH.size)
+            if len(length) < FRAME_LENGTH.size:
+                return
+            frame = stream.read(FRAME_LENGTH.unpack(length)[0])
+            yield decodeFrame(frame)
+
+#Starts listening as soon as it is created (port 0 picks a free port, which is then in port). rate is the most frames sent per second, or None to send every step.
+#attach(simulation) adds it to a Simulation's outputs, so the frames include its diagnostics and step count.
+#framesSent and framesDropped count the frames sent to and dropped for all the subscribers together
+class StreamServer:
+    def __init__(self,host=STREAM_HOST,port=STREAM_PORT,rate=STREAM_RATE,queueFrames=QUEUE_FRAMES,precision=numpy.float64):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.queueFrames = queueFrames
+        self.precision = precision
+        self.simulation = None
+        self.stepsSeen = 0
+        self.lastFrame = None
+        self.skipped = None #the time and state of the last step if it was skipped for being too soon after the last frame, so closing can still send it
+        self.framesSent = 0
+        self.framesDropped = 0
+        #These are only used on the event loop's thread, apart from numSubscribers being read by write()
+        self.queues = set()
+        self.connections = {} #each subscriber's task, with the writer sending to it
+        self.numSubscribers = 0
+        self.server = None
+        self.error = None
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.thread = threading.Thread(target=self.runLoop,args=(started,),daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.error is not None: #the address couldn't be listened on
+            self.thread.join()
+            raise self.error
+
+    def runLoop(self,started):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.serveSubscriber,self.host,self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as error:
+            self.error = error
+        started.set()
+        if self.error is None:
+            self.loop.run_forever()
+        self.loop.close()
+
+    def attach(self,simulation):
+        self.simulation = simulation
+        simulation.outputs.append(self)
+
+    #Called on the simulation's thread after every step. Nothing is packed unless someone is listening and it is time for a frame
+    def write(self,simulationTime,state):
+        self.stepsSeen += 1
+        if self.numSubscribers == 0 or self.loop.is_closed():
+            return
+        now = time.monotonic()
+        if self.rate is not None and self.lastFrame is not None and now-self.lastFrame < 1/self.rate:
+            self.skipped = (simulationTime,state)
+            return
+        self.lastFrame = now
+        self.skipped = None
+        self.sendFrame(simulationTime,state)
+
+    #Packs state into a frame and hands it to the event loop to send
+    def sendFrame(self,simulationTime,state):
+        simulation = self.simulation
+        steps = self.stepsSeen if simulation is None else simulation.steps
+        diagnostics = None if simulation is None or simulation.diagnostics is None else simulation.diagnostics.latest
+        self.loop.call_soon_threadsafe(self.publish,encodeFrame(simulationTime,steps,state,diagnostics,self.precision))
+
+    #Adds frame to every subscriber's queue (on the event loop's thread), dropping the oldest frame of any subscriber whose queue is full
+    def publish(self,frame):
+        for queue in self.queues:
+            if queue.full():
+                queue.get_nowait()
+                self.framesDropped += 1
+            queue.put_nowait(frame)
+
+    #Sends one subscriber its frames until it disconnects or the server is closed (which puts None in its queue)
+    async def serveSubscriber(self,reader,writer):
+        queue = asyncio.Queue(self.queueFrames)
+        self.queues.add(queue)
+        self.connections[asyncio.current_task()] = writer
+        self.numSubscribers += 1
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                await writer.drain() #waits while the subscriber is behind, and meanwhile publish drops its oldest frames
+                self.framesSent += 1
+        except ConnectionError: #the subscriber disconnected
+            pass
+        finally:
+            self.numSubscribers -= 1
+            self.queues.discard(queue)
+            self.connections.pop(asyncio.current_task(),None)
+            writer.close()
+
+    async def shutdown(self):
+        self.server.close()
+        for queue in self.queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        if self.connections:
+            #Subscribers that are too far behind to take their last frames in time are cut off, throwing away whatever is still waiting to be sent to them
+            finished,unfinished = await asyncio.wait(list(self.connections),timeout=CLOSE_TIMEOUT)
+            for connection in unfinished:
+                self.connections[connection].transport.abort()
+            if unfinished:
+                await asyncio.wait(unfinished)
+        await self.server.wait_closed()
+
+    #Sends the frames still waiting (and the last step, so subscribers see how the run ended), disconnects every subscriber and stops the event loop's thread
+    def close(self):
+        if self.loop.is_closed():
+            return
+        if self.skipped is not None and self.numSubscribers > 0:
+            self.sendFrame(*self.skipped)
+            self.skipped = None
+        asyncio.run_coroutine_threadsafe(self.shutdown(),self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop) #not stopped from shutdown itself, or the loop would stop before telling this thread that shutdown had finished
+        self.thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Connects to a simulation that is streaming its state (Simulation.py --stream) and prints a line for each frame")
+    parser.add_argument("--host",default=STREAM_HOST,help="address of the computer the simulation is running on")
+    parser.add_argument("--port",type=int,default=STREAM_PORT,help="port the simulation is streaming on")
+    arguments = parser.parse_args()
+    for frame in receiveFrames(arguments.host,arguments.port):
+        line = "time "+"{:.6g}".format(frame["time"])+" s, step "+str(frame["steps"])+", "+str(len(frame["ids"]))+" bodies"
+        diagnostics = frame["diagnostics"]
+        if diagnostics is not None and diagnostics["energyError"] is not None:
+            line += ", energy error "+"{:.2e}".format(diagnostics["energyError"])
+        print(line,flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import numpy
+from numpy.lib import format as npyformat
+from Physics import SystemState
+
+#A trajectory file is a .npy file (which numpy.load can open) holding one record per saved step: the time, then every body's position and velocity.
+#Next to it is a .json file with the same name holding everything else about the bodies (names, colors, masses, radii) and how often steps were saved.
+#Records are collected in a buffer and written CHUNK_BYTES at a time, so saving a step costs a copy into memory rather than a string conversion and a write for every number
+
+#Roughly how many bytes of records are written to the file at once
+CHUNK_BYTES = 2**23
+#The number of bytes set aside for the .npy header at the start of the file. The header says how many records there are, so it is written again (at the same length) after every chunk
+HEADER_BYTES = 1024
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+#The numpy record type for one saved step of numBodies bodies. precision is the type the positions and velocities are stored as (float32 halves the size of the file)
+def frameType(numBodies,precision=numpy.float64):
+    precision = numpy.dtype(precision).str
+    return numpy.dtype([("time","<f8"),("positions",precision,(numBodies,2)),("velocities",precision,(numBodies,2))])
+
+#The name of the .json file that goes with a trajectory file
+def metadataName(filename):
+    return os.path.splitext(filename)[0]+".json"
+
+#Where each of the state's bodies goes among the bodies an output was started with (slotIds, their ids in order), or None if they are still the same bodies.
+#Outputs keep one slot for every body they were started with, so when bodies are removed (by merging, for example) the others stay in the same columns and the removed ones are saved as NaN
+def bodySlots(slotIds,state):
+    if state.getNumBodies() == len(slotIds):
+        return None
+    return numpy.searchsorted(slotIds,state.ids)
+
+#Writes a version 1.0 .npy header saying the file holds numFrames records of type dtype, padded with spaces to exactly HEADER_BYTES bytes
+def writeHeader(file,dtype,numFrames):
+    header = repr({"descr":npyformat.dtype_to_descr(dtype),"fortran_order":False,"shape":(numFrames,)})
+    headerLength = HEADER_BYTES-len(NPY_MAGIC)-2
+    if len(header)+1 > headerLength:
+        raise ValueError("Trajectory header is too long")
+    file.seek(0)
+    file.write(NPY_MAGIC+headerLength.to_bytes(2,"little")+(header.ljust(headerLength-1)+"\n").encode("latin1"))
+
+#Saves a Simulation's steps to a trajectory file. Only every "every"th step is saved.
+#resume is what getCheckpoint returned when the run was checkpointed: the file is opened again and cut back to the steps saved up to the checkpoint, so a resumed run carries on the same file.
+#Bodies that have been removed since the file was started are saved as NaN (see bodySlots)
+class TrajectoryWriter:
+    def __init__(self,filename,state,every=1,precision=numpy.float64,resume=None):
+        self.filename = filename
+        self.every = every
+        self.precision = numpy.dtype(precision).name
+        self.slotIds = state.ids.copy() if resume is None or "ids" not in resume else numpy.array(resume["ids"],dtype=numpy.int64)
+        self.dtype = frameType(len(self.slotIds),precision)
+        self.buffer = numpy.zeros(max(1,CHUNK_BYTES//self.dtype.itemsize),dtype=self.dtype)
+        self.buffered = 0
+        if resume is None:
+            self.numFrames = 0
+            self.stepsSeen = 0
+            with open(metadataName(filename),"w") as metadataFile:
+                json.dump({"names":state.names,"colors":[list(color) if color is not None else None for color in state.colors],"masses":state.masses.tolist(),
+                           "radii":state.radii.tolist(),"every":every,"precision":self.precision},metadataFile)
+            self.file = open(filename,"wb")
+        else:
+            self.numFrames = resume["numFrames"]
+            self.stepsSeen = resume["stepsSeen"]
+            self.file = open(filename,"r+b")
+            self.file.truncate(HEADER_BYTES+self.numFrames*self.dtype.itemsize)
+        writeHeader(self.file,self.dtype,self.numFrames)
+
+    def write(self,time,state):
+        self.stepsSeen += 1
+        if self.stepsSeen%self.every != 0:
+            return
+        frame = self.buffer[self.buffered]
+        frame["time"] = time
+        slots = bodySlots(self.slotIds,state)
+        if slots is None:
+            frame["positions"] = state.positions
+            frame["velocities"] = state.velocities
+        else:
+            frame["positions"] = numpy.nan
+            frame["velocities"] = numpy.nan
+            frame["positions"][slots] = state.positions
+            frame["velocities"][slots] = state.velocities
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    #Writes the buffered records to the end of the file and updates the header with the new number of records, so the file can be read even if the program stops partway through
+    def flush(self):
+        if self.buffered == 0:
+            return
+        self.file.seek(0,os.SEEK_END)
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.numFrames += self.buffered
+        self.buffered = 0
+        writeHeader(self.file,self.dtype,self.numFrames)
+        self.file.flush()
+
+    #Writes out the buffer and returns what is needed to open the file again at this point (see resume above)
+    def getCheckpoint(self):
+        self.flush()
+        return {"filename":self.filename,"every":self.every,"precision":self.precision,"numFrames":self.numFrames,"stepsSeen":self.stepsSeen,"ids":self.slotIds.tolist()}
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+#Reads a trajectory file without loading it into memory: the file is memory-mapped, so only the steps that are actually looked at are read from the disk
+class TrajectoryReader:
+    def __init__(self,filename):
+        self.frames = numpy.load(filename,mmap_mode="r")
+        with open(metadataName(filename)) as metadataFile:
+            metadata = json.load(metadataFile)
+        self.names = metadata["names"]
+        self.colors = [tuple(color) if color is not None else None for color in metadata["colors"]]
+        self.masses = numpy.array(metadata["masses"])
+        self.radii = numpy.array(metadata["radii"])
+        self.every = metadata["every"]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def getTime(self,frame):
+        return float(self.frames[frame]["time"])
+
+    def getPositions(self,frame):
+        return self.frames[frame]["positions"].astype(float)
+
+    def getVelocities(self,frame):
+        return self.frames[frame]["velocities"].astype(float)
+
+    #The positions from up to maxSamples saved steps spread evenly between steps start and stop (including stop), as a (samples,N,2) array.
+    #Used to draw the path the bodies took without reading every step in between
+    def samplePositions(self,start,stop,maxSamples):
+        stride = max(1,(stop-start)//maxSamples)
+        return self.frames["positions"][numpy.arange(stop,start,-stride)[::-1]].astype(float)
+
+    #A SystemState holding the bodies as they were at the given saved step
+    def makeState(self,frame=0):
+        state = SystemState()
+        state.addBodies(self.names,self.colors,self.getPositions(frame),self.getVelocities(frame),self.masses,self.radii)
+        return state
+
+#Converts a trajectory file into a csv file with the same columns CsvWriter uses, CHUNK_BYTES worth of steps at a time
+def exportCsv(trajectoryFilename,csvFilename):
+    frames = numpy.load(trajectoryFilename,mmap_mode="r")
+    with open(metadataName(trajectoryFilename)) as metadataFile:
+        names = json.load(metadataFile)["names"]
+    columns = ["time"]
+    for name in names:
+        columns += [name+" x pos",name+" y pos",name+" x vel",name+" y vel"]
+    framesPerChunk = max(1,CHUNK_BYTES//frames.dtype.itemsize)
+    #Enough digits to get back exactly the number that was stored (times are always stored as 64 bit floats)
+    numberFormat = "%.9g" if frames.dtype["positions"].base == numpy.float32 else "%.17g"
+    columnFormats = ["%.17g"]+[numberFormat]*(len(columns)-1)
+    with open(csvFilename,"w") as csvFile:
+        csvFile.write(",".join(columns)+"\n")
+        for start in range(0,len(frames),framesPerChunk):
+            chunk = frames[start:start+framesPerChunk]
+            #Puts each body's x pos, y pos, x vel, y vel next to each other like in the csv columns
+            bodyColumns = numpy.concatenate([chunk["positions"],chunk["velocities"]],axis=2).reshape(len(chunk),-1)
+            numpy.savetxt(csvFile,numpy.column_stack([chunk["time"],bodyColumns]),delimiter=",",fmt=columnFormats)
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts a trajectory file saved by the simulator into a csv file")
+    parser.add_argument("trajectory",help=".npy trajectory file")
+    parser.add_argument("csv",help="csv file to create")
+    arguments = parser.parse_args()
+    exportCsv(arguments.trajectory,arguments.csv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import numpy
+import pytest
+from Scenarios import plummerSphere
+from Simulation import simulate
+from Batch import batchFromStates
+
+#Checks that running systems together in a batch gives the same results as running each of them on its own. Run with "python -m pytest"
+
+DT = 10**10
+STEPS = 50
+
+#A few small Plummer spheres (with a different seed each) run together and one at a time with leapfrog and direct forces
+@pytest.mark.parametrize("softening",[0.0,10**14])
+def testBatchMatchesSimulate(softening):
+    states = [plummerSphere(8,seed=seed) for seed in range(4)]
+    batch = batchFromStates(states,softening)
+    batch.run(STEPS*DT,DT)
+    assert batch.steps == STEPS
+    for system,state in enumerate(states):
+        alone = simulate(state,STEPS*DT,DT,integrator="leapfrog",softening=softening)
+        assert numpy.allclose(batch.positions[system],alone.state.positions,rtol=1e-12,atol=0)
+        assert numpy.allclose(batch.velocities[system],alone.state.velocities,rtol=1e-12,atol=0)
+        assert batch.getState(system).calculateTotalEnergy() == pytest.approx(alone.state.calculateTotalEnergy(),rel=1e-12)
@@ -0,0 +1,42 @@
+import numpy
+import pytest
+from Physics import SystemState
+from Collisions import CollisionHandler,findCollisions,BRUTE_FORCE_BODIES
+
+#Checks that the grid finds exactly the touching pairs that checking every pair would, and that merging bodies keeps the total mass and momentum. Run with "python -m pytest"
+
+#Every touching pair, found by checking every pair of bodies
+def bruteForceCollisions(positions,radii):
+    return {(first,second) for first in range(len(radii)) for second in range(first+1,len(radii))
+            if numpy.sum((positions[second]-positions[first])**2) < (radii[first]+radii[second])**2}
+
+#Small bodies scattered thickly enough that many of them touch, with a few much bigger ones among them (which are left out of the grid and checked separately),
+#including two that touch each other. There are always more than Collisions.BRUTE_FORCE_BODIES, so the grid is used. Some are in cells on the negative side of the origin too
+@pytest.mark.parametrize("count",[BRUTE_FORCE_BODIES+1,500])
+def testGridFindsEveryCollision(count):
+    generator = numpy.random.default_rng(2)
+    positions = generator.uniform(-100,100,(count,2))
+    radii = generator.uniform(0.5,3,count)
+    radii[:4] = [20,30,15,40]
+    positions[:2] = [[-10,-10],[25,15]]
+    pairs = findCollisions(positions,radii)
+    found = set(map(tuple,pairs.tolist()))
+    assert len(found) == len(pairs) #no pair is listed twice
+    assert found == bruteForceCollisions(positions,radii)
+    assert (0,1) in found
+
+#Bodies scattered so thickly that many of them touch, in groups as well as pairs. More than Collisions.BRUTE_FORCE_BODIES of them, so the grid is used
+def testMergesConserveMassAndMomentum():
+    generator = numpy.random.default_rng(0)
+    count = 500
+    state = SystemState()
+    state.addBodies(["Body "+str(number) for number in range(count)],[None]*count,generator.uniform(-100,100,(count,2)),generator.normal(0,10,(count,2)),
+                    generator.uniform(1,10,count),generator.uniform(1,5,count))
+    totalMass = state.masses.sum()
+    momentum = state.masses@state.velocities
+    centerOfMass = (state.masses@state.positions)/totalMass
+    assert CollisionHandler("merge").resolve(state)
+    assert state.getNumBodies() < count
+    assert state.masses.sum() == pytest.approx(totalMass,rel=1e-12)
+    assert numpy.allclose(state.masses@state.velocities,momentum,rtol=1e-12,atol=1e-9)
+    assert numpy.allclose((state.masses@state.positions)/state.masses.sum(),centerOfMass,rtol=1e-12,atol=1e-9)
@@ -0,0 +1,27 @@
+import json
+import pytest
+from Scenarios import loadScenario,getPreset,KNOWN_BODIES
+
+#Checks of how scenario files are read
+
+def writeScenario(directory,scenario):
+    filename = str(directory/"scenario.json")
+    with open(filename,"w") as file:
+        json.dump(scenario,file)
+    return filename
+
+#A preset that needs softening keeps it inside a scenario, unless the scenario sets its own
+def testPresetSofteningIsKept(tmp_path):
+    settings = loadScenario(writeScenario(tmp_path,{"presets":[{"preset":"plummer","count":10},{"preset":"disk","count":10}]}))[1]
+    assert settings["softening"] == max(getPreset("plummer")[1]["softening"],getPreset("disk")[1]["softening"])
+    settings = loadScenario(writeScenario(tmp_path,{"softening":5,"presets":[{"preset":"plummer","count":10}]}))[1]
+    assert settings["softening"] == 5
+    assert "softening" not in loadScenario(writeScenario(tmp_path,{"presets":[{"preset":"solar"}]}))[1]
+
+#Known bodies can leave out their mass and radius separately, and other bodies can't leave out either
+def testKnownBodiesFillInMassAndRadius(tmp_path):
+    state = loadScenario(writeScenario(tmp_path,{"bodies":[{"name":"Sun","mass":2e30},{"name":"Earth","radius":1.0}]}))[0]
+    assert list(state.masses) == [2e30,KNOWN_BODIES["Earth"][0]]
+    assert list(state.radii) == [KNOWN_BODIES["Sun"][1],1.0]
+    with pytest.raises(ValueError,match="Rock"):
+        loadScenario(writeScenario(tmp_path,{"bodies":[{"name":"Rock","mass":5}]}))
@@ -0,0 +1,57 @@
+import itertools
+import numpy
+import pytest
+from Scenarios import uniformDisk
+from Simulation import simulate,resumeSimulation
+from Diagnostics import DiagnosticsMonitor
+
+#Checks of the promise that is easiest to break without noticing: a run resumed from a checkpoint is exactly the same as one that was never stopped. Run with "python -m pytest"
+
+DT = 86400
+RESUME_STEPS = 40
+TOTAL_STEPS = 100
+#Bodies this big in a disk of 200 merge a dozen or so times in TOTAL_STEPS steps
+MERGING_RADIUS = 10**10
+
+def makeDisk():
+    return uniformDisk(200,radius=MERGING_RADIUS,seed=1)
+
+#Runs the disk for TOTAL_STEPS steps in directory, stopping after RESUME_STEPS and carrying on from the checkpoint if resume is True.
+#Returns the final state and the saved output and diagnostics files' contents
+def runDisk(directory,integrator,collisions,extension,resume):
+    output = str(directory/("run"+extension))
+    diagnosticsFile = str(directory/"diagnostics.jsonl")
+    checkpointFile = str(directory/"checkpoint.npz")
+    diagnostics = DiagnosticsMonitor(10,diagnosticsFile)
+    if resume:
+        simulate(makeDisk(),RESUME_STEPS*DT,DT,output,integrator=integrator,checkpointFile=checkpointFile,collisions=collisions,diagnostics=diagnostics)
+        simulation = resumeSimulation(checkpointFile)[0]
+        try:
+            simulation.run(TOTAL_STEPS*DT)
+        finally:
+            simulation.close()
+    else:
+        simulation = simulate(makeDisk(),TOTAL_STEPS*DT,DT,output,integrator=integrator,collisions=collisions,diagnostics=diagnostics)
+    if extension == ".npy":
+        saved = numpy.load(output).tobytes()
+    else:
+        with open(output) as file:
+            saved = file.read()
+    with open(diagnosticsFile) as file:
+        return simulation,saved,file.read()
+
+@pytest.mark.parametrize("integrator,collisions,extension",list(itertools.product(["leapfrog","yoshida","block"],[None,"merge"],[".npy",".csv"])))
+def testResumeIsIdentical(tmp_path,integrator,collisions,extension):
+    (tmp_path/"stopped").mkdir()
+    (tmp_path/"straight").mkdir()
+    resumed,resumedOutput,resumedDiagnostics = runDisk(tmp_path/"stopped",integrator,collisions,extension,True)
+    straight,straightOutput,straightDiagnostics = runDisk(tmp_path/"straight",integrator,collisions,extension,False)
+    if collisions is not None:
+        assert straight.collisions.count > 0 #otherwise this isn't testing merges
+        assert resumed.collisions.count == straight.collisions.count
+    assert resumed.steps == straight.steps == TOTAL_STEPS
+    assert numpy.array_equal(resumed.state.ids,straight.state.ids)
+    assert numpy.array_equal(resumed.state.positions,straight.state.positions)
+    assert numpy.array_equal(resumed.state.velocities,straight.state.velocities)
+    assert resumedOutput == straightOutput
+    assert resumedDiagnostics == straightDiagnostics
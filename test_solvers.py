@@ -0,0 +1,31 @@
+import numpy
+import pytest
+from Solvers import getSolver
+from Scenarios import plummerSphere
+from NumbaKernels import PARALLEL_BODIES
+
+#Checks that the gravity solvers agree with the direct solver where they should: Barnes-Hut with an opening angle of 0, and the compiled Numba kernels. Run with "python -m pytest"
+
+@pytest.mark.parametrize("softening",[0.0,10**14])
+def testBarnesHutWithoutApproximationMatchesDirect(softening):
+    state = plummerSphere(500)
+    direct = getSolver("direct",softening=softening)
+    barnesHut = getSolver("barneshut",theta=0.0,softening=softening)
+    assert numpy.allclose(barnesHut.calculateAccelerations(state.positions,state.masses),direct.calculateAccelerations(state.positions,state.masses),rtol=1e-9,atol=0)
+    assert numpy.allclose(barnesHut.calculatePotentials(state.positions,state.masses),direct.calculatePotentials(state.positions,state.masses),rtol=1e-9,atol=0)
+
+#Both the single-threaded and the parallel kernels (which are used from NumbaKernels.PARALLEL_BODIES bodies), for every body and for a few targets.
+#Without Numba installed this checks the NumPy fallback instead
+@pytest.mark.parametrize("count,softening",[(count,softening) for count in [100,PARALLEL_BODIES] for softening in [0.0,10**14]])
+def testNumbaMatchesDirect(count,softening):
+    state = plummerSphere(count)
+    direct = getSolver("direct",softening=softening)
+    compiled = getSolver("numba",softening=softening)
+    for targets in [None,numpy.array([0,7,count-1])]:
+        accelerations = direct.calculateAccelerations(state.positions,state.masses,targets)
+        potentials = direct.calculatePotentials(state.positions,state.masses,targets)
+        assert numpy.allclose(compiled.calculateAccelerations(state.positions,state.masses,targets),accelerations,rtol=1e-10,atol=0)
+        assert numpy.allclose(compiled.calculatePotentials(state.positions,state.masses,targets),potentials,rtol=1e-10,atol=0)
+        bothAccelerations,bothPotentials = compiled.calculateAccelerationsAndPotentials(state.positions,state.masses,targets)
+        assert numpy.allclose(bothAccelerations,accelerations,rtol=1e-10,atol=0)
+        assert numpy.allclose(bothPotentials,potentials,rtol=1e-10,atol=0)
@@ -0,0 +1,25 @@
+import numpy
+import pytest
+from Scenarios import uniformDisk
+from Streaming import encodeFrame,decodeFrame,FRAME_LENGTH
+
+#Checks that a state frame reads back as the state that was sent. Run with "python -m pytest"
+
+@pytest.mark.parametrize("precision,diagnostics",[(precision,diagnostics) for precision in [numpy.float64,numpy.float32]
+                                                  for diagnostics in [None,{"energyError":-1.5e-7,"virialRatio":None,"momentum":[1.0,2.0]}]])
+def testFramesRoundTrip(precision,diagnostics):
+    state = uniformDisk(50,seed=3)
+    frame = encodeFrame(12345.5,678,state,diagnostics,precision)
+    assert FRAME_LENGTH.unpack_from(frame)[0] == len(frame)-FRAME_LENGTH.size
+    decoded = decodeFrame(frame[FRAME_LENGTH.size:])
+    assert decoded["time"] == 12345.5
+    assert decoded["steps"] == 678
+    assert decoded["diagnostics"] == diagnostics
+    assert numpy.array_equal(decoded["ids"],state.ids)
+    for key in ["masses","positions","velocities"]:
+        assert decoded[key].dtype == numpy.dtype(precision)
+        assert numpy.array_equal(decoded[key],getattr(state,key).astype(precision))
+
+def testOtherDataIsRejected():
+    with pytest.raises(ValueError):
+        decodeFrame(b"JUNK"+bytes(100))
@@ -0,0 +1,46 @@
+import csv
+import numpy
+from Scenarios import uniformDisk
+from Simulation import simulate
+from Trajectory import exportCsv
+
+#Checks that a trajectory file of a run where bodies merge converts into the same csv file a csv output would have saved. Run with "python -m pytest"
+
+DT = 86400
+STEPS = 100
+
+#The header and the numbers in a csv file. Csv outputs end every line with a comma, which is left out
+def readCsv(filename):
+    with open(filename) as file:
+        rows = [row[:-1] if row[-1] == "" else row for row in csv.reader(file)]
+    return rows[0],numpy.array(rows[1:],dtype=float)
+
+#Bodies this big in a disk of 200 merge a dozen or so times in STEPS steps. Every body the run started with keeps its columns, and the columns of a body are empty (NaN)
+#from the step it was merged into another one onwards
+def testExportKeepsMergedBodiesColumns(tmp_path):
+    state = uniformDisk(200,radius=10**10,seed=1)
+    trajectory = str(tmp_path/"run.npy")
+    exported = str(tmp_path/"exported.csv")
+    saved = str(tmp_path/"saved.csv")
+    simulation = simulate(state,STEPS*DT,DT,trajectory,collisions="merge")
+    simulate(state,STEPS*DT,DT,saved,collisions="merge")
+    assert simulation.collisions.count > 0 #otherwise this isn't testing merges
+    exportCsv(trajectory,exported)
+    columns,values = readCsv(exported)
+    expectedColumns = ["time"]
+    for name in state.names:
+        expectedColumns += [name+" x pos",name+" y pos",name+" x vel",name+" y vel"]
+    assert columns == expectedColumns
+    assert len(values) == STEPS
+    removed = numpy.isnan(values[:,1:]).reshape(len(values),state.getNumBodies(),4)
+    assert numpy.all(removed == removed[:,:,:1]) #a body's four columns are all empty or all filled
+    removed = removed[:,:,0]
+    assert numpy.all(removed[1:] >= removed[:-1]) #once merged, always merged
+    survivors = numpy.isin(state.ids,simulation.state.ids)
+    assert numpy.array_equal(removed[-1],~survivors)
+    final = values[-1,1:].reshape(state.getNumBodies(),4)[survivors]
+    assert numpy.array_equal(final[:,:2],simulation.state.positions)
+    assert numpy.array_equal(final[:,2:],simulation.state.velocities)
+    savedColumns,savedValues = readCsv(saved)
+    assert savedColumns == columns
+    assert numpy.array_equal(savedValues,values,equal_nan=True)
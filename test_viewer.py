@@ -0,0 +1,33 @@
+import os
+import pytest
+from Scenarios import getPreset,PRESETS
+from Simulation import simulate
+
+#Checks that the window can show systems of any size. PlanetSimulator starts pygame when it is imported, so it is imported with the dummy video driver (unless another one has
+#been chosen), which needs no display
+
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+import PlanetSimulator
+
+#scaleToFit changes the window's scale for good, so every test starts again from the scale the window starts with
+STARTING_SCALE = PlanetSimulator.DISTANCE_SCALE
+
+#Every preset is built into bodies and drawn the way main does it. The Plummer sphere is parsecs across, far more pixels than pygame can handle at the starting scale
+@pytest.mark.parametrize("preset",list(PRESETS))
+def testPresetsCanBeShown(monkeypatch,preset):
+    monkeypatch.setattr(PlanetSimulator,"DISTANCE_SCALE",STARTING_SCALE)
+    state,settings = getPreset(preset,{"count":200} if preset in ("plummer","disk") else None)
+    bodies = [PlanetSimulator.Body(state,index) for index in range(state.getNumBodies())]
+    PlanetSimulator.scaleToFit(bodies)
+    renderer = PlanetSimulator.Renderer()
+    renderer.drawScene(bodies)
+    renderer.show()
+
+#A saved run of a Plummer sphere is played back (for one frame: the window is closed straight away)
+def testLargeRunsCanBeReplayed(monkeypatch,tmp_path):
+    monkeypatch.setattr(PlanetSimulator,"DISTANCE_SCALE",STARTING_SCALE)
+    state,settings = getPreset("plummer",{"count":200})
+    output = str(tmp_path/"plummer.npy")
+    simulate(state,3*settings["dt"],settings["dt"],output,softening=settings["softening"])
+    PlanetSimulator.pygame.event.post(PlanetSimulator.pygame.event.Event(PlanetSimulator.pygame.QUIT))
+    PlanetSimulator.runReplay(output)